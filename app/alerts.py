@@ -0,0 +1,71 @@
+"""In-process broadcast of the latest prediction for live dashboard alerts.
+
+Every scored request publishes its newest prediction. Subscribers either long-poll
+``GET /alerts?after=<seq>`` or keep an SSE connection on ``GET /alerts/stream``; both
+are woken as soon as something is published, so nobody has to poll the table.
+Only the latest event is kept: a subscriber that falls behind skips straight to it.
+"""
+import datetime as dt
+import json
+import threading
+
+
+class AlertBroker:
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._latest = None
+        self.published = 0
+        self.anomalies = 0
+
+    def publish(self, reading, prediction, anomalies=None, timestamp=None):
+        """Record the newest prediction and wake every waiting subscriber.
+
+        ``anomalies`` is the number of anomalies in the request it came from
+        (defaults to whether ``prediction`` itself is one).
+        """
+        prediction = int(prediction)
+        if anomalies is None:
+            anomalies = int(prediction == 1)
+        event = {
+            'prediction': prediction,
+            'anomalies': int(anomalies),
+            'temperature': float(reading[0]),
+            'humidity': float(reading[1]),
+            'sound_volume': float(reading[2]),
+            'timestamp': (timestamp or dt.datetime.now()).isoformat(),
+        }
+        with self._cond:
+            self._seq += 1
+            event['seq'] = self._seq
+            self._latest = event
+            self.published += 1
+            self.anomalies += event['anomalies']
+            self._cond.notify_all()
+
+    def wait(self, after=0, timeout=25.0):
+        """The latest event once it is newer than ``after``, or None after ``timeout`` seconds.
+
+        A sequence number that does not belong to this process (the service restarted)
+        returns the latest event at once.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._latest is not None and self._seq != after, timeout)
+            if self._latest is None or self._seq == after:
+                return None
+            return self._latest
+
+    def sse_events(self, timeout=15.0):
+        """Server-sent events: one ``data:`` line per event, a comment line when idle to keep the connection open."""
+        seq = 0
+        while True:
+            event = self.wait(seq, timeout)
+            if event is None:
+                yield ': keep-alive\n\n'
+                continue
+            seq = event['seq']
+            yield f"id: {seq}\ndata: {json.dumps(event)}\n\n"
+
+    def stats(self):
+        with self._cond:
+            return {'seq': self._seq, 'published': self.published, 'anomalies': self.anomalies}
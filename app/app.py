@@ -1,11 +1,37 @@
-from flask import Flask, request, jsonify
-import mysql.connector
+import os
+import sys
+
+# modules shared with the dashboard; the image copies common/ to /common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from db_writer import ShardedDBWriter
+from batcher import MicroBatcher
+from fast_model import SklearnScorer, compile_scorer
+import lookup_table
+import binary_format
+import rollups
+from alerts import AlertBroker
+from instrumentation import Metrics, RequestProfiler, install
+from model_registry import ModelRegistry, load_pipeline
+import numpy as np
 import pickle
 import joblib  
-import os
+import atexit
+from concurrent import futures
+import datetime as dt
+import json
+import math
+import signal
 
 app = Flask(__name__)
 
+# METRICS=0 turns every timer and counter into an immediate return
+metrics = Metrics('sensor_app_', enabled=os.getenv('METRICS', '1') == '1')
+metrics.describe('stage_seconds', 'Time spent in each stage of a prediction request')
+metrics.describe('readings_total', 'Readings scored and queued for the database')
+metrics.describe('anomalies_total', 'Readings predicted as anomalies')
+
 db_config = {
     'user': os.getenv('MYSQL_DB_USER'),
     'password': os.getenv('MYSQL_ROOT_PASSWORD'),
@@ -13,69 +39,498 @@ db_config = {
     'database': 'anomaly_detection'
 }
 
+FEATURES = ['temperature', 'humidity', 'sound_volume']
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 500))
+MAX_LINE_BYTES = 64 * 1024
+# LOG_REQUESTS=1 logs every /predict body at debug level (it used to be printed unconditionally)
+LOG_REQUESTS = os.getenv('LOG_REQUESTS', '0') == '1'
+# sensor ids are stored as INT UNSIGNED and sent as uint32 in binary records
+MAX_SENSOR_ID = 2 ** 32 - 1
+# MySQL TIMESTAMP range in Unix seconds; binary records outside it (other than 0 = now) are rejected
+MIN_TIMESTAMP = 1
+MAX_TIMESTAMP = 2 ** 31 - 1
+
+# scaler + model pipeline written by model_not_need/model.py; without it the
+# separate best_model.pkl and scaler.pkl are loaded
+MODEL_PIPELINE = os.getenv('MODEL_PIPELINE', 'model_pipeline.joblib')
+# versioned models (see model_registry.py); the newest version, or MODEL_VERSION, is
+# served and new versions are swapped in without a restart. While the directory
+# has no version, the bundled files above are served.
+MODEL_DIR = os.getenv('MODEL_DIR', 'models')
+
+
+def model_files():
+    if os.path.exists(MODEL_PIPELINE):
+        return (MODEL_PIPELINE,)
+    return ('best_model.pkl', 'scaler.pkl')
+
+
 def load_model_and_scaler():
-    try:
+    if os.path.exists(MODEL_PIPELINE):
+        return load_pipeline(MODEL_PIPELINE)
 
-        with open('best_model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        
-        scaler = joblib.load('scaler.pkl')
-        return model, scaler
-    except Exception as e:
-        print(f"Error loading the model or scaler: {e}")
-        return None, None
+    with open('best_model.pkl', 'rb') as f:
+        model = pickle.load(f)
 
-model, scaler = load_model_and_scaler()
+    scaler = joblib.load('scaler.pkl')
+    return model, scaler
 
 
-def save_to_db(data, prediction):
-    try:
-        conn = mysql.connector.connect(**db_config)
-        cursor = conn.cursor()
+def load_bundled_model():
+    model, scaler = load_model_and_scaler()
+    return model, scaler, model_files()
+
+
+def build_scorer(model, scaler, fingerprint):
+    """Scorer for one model version, as configured by FAST_INFERENCE and LOOKUP_TABLE."""
+    # FAST_INFERENCE=0 goes back to sklearn's generic transform/predict
+    if os.getenv('FAST_INFERENCE', '1') == '1':
+        scorer = compile_scorer(model, scaler)
+    else:
+        scorer = SklearnScorer(model, scaler)
+    print(f"Using {scorer.name} scorer for {model.__class__.__name__}")
+
+    # Opt-in: answer on-grid readings from a precomputed, memory-mapped decision table
+    if os.getenv('LOOKUP_TABLE', '0') == '1':
+        try:
+            scorer = lookup_table.load_or_build(
+                scorer,
+                model.classes_,
+                fingerprint,
+                os.getenv('LOOKUP_TABLE_PATH', 'lookup_table.bin'),
+                os.getenv('LOOKUP_TABLE_RANGES', lookup_table.DEFAULT_RANGES),
+            )
+        except Exception as e:
+            print(f"Error preparing the lookup table, scoring with the model: {e}")
+    return scorer
+
+
+registry = ModelRegistry(
+    MODEL_DIR,
+    build_scorer,
+    fallback=load_bundled_model,
+    pinned=os.getenv('MODEL_VERSION') or None,
+    poll_interval=float(os.getenv('MODEL_POLL_INTERVAL', 5)),
+)
+registry.start()
+
+
+def predict_rows(rows, active):
+    """Scale and score an (n, 3) array of readings with one vectorized call."""
+    return active.scorer.predict(np.asarray(rows, dtype=float))
+
+
+def score_batch(rows):
+    """``(prediction, model version)`` of each reading in a micro-batch."""
+    active = registry.current
+    return [(int(p), active.version) for p in predict_rows(rows, active)]
+
+
+# Opt-in: coalesce concurrent /predict calls into one vectorized predict per window
+batcher = None
+if os.getenv('MICRO_BATCH', '0') == '1':
+    batcher = MicroBatcher(
+        score_batch,
+        max_batch=int(os.getenv('MICRO_BATCH_MAX', 64)),
+        max_wait=float(os.getenv('MICRO_BATCH_WINDOW_MS', 2)) / 1000,
+        timeout=float(os.getenv('MICRO_BATCH_TIMEOUT_MS', 5000)) / 1000,
+    )
+
+
+def parse_reading(item):
+    """Return the feature tuple of a single reading, or an error message if it is invalid."""
+    if not isinstance(item, dict):
+        return None, 'Reading must be an object'
+
+    missing = [k for k in FEATURES if k not in item]
+    if missing:
+        return None, f"Missing fields: {', '.join(missing)}"
+
+    values = []
+    for k in FEATURES:
+        value = item[k]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None, f"Field '{k}' must be a finite number"
+        values.append(float(value))
+    return tuple(values), None
+
+
+def parse_sensor_id(value):
+    """Return a reading's sensor id, or an error message if it is not a valid id."""
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_SENSOR_ID:
+        return None, f"Field 'sensor_id' must be an integer between 0 and {MAX_SENSOR_ID}"
+    return value, None
+
+
+def parse_item(item, default_sensor=0):
+    """Return ``(features, sensor_id, error)`` for one reading object."""
+    row, error = parse_reading(item)
+    if error:
+        return None, None, error
+    sensor_id, error = parse_sensor_id(item.get('sensor_id', default_sensor))
+    if error:
+        return None, None, error
+    return row, sensor_id, None
+
+
+def batch_readings(data):
+    """Turn a batch payload into a list of readings.
+
+    Accepts a JSON array of reading objects, an object with a ``readings`` array,
+    or columnar arrays (``{"temperature": [...], "humidity": [...], "sound_volume": [...]}``).
+    Readings may carry their own ``sensor_id``; in the object forms a top-level
+    ``sensor_id`` applies to the rest. Returns None if the payload has none of these shapes.
+    """
+    if isinstance(data, list):
+        return data
+
+    if isinstance(data, dict):
+        if isinstance(data.get('readings'), list):
+            return data['readings']
+
+        if all(isinstance(data.get(k), list) for k in FEATURES):
+            lengths = {len(data[k]) for k in FEATURES}
+            if len(lengths) != 1:
+                return None
+            return [dict(zip(FEATURES, values)) for values in zip(*(data[k] for k in FEATURES))]
+
+    return None
+
+
+# one queue, worker and connection pool per shard; a sensor's rows always use the same shard
+writer = ShardedDBWriter(
+    db_config,
+    shards=int(os.getenv('WRITE_SHARDS', 4)),
+    pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+    max_queue=int(os.getenv('WRITE_QUEUE_SIZE', 10000)),
+    batch_size=int(os.getenv('WRITE_BATCH_SIZE', 500)),
+    flush_interval=float(os.getenv('WRITE_FLUSH_INTERVAL_MS', 500)) / 1000,
+    on_flush=rollups.update_rollups,
+)
+writer.start()
+atexit.register(writer.stop)
+# docker stop sends SIGTERM; turn it into a normal exit so the queue is flushed by atexit
+signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+
+alert_broker = AlertBroker()
+ALERT_WAIT_MAX = 60.0
+# dashboards in the browser open /alerts/stream from another origin (the Dash port)
+ALERT_ALLOW_ORIGIN = os.getenv('ALERT_ALLOW_ORIGIN', '*')
+
+
+def writer_metrics():
+    stats = writer.stats()
+    samples = [
+        ('db_rows_written_total', 'counter', 'Rows inserted by the background writer', stats['rows_written'], {}),
+        ('db_rows_dropped_total', 'counter', 'Rows dropped after all insert attempts failed', stats['rows_dropped'], {}),
+        ('db_errors_total', 'counter', 'Failed insert attempts, including retried ones', stats['errors'], {}),
+        ('db_sync_writes_total', 'counter', 'Rows written by a request thread because its queue was full',
+         stats['sync_writes'], {}),
+        ('db_flush_seconds_avg', 'gauge', 'Average time of one batched insert', stats['avg_flush_ms'] / 1000, {}),
+        ('db_flush_seconds_max', 'gauge', 'Longest batched insert', stats['max_flush_ms'] / 1000, {}),
+    ]
+    samples += [('db_queue_depth', 'gauge', 'Rows waiting in each writer shard', shard['queue_depth'], {'shard': i})
+                for i, shard in enumerate(stats['shards'])]
+    return samples
+
+
+metrics.add_collector(writer_metrics)
 
-        query = """
-            INSERT INTO sensor_data (temperature, humidity, sound_volume, prediction)
-            VALUES (%s, %s, %s, %s)
-        """
-        cursor.execute(query, (data['temperature'], data['humidity'], data['sound_volume'], prediction))
-        conn.commit()
 
-    except mysql.connector.Error as e:
-        print(f"Error writing to the database: {e}")
-    finally:
-        if conn.is_connected():
-            cursor.close()
-            conn.close()
+def model_metrics():
+    stats = registry.stats()
+    return [
+        ('model_info', 'gauge', 'Model version being served', 1,
+         {'version': stats['version'], 'model': stats['model'], 'scorer': stats['scorer']}),
+        ('model_load_seconds', 'gauge', 'Time to load and compile the served model version', stats['load_seconds'], {}),
+        ('model_reloads_total', 'counter', 'New model versions swapped in', stats['reloads'], {}),
+        ('model_reload_failures_total', 'counter', 'Model versions that failed to load', stats['failures'], {}),
+    ]
+
+
+metrics.add_collector(model_metrics)
+
+# Opt-in: PROFILING=1 adds /profile, which profiles the next N requests on demand;
+# PROFILE_REQUESTS=N also starts one at startup
+profiler = None
+if os.getenv('PROFILING', '0') == '1':
+    profiler = RequestProfiler(os.getenv('PROFILE_DIR', 'profiles'),
+                               interval=float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000)
+    if int(os.getenv('PROFILE_REQUESTS', 0)) > 0:
+        profiler.start(int(os.getenv('PROFILE_REQUESTS')), os.getenv('PROFILE_MODE', 'cprofile'))
+
+install(app, metrics, profiler)
+
+
+def lap(started, endpoint, stage):
+    """Record one stage of a request and return the start of the next one."""
+    return metrics.lap('stage_seconds', started, endpoint=endpoint, stage=stage)
+
+
+def save_to_db(data, prediction, sensor_id=0, model_version=''):
+    """Queue a reading for the background writer; the request does not wait for the insert."""
+    reading = (data['temperature'], data['humidity'], data['sound_volume'])
+    writer.submit(reading, prediction, sensor_id, model_version)
+    alert_broker.publish(reading, prediction)
+    metrics.inc('readings_total')
+    if prediction == 1:
+        metrics.inc('anomalies_total')
+
+
+def save_batch_to_db(rows, predictions, timestamps=None, sensor_ids=None, model_version=''):
+    """Queue a batch of readings; the writer stores them with multi-row inserts."""
+    writer.submit_many(rows, predictions, timestamps, sensor_ids, model_version)
+    if len(rows):
+        anomalies = int(np.count_nonzero(np.asarray(predictions) == 1))
+        alert_broker.publish(
+            rows[-1], predictions[-1],
+            anomalies=anomalies,
+            timestamp=timestamps[-1] if timestamps else None,
+        )
+        metrics.inc('readings_total', len(rows))
+        metrics.inc('anomalies_total', anomalies)
 
 
 @app.route('/predict', methods=['GET', 'POST'])
 def predict():
-    print(request.data)  
+    started = metrics.clock()
     data = request.json
-    print(data)  
+    if LOG_REQUESTS:
+        app.logger.debug('Reading: %s', data)
+    started = lap(started, 'predict', 'parse')
 
-    if not all(k in data for k in ['temperature', 'humidity', 'sound_volume']):
-        return jsonify({'error': 'Incorrect data'}), 400
+    # the fused scorer does no input checks, so reject strings, nulls and non-finite values here
+    row, sensor_id, error = parse_item(data)
+    if error:
+        return jsonify({'error': error}), 400
+    started = lap(started, 'predict', 'validate')
 
 
     try:
-     
-        input_data = [[data['temperature'], data['humidity'], data['sound_volume']]]
-        
-       
-        scaled_data = scaler.transform(input_data)
-        
-  
-        prediction = int(model.predict(scaled_data)[0])
+        if batcher is not None:
+            prediction, version = batcher.predict(row)
+        else:
+            active = registry.current
+            prediction, version = active.scorer.predict_one(*row), active.version
+    except futures.TimeoutError:
+        return jsonify({'error': 'Prediction timed out, try again later'}), 503
     except Exception as e:
         return jsonify({'error': f'Prediction error: {e}'}), 500
+    started = lap(started, 'predict', 'model')
 
  
-    save_to_db(data, prediction)
+    save_to_db(dict(zip(FEATURES, row)), prediction, sensor_id, version)
+    lap(started, 'predict', 'save')
 
     return jsonify({'prediction': prediction}), 200
 
 
+def predict_binary():
+    """Score a packed binary batch (see binary_format.py) in one vectorized call."""
+    started = metrics.clock()
+    try:
+        values, timestamps, sensor_ids = binary_format.decode(request.mimetype, request.get_data(cache=False))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    started = lap(started, 'binary', 'parse')
+
+    if len(values) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large, at most {MAX_BATCH_SIZE} readings are accepted'}), 413
+
+    finite = np.isfinite(values).all(axis=1)
+    valid = finite
+    if timestamps is not None:
+        with np.errstate(invalid='ignore'):
+            in_range = (timestamps == 0) | ((timestamps >= MIN_TIMESTAMP) & (timestamps <= MAX_TIMESTAMP))
+        valid = finite & in_range
+    predictions = np.full(len(values), binary_format.INVALID_PREDICTION, dtype=np.uint8)
+    if valid.any():
+        active = registry.current
+        try:
+            scored = predict_rows(values[valid], active)
+        except Exception as e:
+            return jsonify({'error': f'Prediction error: {e}'}), 500
+        predictions[valid] = scored
+        started = lap(started, 'binary', 'model')
+
+        row_timestamps = None
+        if timestamps is not None:
+            row_timestamps = [dt.datetime.fromtimestamp(t) if t else None for t in timestamps[valid].tolist()]
+        row_sensors = None if sensor_ids is None else sensor_ids[valid].tolist()
+        save_batch_to_db(values[valid].tolist(), scored, row_timestamps, row_sensors, active.version)
+        lap(started, 'binary', 'save')
+
+    best = request.accept_mimetypes.best_match(['application/json', binary_format.PREDICTIONS_CONTENT_TYPE])
+    if best == binary_format.PREDICTIONS_CONTENT_TYPE:
+        return Response(predictions.tobytes(), mimetype=binary_format.PREDICTIONS_CONTENT_TYPE)
+
+    errors = [{'index': int(i), 'error': 'Non-finite value' if not finite[i] else 'Timestamp out of range'}
+              for i in np.flatnonzero(~valid)]
+    result = [None if p == binary_format.INVALID_PREDICTION else p for p in predictions.tolist()]
+    return jsonify({'predictions': result, 'errors': errors}), 200
+
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    if binary_format.is_binary(request.mimetype):
+        return predict_binary()
+
+    started = metrics.clock()
+    data = request.get_json(silent=True)
+    readings = batch_readings(data)
+    started = lap(started, 'batch', 'parse')
+    if readings is None:
+        return jsonify({'error': 'Expected an array of readings or equal-length columnar arrays'}), 400
+
+    default_sensor = data.get('sensor_id', 0) if isinstance(data, dict) else 0
+
+    if len(readings) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch too large, at most {MAX_BATCH_SIZE} readings are accepted'}), 413
+
+    rows, sensors, indices, errors = [], [], [], []
+    for i, item in enumerate(readings):
+        row, sensor_id, error = parse_item(item, default_sensor)
+        if error:
+            errors.append({'index': i, 'error': error})
+        else:
+            rows.append(row)
+            sensors.append(sensor_id)
+            indices.append(i)
+    started = lap(started, 'batch', 'validate')
+
+    predictions = [None] * len(readings)
+    if rows:
+        active = registry.current
+        try:
+            scored = predict_rows(rows, active)
+        except Exception as e:
+            return jsonify({'error': f'Prediction error: {e}'}), 500
+
+        for i, p in zip(indices, scored):
+            predictions[i] = int(p)
+        started = lap(started, 'batch', 'model')
+
+        save_batch_to_db(rows, scored, sensor_ids=sensors, model_version=active.version)
+        lap(started, 'batch', 'save')
+
+    return jsonify({'predictions': predictions, 'errors': errors}), 200
+
+
+def read_ndjson(stream):
+    """Yield (reading, sensor_id, error) for each non-empty line of an NDJSON body, one line at a time."""
+    while True:
+        line = stream.readline(MAX_LINE_BYTES)
+        if not line:
+            return
+        if len(line) == MAX_LINE_BYTES and not line.endswith(b'\n'):
+            # skip the rest of an oversized line instead of buffering it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(MAX_LINE_BYTES)
+            yield None, None, f'Line longer than {MAX_LINE_BYTES} bytes'
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            yield None, None, 'Invalid JSON'
+            continue
+        yield parse_item(item)
+
+
+def score_chunk(chunk):
+    """Score and store one chunk of (index, reading, sensor_id, error) and return its NDJSON lines."""
+    rows = [row for _, row, _, error in chunk if error is None]
+    predictions = []
+    if rows:
+        started = metrics.clock()
+        active = registry.current
+        try:
+            predictions = predict_rows(rows, active)
+        except Exception as e:
+            # the response has already started, so report the failure per reading
+            chunk = [(index, row, sensor_id, error or f'Prediction error: {e}')
+                     for index, row, sensor_id, error in chunk]
+        else:
+            started = lap(started, 'stream', 'model')
+            save_batch_to_db(rows, predictions,
+                             sensor_ids=[sensor_id for _, _, sensor_id, error in chunk if error is None],
+                             model_version=active.version)
+            lap(started, 'stream', 'save')
+
+    results = iter(predictions)
+    lines = []
+    for index, row, _, error in chunk:
+        if error is None:
+            lines.append(json.dumps({'index': index, 'prediction': int(next(results))}))
+        else:
+            lines.append(json.dumps({'index': index, 'error': error}))
+    return '\n'.join(lines) + '\n'
+
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """Score newline-delimited JSON readings in rolling chunks and stream the results back as NDJSON."""
+    stream = request.stream
+
+    def generate():
+        chunk = []
+        for index, (row, sensor_id, error) in enumerate(read_ndjson(stream)):
+            chunk.append((index, row, sensor_id, error))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield score_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield score_chunk(chunk)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/alerts', methods=['GET'])
+def alerts():
+    """Long-poll for the latest prediction newer than ``after``; 204 when none arrives within ``timeout`` seconds."""
+    after = request.args.get('after', default=0, type=int)
+    timeout = min(max(request.args.get('timeout', default=25.0, type=float), 0.0), ALERT_WAIT_MAX)
+    event = alert_broker.wait(after, timeout)
+    if event is None:
+        return '', 204
+    return jsonify(event), 200
+
+
+@app.route('/alerts/stream', methods=['GET'])
+def alerts_stream():
+    """Server-sent events with every new latest prediction."""
+    headers = {'Cache-Control': 'no-cache'}
+    if ALERT_ALLOW_ORIGIN:
+        headers['Access-Control-Allow-Origin'] = ALERT_ALLOW_ORIGIN
+    return Response(alert_broker.sse_events(), mimetype='text/event-stream', headers=headers)
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    result = {'db_writer': writer.stats(), 'alerts': alert_broker.stats()}
+    if batcher is not None:
+        result['micro_batcher'] = batcher.stats()
+    result['model'] = registry.stats()
+    scorer = registry.current.scorer
+    if isinstance(scorer, lookup_table.LookupTableScorer):
+        result['lookup_table'] = scorer.stats()
+    return jsonify(result), 200
+
+
+@app.route('/model/reload', methods=['POST'])
+def reload_model():
+    """Check the model directory now instead of waiting for the next poll."""
+    try:
+        reloaded = registry.reload()
+    except OSError as e:
+        return jsonify({'error': f'Cannot read the model directory: {e}'}), 500
+    return jsonify({'reloaded': reloaded, **registry.stats()}), 200
+
+
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)  
@@ -0,0 +1,91 @@
+from concurrent.futures import Future
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-reading predictions into vectorized calls.
+
+    The first reading that arrives opens a window of ``max_wait`` seconds; every
+    reading submitted before the window closes (up to ``max_batch``) is scored
+    together with one ``score_fn`` call on an (n, 3) array, which returns one result
+    per reading. Each caller blocks on its own future, so a request waits at most the
+    window plus one batch scoring.
+    """
+
+    def __init__(self, score_fn, max_batch=64, max_wait=0.002, timeout=5.0):
+        self.score_fn = score_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.timeout = timeout
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_batch_seen = 0
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def predict(self, reading):
+        """Score one (temperature, humidity, sound_volume) reading and return its result.
+
+        Raises ``concurrent.futures.TimeoutError`` if it is not scored within ``timeout`` seconds.
+        """
+        future = Future()
+        self._queue.put((reading, future))
+        return future.result(timeout=self.timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'rows': self._rows,
+                'avg_batch_size': round(self._rows / self._batches, 2) if self._batches else 0,
+                'max_batch_size': self._max_batch_seen,
+                'window_ms': self.max_wait * 1000,
+                'max_batch': self.max_batch,
+            }
+
+    def _run(self):
+        while True:
+            try:
+                self._collect_and_score()
+            except Exception as e:
+                # keep the thread alive: every later prediction depends on it
+                print(f"Error in the micro-batcher: {e}")
+
+    def _collect_and_score(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        self._score(batch)
+
+    def _score(self, batch):
+        try:
+            readings = np.array([reading for reading, _ in batch], dtype=float)
+            predictions = self.score_fn(readings)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), prediction in zip(batch, predictions):
+            if not future.done():
+                future.set_result(prediction)
+
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
@@ -0,0 +1,60 @@
+"""Packed little-endian binary encodings for sensor readings.
+
+Two layouts are accepted, selected by the request's content type:
+
+* ``application/x-sensor-f32``: float32 triplets
+  ``(temperature, humidity, sound_volume)``, 12 bytes per reading.
+* ``application/x-sensor-record``: ``float64 timestamp`` (Unix seconds within MySQL's
+  TIMESTAMP range, 0 = time of receipt), ``uint32 sensor_id`` and the three float32
+  features, 24 bytes per reading.
+
+The body is viewed in place with ``np.frombuffer``; no per-reading parsing happens.
+The same layouts are written by ``data_sender/data_sender.py``.
+"""
+import numpy as np
+
+F32_CONTENT_TYPE = 'application/x-sensor-f32'
+RECORD_CONTENT_TYPE = 'application/x-sensor-record'
+PREDICTIONS_CONTENT_TYPE = 'application/octet-stream'
+# marks a reading that could not be scored in a binary predictions response
+INVALID_PREDICTION = 255
+
+F32_DTYPE = np.dtype('<f4')
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('sensor_id', '<u4'),
+    ('temperature', '<f4'),
+    ('humidity', '<f4'),
+    ('sound_volume', '<f4'),
+])
+FEATURES = ['temperature', 'humidity', 'sound_volume']
+
+
+def is_binary(content_type):
+    return content_type in (F32_CONTENT_TYPE, RECORD_CONTENT_TYPE)
+
+
+def decode(content_type, body):
+    """Return ``(features, timestamps, sensor_ids)`` for a binary body.
+
+    ``features`` is an (n, 3) float64 array; ``timestamps`` and ``sensor_ids`` are None
+    for the triplet layout. Raises ValueError if the body is not a whole number of readings.
+    """
+    if content_type == F32_CONTENT_TYPE:
+        if len(body) % (3 * F32_DTYPE.itemsize):
+            raise ValueError(f'Body length {len(body)} is not a multiple of {3 * F32_DTYPE.itemsize} bytes')
+        values = np.frombuffer(body, dtype=F32_DTYPE).reshape(-1, 3)
+        return _restore_decimals(values), None, None
+
+    if len(body) % RECORD_DTYPE.itemsize:
+        raise ValueError(f'Body length {len(body)} is not a multiple of {RECORD_DTYPE.itemsize} bytes')
+    records = np.frombuffer(body, dtype=RECORD_DTYPE)
+    values = np.column_stack([records[name] for name in FEATURES])
+    return _restore_decimals(values), records['timestamp'], records['sensor_id']
+
+
+def _restore_decimals(values):
+    # float32 cannot hold 24.3 exactly; rounding to 3 decimals gives back the float64
+    # the sensor meant, so binary and JSON readings score identically
+    return np.round(values.astype(np.float64), 3)
+
@@ -0,0 +1,285 @@
+import datetime as dt
+import queue
+import threading
+import time
+
+import mysql.connector
+from mysql.connector import pooling
+
+
+INSERT_QUERY = """
+    INSERT INTO sensor_data (temperature, humidity, sound_volume, prediction, timestamp, sensor_id, model_version)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+_STOP = object()
+
+
+class DBWriter:
+    """Background writer that batches predictions into multi-row inserts.
+
+    Rows are queued by the request threads and flushed by a single worker thread
+    through a connection pool, either when ``batch_size`` rows are waiting or when
+    the oldest queued row is ``flush_interval`` seconds old. ``on_flush(cursor, rows)``
+    runs after each insert in the same transaction.
+    """
+
+    def __init__(self, db_config, pool_size=5, max_queue=10000, batch_size=500,
+                 flush_interval=0.5, put_timeout=1.0, max_retries=3, on_flush=None,
+                 name='sensor_writer'):
+        self.db_config = db_config
+        self.name = name
+        self.on_flush = on_flush
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._thread = None
+
+        self._rows_enqueued = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+        self._sync_writes = 0
+        self._errors = 0
+        self._flushes = 0
+        self._last_flush_size = 0
+        self._max_flush_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Flush everything that is still queued and stop the worker thread."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, reading, prediction, sensor_id=0, model_version=''):
+        """Queue one (temperature, humidity, sound_volume) reading and its prediction."""
+        self.submit_many([reading], [prediction], sensor_ids=[sensor_id], model_version=model_version)
+
+    def submit_many(self, readings, predictions, timestamps=None, sensor_ids=None, model_version=''):
+        """Queue readings with their predictions; a missing timestamp means "now", a missing sensor id 0.
+
+        ``model_version`` is the model version that made all of the predictions.
+        """
+        now = dt.datetime.now()
+        if timestamps is None:
+            timestamps = [None] * len(readings)
+        if sensor_ids is None:
+            sensor_ids = [0] * len(readings)
+        for reading, prediction, timestamp, sensor_id in zip(readings, predictions, timestamps, sensor_ids):
+            # plain floats, so the rollup upsert never sees strings, None or NumPy scalars
+            row = (*map(float, reading), int(prediction), timestamp or now, int(sensor_id), model_version)
+            try:
+                self._queue.put(row, timeout=self.put_timeout)
+            except queue.Full:
+                # the worker cannot keep up: write in the caller's thread instead of losing the row
+                with self._stats_lock:
+                    self._sync_writes += 1
+                self._write([row])
+                continue
+            with self._stats_lock:
+                self._rows_enqueued += 1
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_capacity': self._queue.maxsize,
+                'rows_enqueued': self._rows_enqueued,
+                'rows_written': self._rows_written,
+                'rows_dropped': self._rows_dropped,
+                'sync_writes': self._sync_writes,
+                'errors': self._errors,
+                'flushes': self._flushes,
+                'last_flush_size': self._last_flush_size,
+                'max_flush_size': self._max_flush_size,
+                'avg_flush_size': round(self._rows_written / self._flushes, 2) if self._flushes else 0,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'max_flush_ms': round(self._max_flush_ms, 3),
+                'avg_flush_ms': round(self._total_flush_ms / self._flushes, 3) if self._flushes else 0,
+            }
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = pooling.MySQLConnectionPool(
+                    pool_name=self.name, pool_size=self.pool_size, **self.db_config
+                )
+            return self._pool
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # keep the worker alive: its shard's queue is drained by nobody else
+                    print(f"Error writing to the database, dropping {len(batch)} rows: {e}")
+                    with self._stats_lock:
+                        self._errors += 1
+                        self._rows_dropped += len(batch)
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch is full or the interval ends."""
+        batch = []
+        item = self._queue.get()
+        if item is _STOP:
+            return self._drain(batch), True
+        batch.append(item)
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return self._drain(batch), True
+            batch.append(item)
+        return batch, False
+
+    def _drain(self, batch):
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if item is not _STOP:
+                batch.append(item)
+
+    def _write(self, rows):
+        for start in range(0, len(rows), self.batch_size):
+            self._flush(rows[start:start + self.batch_size])
+
+    @staticmethod
+    def _rollback(conn):
+        if conn is None:
+            return
+        try:
+            conn.rollback()
+        except mysql.connector.Error:
+            pass
+
+    def _flush(self, rows):
+        started = time.perf_counter()
+        for attempt in range(1, self.max_retries + 1):
+            conn = None
+            try:
+                conn = self._get_pool().get_connection()
+                cursor = conn.cursor()
+                # mysql-connector rewrites executemany() of an INSERT ... VALUES into one multi-row statement
+                cursor.executemany(INSERT_QUERY, rows)
+                if self.on_flush is not None:
+                    self.on_flush(cursor, rows)
+                conn.commit()
+                cursor.close()
+                break
+            except mysql.connector.Error as e:
+                self._rollback(conn)
+                print(f"Error writing to the database (attempt {attempt}/{self.max_retries}): {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                if attempt == self.max_retries:
+                    with self._stats_lock:
+                        self._rows_dropped += len(rows)
+                    return
+                time.sleep(0.2 * attempt)
+            except Exception as e:
+                # not a database error (e.g. in on_flush), so retrying would fail the same way
+                self._rollback(conn)
+                print(f"Error writing to the database, dropping {len(rows)} rows: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                    self._rows_dropped += len(rows)
+                return
+            finally:
+                if conn is not None:
+                    conn.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self._rows_written += len(rows)
+            self._flushes += 1
+            self._last_flush_size = len(rows)
+            self._max_flush_size = max(self._max_flush_size, len(rows))
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+
+class ShardedDBWriter:
+    """Routes each reading to one of ``shards`` writers by ``sensor_id % shards``.
+
+    Every shard is a :class:`DBWriter` with its own bounded queue, worker thread and
+    connection pool, so a device that floods the service fills and slows only its own
+    shard; devices on other shards keep their flush latency. Devices that hash to the
+    same shard share it. Rows of one device always go through the same shard, in order.
+    """
+
+    def __init__(self, db_config, shards=4, **kwargs):
+        self.shards = [DBWriter(db_config, name=f'sensor_writer_{i}', **kwargs) for i in range(max(1, shards))]
+
+    def shard_for(self, sensor_id):
+        return self.shards[int(sensor_id) % len(self.shards)]
+
+    def start(self):
+        for shard in self.shards:
+            shard.start()
+
+    def stop(self, timeout=10.0):
+        for shard in self.shards:
+            shard.stop(timeout)
+
+    def submit(self, reading, prediction, sensor_id=0, model_version=''):
+        self.shard_for(sensor_id).submit(reading, prediction, sensor_id, model_version)
+
+    def submit_many(self, readings, predictions, timestamps=None, sensor_ids=None, model_version=''):
+        if sensor_ids is None or len(self.shards) == 1:
+            # every row lands on the same shard (sensor 0 when no ids are given)
+            self.shards[0].submit_many(readings, predictions, timestamps, sensor_ids, model_version)
+            return
+        if timestamps is None:
+            timestamps = [None] * len(readings)
+        groups = {}
+        for reading, prediction, timestamp, sensor_id in zip(readings, predictions, timestamps, sensor_ids):
+            group = groups.setdefault(int(sensor_id) % len(self.shards), ([], [], [], []))
+            for column, value in zip(group, (reading, prediction, timestamp, sensor_id)):
+                column.append(value)
+        for index, (shard_readings, shard_predictions, shard_timestamps, shard_sensors) in groups.items():
+            self.shards[index].submit_many(shard_readings, shard_predictions, shard_timestamps, shard_sensors,
+                                           model_version)
+
+    def stats(self):
+        """Totals over all shards, followed by each shard's own ``DBWriter.stats()``."""
+        shards = [shard.stats() for shard in self.shards]
+        total = {key: sum(s[key] for s in shards) for key in (
+            'queue_depth', 'queue_capacity', 'rows_enqueued', 'rows_written', 'rows_dropped', 'sync_writes', 'errors', 'flushes',
+        )}
+        total['max_flush_size'] = max(s['max_flush_size'] for s in shards)
+        total['max_flush_ms'] = max(s['max_flush_ms'] for s in shards)
+        total['avg_flush_size'] = round(total['rows_written'] / total['flushes'], 2) if total['flushes'] else 0
+        total['avg_flush_ms'] = (
+            round(sum(s['avg_flush_ms'] * s['flushes'] for s in shards) / total['flushes'], 3) if total['flushes'] else 0
+        )
+        total['shards'] = shards
+        return total
@@ -0,0 +1,410 @@
+"""Fused scaler + estimator scorers for the 3-feature anomaly model.
+
+``compile_scorer`` turns the fitted ``StandardScaler`` and the estimator saved by
+``model_not_need/model.py`` into one object that scores plain NumPy arrays without
+sklearn's input validation. Single readings reuse per-thread buffers, so
+``predict_one`` does not allocate intermediate arrays for the supported estimators.
+
+Run ``python fast_model.py --check ../model_not_need/dataset.csv`` to compare every
+supported estimator type against the sklearn pipeline and print the latency of both.
+"""
+import threading
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import SVC
+
+TREE_LEAF = -1
+# larger batches are handed to the estimator's own compiled predict after fused scaling
+FUSED_BATCH_MAX = 64
+
+
+class SklearnScorer:
+    """Reference scorer that goes through sklearn's own transform/predict."""
+
+    name = 'sklearn'
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+
+    def predict(self, X):
+        return self.model.predict(self.scaler.transform(np.asarray(X, dtype=float))).astype(int)
+
+    def predict_one(self, temperature, humidity, sound_volume):
+        return int(self.predict([[temperature, humidity, sound_volume]])[0])
+
+
+class _FusedScorer:
+    """Common scaling for the fused scorers.
+
+    Subclasses implement ``_predict_scaled`` for small batches and ``_predict_buffer``
+    for the single-row path, which reads the scaled reading from the thread's buffers.
+    """
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.mean = np.array(scaler.mean_, dtype=np.float64)
+        self.scale = np.array(scaler.scale_, dtype=np.float64)
+        self.classes = [int(c) for c in model.classes_]
+        self._local = threading.local()
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        scaled = (X - self.mean) / self.scale
+        if len(scaled) > FUSED_BATCH_MAX:
+            return self.model.predict(scaled).astype(int)
+        return self._predict_scaled(scaled)
+
+    def predict_one(self, temperature, humidity, sound_volume):
+        buffers = self._buffers()
+        x = buffers['x']
+        x[0] = temperature
+        x[1] = humidity
+        x[2] = sound_volume
+        np.subtract(x, self.mean, out=x)
+        np.divide(x, self.scale, out=x)
+        return self._predict_buffer(buffers)
+
+    def _buffers(self):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = {'x': np.empty(3, dtype=np.float64)}
+            buffers.update(self._make_buffers())
+            self._local.buffers = buffers
+        return buffers
+
+    def _make_buffers(self):
+        return {}
+
+    def _label(self, positive):
+        return self.classes[1] if positive else self.classes[0]
+
+
+class LinearScorer(_FusedScorer):
+    """Binary LogisticRegression: sign of ``coef . x + intercept``."""
+
+    name = 'linear'
+
+    def __init__(self, model, scaler):
+        super().__init__(model, scaler)
+        self.coef = np.array(model.coef_[0], dtype=np.float64)
+        self.intercept = float(model.intercept_[0])
+
+    def _predict_scaled(self, scaled):
+        decision = scaled @ self.coef + self.intercept
+        return np.where(decision > 0, self.classes[1], self.classes[0])
+
+    def _predict_buffer(self, buffers):
+        return self._label(float(np.dot(buffers['x'], self.coef)) + self.intercept > 0)
+
+
+class KernelScorer(_FusedScorer):
+    """Binary SVC: ``dual_coef . K(support_vectors, x) + intercept``."""
+
+    name = 'kernel'
+
+    def __init__(self, model, scaler):
+        super().__init__(model, scaler)
+        self.kernel = model.kernel
+        self.gamma = float(model._gamma)
+        self.coef0 = float(model.coef0)
+        self.degree = int(model.degree)
+        self.support_vectors = np.ascontiguousarray(model.support_vectors_, dtype=np.float64)
+        self.dual_coef = np.array(model.dual_coef_[0], dtype=np.float64)
+        self.intercept = float(model.intercept_[0])
+
+    def _kernel(self, scaled):
+        if self.kernel == 'rbf':
+            sq_dist = ((scaled[:, None, :] - self.support_vectors[None, :, :]) ** 2).sum(axis=2)
+            return np.exp(-self.gamma * sq_dist)
+        dot = scaled @ self.support_vectors.T
+        if self.kernel == 'linear':
+            return dot
+        if self.kernel == 'poly':
+            return (self.gamma * dot + self.coef0) ** self.degree
+        return np.tanh(self.gamma * dot + self.coef0)
+
+    def _predict_scaled(self, scaled):
+        decision = self._kernel(scaled) @ self.dual_coef + self.intercept
+        return np.where(decision > 0, self.classes[1], self.classes[0])
+
+    def _make_buffers(self):
+        return {
+            'sv': np.empty_like(self.support_vectors),
+            'k': np.empty(len(self.support_vectors), dtype=np.float64),
+        }
+
+    def _predict_buffer(self, buffers):
+        x, sv, k = buffers['x'], buffers['sv'], buffers['k']
+        if self.kernel == 'rbf':
+            np.subtract(self.support_vectors, x, out=sv)
+            np.multiply(sv, sv, out=sv)
+            np.sum(sv, axis=1, out=k)
+            np.multiply(k, -self.gamma, out=k)
+            np.exp(k, out=k)
+        else:
+            np.dot(self.support_vectors, x, out=k)
+            if self.kernel == 'poly':
+                np.multiply(k, self.gamma, out=k)
+                np.add(k, self.coef0, out=k)
+                np.power(k, self.degree, out=k)
+            elif self.kernel == 'sigmoid':
+                np.multiply(k, self.gamma, out=k)
+                np.add(k, self.coef0, out=k)
+                np.tanh(k, out=k)
+        return self._label(float(np.dot(k, self.dual_coef)) + self.intercept > 0)
+
+
+class NeighborsScorer(_FusedScorer):
+    """Uniform-weight euclidean KNeighborsClassifier over the stored training set."""
+
+    name = 'neighbors'
+
+    def __init__(self, model, scaler):
+        super().__init__(model, scaler)
+        self.fit_X = np.ascontiguousarray(model._fit_X, dtype=np.float64)
+        self.y = np.asarray(model._y, dtype=np.intp)
+        self.k = int(model.n_neighbors)
+
+    def _predict_scaled(self, scaled):
+        sq_dist = ((scaled[:, None, :] - self.fit_X[None, :, :]) ** 2).sum(axis=2)
+        nearest = np.argpartition(sq_dist, self.k - 1, axis=1)[:, :self.k]
+        positive_votes = self.y[nearest].sum(axis=1)
+        # a tied vote goes to the first class, as in sklearn's mode
+        return np.where(positive_votes > self.k - positive_votes, self.classes[1], self.classes[0])
+
+    def _make_buffers(self):
+        return {
+            'diff': np.empty_like(self.fit_X),
+            'dist': np.empty(len(self.fit_X), dtype=np.float64),
+        }
+
+    def _predict_buffer(self, buffers):
+        diff, dist = buffers['diff'], buffers['dist']
+        np.subtract(self.fit_X, buffers['x'], out=diff)
+        np.multiply(diff, diff, out=diff)
+        np.sum(diff, axis=1, out=dist)
+        nearest = np.argpartition(dist, self.k - 1)[:self.k]
+        positive_votes = int(self.y[nearest].sum())
+        return self._label(positive_votes > self.k - positive_votes)
+
+
+class TreeEnsembleScorer(_FusedScorer):
+    """RandomForest / binary GradientBoosting as flat, precomputed node arrays.
+
+    All trees are packed into one set of arrays. Leaves point to themselves with an
+    infinite threshold, so every tree can be walked in lockstep for ``max_depth``
+    steps with a handful of vectorized ``take`` calls. Like sklearn, the scaled
+    features are compared as float32.
+    """
+
+    name = 'trees'
+
+    def __init__(self, model, scaler):
+        super().__init__(model, scaler)
+        if isinstance(model, GradientBoostingClassifier):
+            trees = [est.tree_ for est in model.estimators_[:, 0]]
+            self.boosted = True
+            self.learning_rate = float(model.learning_rate)
+            self.init_raw = self._init_raw(model)
+        else:
+            trees = [est.tree_ for est in model.estimators_]
+            self.boosted = False
+
+        left, right, feature, threshold, value, roots = [], [], [], [], [], []
+        offset = 0
+        for tree in trees:
+            ids = np.arange(tree.node_count) + offset
+            is_leaf = tree.children_left == TREE_LEAF
+            left.append(np.where(is_leaf, ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, ids, tree.children_right + offset))
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            if self.boosted:
+                value.append(tree.value[:, 0, 0])
+            else:
+                counts = tree.value[:, 0, :]
+                value.append(counts[:, 1] / counts.sum(axis=1))
+            roots.append(offset)
+            offset += tree.node_count
+
+        self.left = np.concatenate(left).astype(np.intp)
+        self.right = np.concatenate(right).astype(np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        self.value = np.concatenate(value).astype(np.float64)
+        self.roots = np.array(roots, dtype=np.intp)
+        self.n_trees = len(trees)
+        self.depth = max(tree.max_depth for tree in trees)
+
+    @staticmethod
+    def _init_raw(model):
+        if isinstance(model.init_, str) and model.init_ == 'zero':
+            return 0.0
+        proba = model.init_.predict_proba(np.zeros((1, model.n_features_in_)))[0, 1]
+        proba = np.clip(proba, np.finfo(np.float64).eps, 1 - np.finfo(np.float64).eps)
+        return float(np.log(proba / (1 - proba)))
+
+    def _decide(self, leaf_sum):
+        if self.boosted:
+            return self.init_raw + self.learning_rate * leaf_sum > 0
+        # mean P(class 1) over the trees beats mean P(class 0) = 1 - mean P(class 1)
+        return leaf_sum / self.n_trees > 0.5
+
+    def _predict_scaled(self, scaled):
+        x = scaled.astype(np.float32)
+        nodes = np.broadcast_to(self.roots, (len(x), self.n_trees)).copy()
+        rows = np.arange(len(x))[:, None]
+        for _ in range(self.depth):
+            go_left = x[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        positive = self._decide(self.value[nodes].sum(axis=1))
+        return np.where(positive, self.classes[1], self.classes[0])
+
+    def _make_buffers(self):
+        n = self.n_trees
+        return {
+            'x32': np.empty(3, dtype=np.float32),
+            'nodes': np.empty(n, dtype=np.intp),
+            'feature': np.empty(n, dtype=np.intp),
+            'values': np.empty(n, dtype=np.float32),
+            'threshold': np.empty(n, dtype=np.float64),
+            'go_left': np.empty(n, dtype=bool),
+            'left': np.empty(n, dtype=np.intp),
+            'right': np.empty(n, dtype=np.intp),
+            'leaf': np.empty(n, dtype=np.float64),
+        }
+
+    def _predict_buffer(self, buffers):
+        x32, nodes = buffers['x32'], buffers['nodes']
+        feature, values, threshold = buffers['feature'], buffers['values'], buffers['threshold']
+        go_left, left, right = buffers['go_left'], buffers['left'], buffers['right']
+
+        x32[:] = buffers['x']
+        nodes[:] = self.roots
+        for _ in range(self.depth):
+            np.take(self.feature, nodes, out=feature)
+            np.take(x32, feature, out=values)
+            np.take(self.threshold, nodes, out=threshold)
+            np.less_equal(values, threshold, out=go_left)
+            np.take(self.left, nodes, out=left)
+            np.take(self.right, nodes, out=right)
+            np.copyto(nodes, right)
+            np.copyto(nodes, left, where=go_left)
+        np.take(self.value, nodes, out=buffers['leaf'])
+        return self._label(self._decide(float(buffers['leaf'].sum())))
+
+
+def compile_scorer(model, scaler):
+    """Return the fused scorer for ``model``, or ``SklearnScorer`` if the estimator is not supported."""
+    try:
+        if getattr(scaler, 'with_mean', True) is False or getattr(scaler, 'with_std', True) is False:
+            raise ValueError('scaler without centering or scaling')
+        if len(getattr(model, 'classes_', [])) != 2:
+            raise ValueError('only binary classifiers are fused')
+
+        if isinstance(model, LogisticRegression):
+            return LinearScorer(model, scaler)
+        if isinstance(model, SVC):
+            if model.kernel not in ('rbf', 'linear', 'poly', 'sigmoid'):
+                raise ValueError(f'kernel {model.kernel!r}')
+            return KernelScorer(model, scaler)
+        if isinstance(model, KNeighborsClassifier):
+            if model.weights != 'uniform' or model.effective_metric_ != 'euclidean':
+                raise ValueError('only uniform-weight euclidean neighbors')
+            return NeighborsScorer(model, scaler)
+        if isinstance(model, RandomForestClassifier):
+            return TreeEnsembleScorer(model, scaler)
+        if isinstance(model, GradientBoostingClassifier):
+            if model.loss not in ('log_loss', 'deviance'):
+                raise ValueError(f'loss {model.loss!r}')
+            return TreeEnsembleScorer(model, scaler)
+        raise ValueError(f'{model.__class__.__name__} is not supported')
+    except Exception as e:
+        print(f"Fast path unavailable, using sklearn: {e}")
+        return SklearnScorer(model, scaler)
+
+
+def _check(dataset_path, repeats):
+    """Compare each fused scorer with the sklearn pipeline on the dataset and time both."""
+    import time
+
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+    from sklearn.preprocessing import StandardScaler
+
+    df = pd.read_csv(dataset_path).drop_duplicates()
+    X = df[['temperature', 'humidity', 'sound_volume']]
+    y = df['target']
+    X_train, _, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=50)
+
+    scaler = StandardScaler().fit(X_train)
+    X_train_scaled = scaler.transform(X_train)
+    rows = X.to_numpy(dtype=float)
+
+    models = {
+        'Logistic Regression': LogisticRegression(),
+        'Random Forest': RandomForestClassifier(),
+        'Support Vector Machine': SVC(),
+        'K-Nearest Neighbors': KNeighborsClassifier(),
+        'Gradient Boosting': GradientBoostingClassifier(),
+    }
+
+    failed = False
+    for name, model in models.items():
+        model.fit(X_train_scaled, y_train)
+        reference = SklearnScorer(model, scaler)
+        fused = compile_scorer(model, scaler)
+
+        expected = reference.predict(rows)
+        small_batches = np.concatenate([
+            fused.predict(rows[start:start + FUSED_BATCH_MAX]) for start in range(0, len(rows), FUSED_BATCH_MAX)
+        ])
+        batch_mismatches = int((small_batches != expected).sum()) + int((fused.predict(rows) != expected).sum())
+        single_mismatches = sum(fused.predict_one(*row) != p for row, p in zip(rows, expected))
+        failed |= batch_mismatches > 0 or single_mismatches > 0
+
+        sample = rows[:repeats]
+        start = time.perf_counter()
+        for row in sample:
+            reference.predict_one(*row)
+        sklearn_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        for row in sample:
+            fused.predict_one(*row)
+        fused_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+        start = time.perf_counter()
+        reference.predict(rows)
+        sklearn_batch_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fused.predict(rows)
+        fused_batch_ms = (time.perf_counter() - start) * 1000
+
+        print(
+            f"{name:<24} scorer={fused.name:<9} mismatches batch={batch_mismatches} single={single_mismatches} | "
+            f"single row: sklearn {sklearn_us:8.1f} us, fused {fused_us:7.1f} us | "
+            f"{len(rows)} rows: sklearn {sklearn_batch_ms:7.1f} ms, fused {fused_batch_ms:7.1f} ms"
+        )
+    return not failed
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    import warnings
+
+    parser = argparse.ArgumentParser(description='Check the fused scorers against the sklearn pipeline.')
+    parser.add_argument('--check', metavar='DATASET', required=True, help='path to model_not_need/dataset.csv')
+    parser.add_argument('--repeats', type=int, default=500, help='single-row calls to time per model')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    sys.exit(0 if _check(args.check, args.repeats) else 1)
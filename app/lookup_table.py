@@ -0,0 +1,163 @@
+"""Precomputed decision table over the quantized sensor grid.
+
+The sensors report every feature with one decimal, inside bounded ranges, so the
+model's prediction for every possible reading can be computed once and stored as
+one bit per grid cell. The packed table is memory-mapped from disk; a reading that
+lies exactly on the grid is then scored with one array index, and everything else
+goes to the wrapped scorer.
+"""
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+# readings are reported to one decimal place
+STEPS_PER_UNIT = 10
+DEFAULT_RANGES = '18:30,38:62,20:105'
+# grid rows scored per predict call while building
+BUILD_CHUNK = 1_000_000
+
+
+def parse_ranges(spec):
+    """Parse ``"lo:hi,lo:hi,lo:hi"`` (temperature, humidity, sound_volume) into grid index bounds."""
+    bounds = []
+    for part in spec.split(','):
+        lo, hi = (float(v) for v in part.split(':'))
+        bounds.append((int(round(lo * STEPS_PER_UNIT)), int(round(hi * STEPS_PER_UNIT))))
+    if len(bounds) != 3 or any(lo > hi for lo, hi in bounds):
+        raise ValueError(f'Expected three lo:hi ranges, got {spec!r}')
+    return bounds
+
+
+class LookupTableScorer:
+    """Scorer that answers on-grid readings from the bit table and delegates the rest."""
+
+    name = 'lookup'
+
+    def __init__(self, bits, bounds, classes, fallback, build_seconds, built):
+        self.bits = bits
+        self.bounds = bounds
+        self.classes = [int(c) for c in classes]
+        self.fallback = fallback
+        self.build_seconds = build_seconds
+        self.built = built
+
+        self.lows = [lo for lo, _ in bounds]
+        self.highs = [hi for _, hi in bounds]
+        self.sizes = [hi - lo + 1 for lo, hi in bounds]
+        self.hits = 0
+        self.fallbacks = 0
+        self._stats_lock = threading.Lock()
+
+    def _cell(self, value, axis):
+        """Grid index of ``value`` on ``axis``, or None if it is off the grid or out of range."""
+        q = round(value * STEPS_PER_UNIT)
+        if q / STEPS_PER_UNIT != value or q < self.lows[axis] or q > self.highs[axis]:
+            return None
+        return q - self.lows[axis]
+
+    def predict_one(self, temperature, humidity, sound_volume):
+        t = self._cell(float(temperature), 0)
+        h = self._cell(float(humidity), 1)
+        s = self._cell(float(sound_volume), 2)
+        if t is None or h is None or s is None:
+            with self._stats_lock:
+                self.fallbacks += 1
+            return self.fallback.predict_one(temperature, humidity, sound_volume)
+
+        with self._stats_lock:
+            self.hits += 1
+        index = (t * self.sizes[1] + h) * self.sizes[2] + s
+        bit = (int(self.bits[index >> 3]) >> (7 - (index & 7))) & 1
+        return self.classes[bit]
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        q = np.rint(X * STEPS_PER_UNIT)
+        lows = np.array(self.lows)
+        highs = np.array(self.highs)
+        on_grid = ((q / STEPS_PER_UNIT == X) & (q >= lows) & (q <= highs)).all(axis=1)
+
+        out = np.empty(len(X), dtype=int)
+        if on_grid.any():
+            cells = (q[on_grid] - lows).astype(np.int64)
+            index = (cells[:, 0] * self.sizes[1] + cells[:, 1]) * self.sizes[2] + cells[:, 2]
+            bit = (self.bits[index >> 3] >> (7 - (index & 7)).astype(np.uint8)) & 1
+            out[on_grid] = np.asarray(self.classes)[bit]
+        if not on_grid.all():
+            out[~on_grid] = self.fallback.predict(X[~on_grid])
+
+        hits = int(on_grid.sum())
+        with self._stats_lock:
+            self.hits += hits
+            self.fallbacks += len(X) - hits
+        return out
+
+    def stats(self):
+        with self._stats_lock:
+            hits, fallbacks = self.hits, self.fallbacks
+        return {
+            'cells': int(np.prod(self.sizes)),
+            'table_bytes': int(self.bits.nbytes),
+            'build_seconds': round(self.build_seconds, 3),
+            'built_at_startup': self.built,
+            'hits': hits,
+            'fallbacks': fallbacks,
+        }
+
+
+def build_table(scorer, classes, bounds):
+    """Score every grid cell with ``scorer`` and return the packed bit table."""
+    axes = [np.arange(lo, hi + 1) / STEPS_PER_UNIT for lo, hi in bounds]
+    sizes = [len(axis) for axis in axes]
+    plane = sizes[1] * sizes[2]
+    humidity, sound = np.meshgrid(axes[1], axes[2], indexing='ij')
+    humidity, sound = humidity.ravel(), sound.ravel()
+
+    positive = np.empty(sizes[0] * plane, dtype=bool)
+    planes_per_chunk = max(1, BUILD_CHUNK // plane)
+    for start in range(0, sizes[0], planes_per_chunk):
+        temperatures = axes[0][start:start + planes_per_chunk]
+        grid = np.column_stack([
+            np.repeat(temperatures, plane),
+            np.tile(humidity, len(temperatures)),
+            np.tile(sound, len(temperatures)),
+        ])
+        positive[start * plane:(start + len(temperatures)) * plane] = scorer.predict(grid) == classes[1]
+    return np.packbits(positive)
+
+
+def load_or_build(scorer, classes, model_key, path, ranges=DEFAULT_RANGES):
+    """Memory-map the table at ``path`` if it was built for ``model_key`` and ``ranges``, else build it."""
+    bounds = parse_ranges(ranges)
+    meta_path = path + '.json'
+    meta = {'model_key': model_key, 'bounds': bounds, 'steps_per_unit': STEPS_PER_UNIT}
+
+    built = False
+    started = time.perf_counter()
+    try:
+        with open(meta_path) as f:
+            stored = json.load(f)
+        if {k: stored.get(k) for k in meta} != json.loads(json.dumps(meta)):
+            raise ValueError('table was built for another model or grid')
+        build_seconds = stored['build_seconds']
+    except (OSError, ValueError, KeyError):
+        bits = build_table(scorer, classes, bounds)
+        build_seconds = time.perf_counter() - started
+        tmp_path = path + '.tmp'
+        bits.tofile(tmp_path)
+        os.replace(tmp_path, path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({**meta, 'build_seconds': build_seconds, 'bytes': int(bits.nbytes)}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+        built = True
+
+    bits = np.memmap(path, dtype=np.uint8, mode='r')
+    table = LookupTableScorer(bits, bounds, classes, scorer, build_seconds, built)
+    print(
+        f"Lookup table {'built' if built else 'loaded'}: {table.stats()['cells']} cells, "
+        f"{bits.nbytes / 1024:.1f} KiB, build time {build_seconds:.2f} s"
+    )
+    return table
@@ -0,0 +1,223 @@
+"""Versioned model directory with memory-mapped loading and hot reload.
+
+A version is a subdirectory of the model directory with ``pipeline.joblib`` (the
+scaler + model ``Pipeline`` written by ``model_not_need/model.py``) and ``meta.json``.
+``publish`` writes a version under a hidden temporary name and renames it into place,
+so the service never sees a half-written one. The newest version is served (names
+start with the publish time, so they sort by age) unless one is pinned.
+
+Pipelines are stored uncompressed and loaded with ``mmap_mode='r'``. The estimator's
+NumPy arrays (support vectors, the training points of nearest neighbours) are then
+read from the page cache instead of being copied, and every process that loads the
+same version, such as forked workers, shares those pages. scikit-learn copies tree
+nodes out of the file when it unpickles them, so forests gain little.
+
+``ModelRegistry.current`` is an immutable ``LoadedModel``. A watcher thread polls the
+directory; a new version is loaded, compiled and test-scored in the background and
+then swapped in with one assignment. Requests read ``current`` once and score with
+that object throughout, so requests in flight finish on the version they started with.
+
+    python model_registry.py publish ../app/model_pipeline.joblib --dir models
+    python model_registry.py list --dir models
+"""
+import argparse
+import collections
+import datetime as dt
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import joblib
+import numpy as np
+
+PIPELINE_FILE = 'pipeline.joblib'
+META_FILE = 'meta.json'
+# stored with every prediction in sensor_data.model_version (VARCHAR(64))
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+
+LoadedModel = collections.namedtuple(
+    'LoadedModel', ['version', 'model', 'scaler', 'scorer', 'fingerprint', 'load_seconds', 'loaded_at']
+)
+
+
+def file_fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_pipeline(path, mmap=True):
+    """``(model, scaler)`` of a saved pipeline, with its arrays memory-mapped by default."""
+    pipeline = joblib.load(path, mmap_mode='r' if mmap else None)
+    return pipeline.named_steps['model'], pipeline.named_steps['scaler']
+
+
+def list_versions(directory):
+    """Complete versions in ``directory``, oldest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names
+                  if not name.startswith('.') and os.path.isfile(os.path.join(directory, name, PIPELINE_FILE)))
+
+
+def publish(pipeline_path, directory, version=None):
+    """Add a saved pipeline to ``directory`` as a new version and return its name."""
+    pipeline = joblib.load(pipeline_path)
+    if not {'scaler', 'model'} <= set(pipeline.named_steps):
+        raise ValueError("the pipeline needs 'scaler' and 'model' steps")
+    fingerprint = file_fingerprint([pipeline_path])
+    version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{fingerprint[:8]}"
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"invalid version name {version!r}")
+    target = os.path.join(directory, version)
+    if os.path.exists(target):
+        raise ValueError(f"version {version} already exists")
+
+    incoming = os.path.join(directory, f'.incoming-{version}')
+    os.makedirs(incoming)
+    # uncompressed, so that the arrays can be memory-mapped
+    joblib.dump(pipeline, os.path.join(incoming, PIPELINE_FILE))
+    with open(os.path.join(incoming, META_FILE), 'w') as f:
+        json.dump({
+            'version': version,
+            'fingerprint': fingerprint,
+            'model': pipeline.named_steps['model'].__class__.__name__,
+            'source': os.path.abspath(pipeline_path),
+            'published_at': dt.datetime.now().isoformat(timespec='seconds'),
+        }, f, indent=2)
+    os.rename(incoming, target)
+    return version
+
+
+class ModelRegistry:
+    """Serve the newest (or ``pinned``) version of ``directory`` and swap in new ones.
+
+    ``build_scorer(model, scaler, fingerprint)`` turns a loaded version into the
+    scorer requests use. While the directory has no version, ``fallback()`` provides
+    ``(model, scaler, paths)`` of the bundled model files.
+    """
+
+    def __init__(self, directory, build_scorer, fallback=None, pinned=None, poll_interval=5.0):
+        self.directory = directory
+        self.build_scorer = build_scorer
+        self.fallback = fallback
+        self.pinned = pinned
+        self.poll_interval = poll_interval
+        self.current = None
+        self.reloads = 0
+        self.failures = 0
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Load the version to serve, then watch the directory for new ones."""
+        version = self.wanted()
+        if version is not None:
+            self.current = self.load(version)
+        elif self.fallback is not None:
+            started = time.perf_counter()
+            model, scaler, paths = self.fallback()
+            fingerprint = file_fingerprint(paths)
+            self.current = self._prepare(f"bundled-{fingerprint[:8]}", model, scaler, fingerprint, started)
+        else:
+            raise FileNotFoundError(f"no model version in {self.directory}")
+        print(f"Serving model version {self.current.version}, loaded in {self.current.load_seconds:.3f} s")
+
+        if self.poll_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def wanted(self):
+        versions = list_versions(self.directory)
+        if self.pinned:
+            return self.pinned if self.pinned in versions else None
+        return versions[-1] if versions else None
+
+    def load(self, version):
+        started = time.perf_counter()
+        path = os.path.join(self.directory, version, PIPELINE_FILE)
+        model, scaler = load_pipeline(path)
+        try:
+            with open(os.path.join(self.directory, version, META_FILE)) as f:
+                fingerprint = json.load(f)['fingerprint']
+        except (OSError, ValueError, KeyError):
+            fingerprint = file_fingerprint([path])
+        return self._prepare(version, model, scaler, fingerprint, started)
+
+    def _prepare(self, version, model, scaler, fingerprint, started):
+        scorer = self.build_scorer(model, scaler, fingerprint)
+        # fail here rather than in the first request if the version cannot score
+        scorer.predict(np.asarray([scaler.mean_], dtype=float))
+        return LoadedModel(version, model, scaler, scorer, fingerprint, time.perf_counter() - started, time.time())
+
+    def reload(self):
+        """Serve the wanted version if it changed; True when a new version was swapped in."""
+        with self._lock:
+            version = self.wanted()
+            if version is None or version == self.current.version or version in self._failed:
+                return False
+            try:
+                loaded = self.load(version)
+            except Exception as e:
+                print(f"Error loading model version {version}, keeping {self.current.version}: {e}")
+                self._failed.add(version)
+                self.failures += 1
+                return False
+            previous, self.current = self.current, loaded
+            self.reloads += 1
+        print(f"Serving model version {version} (was {previous.version}), loaded in {loaded.load_seconds:.3f} s")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.reload()
+            except OSError as e:
+                print(f"Error checking {self.directory} for model versions: {e}")
+
+    def stats(self):
+        current = self.current
+        return {
+            'version': current.version,
+            'model': current.model.__class__.__name__,
+            'scorer': current.scorer.name,
+            'load_seconds': round(current.load_seconds, 4),
+            'loaded_at': dt.datetime.fromtimestamp(current.loaded_at).isoformat(timespec='seconds'),
+            'reloads': self.reloads,
+            'failures': self.failures,
+            'pinned': self.pinned,
+            'available': list_versions(self.directory),
+        }
+
+
+if __name__ == "__main__":
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--dir', default=os.getenv('MODEL_DIR', 'models'), help='model directory (MODEL_DIR)')
+    parser = argparse.ArgumentParser(description='Manage the versioned model directory.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish_parser = commands.add_parser('publish', parents=[common],
+                                         help='add a saved scaler + model pipeline as a new version')
+    publish_parser.add_argument('pipeline', help='pipeline file written by model_not_need/model.py')
+    publish_parser.add_argument('--version', help='version name (default: publish time and file hash)')
+    commands.add_parser('list', parents=[common], help='list the versions, oldest first')
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        os.makedirs(args.dir, exist_ok=True)
+        print(f"Published version {publish(args.pipeline, args.dir, args.version)} to {args.dir}")
+    else:
+        for name in list_versions(args.dir):
+            print(name)
@@ -0,0 +1,66 @@
+"""Incremental per-minute and per-hour rollups of ``sensor_data``.
+
+Every flush of the database writer aggregates its rows by bucket and upserts the
+totals into ``sensor_data_rollup_minute`` and ``sensor_data_rollup_hour`` in the same
+transaction as the raw insert, so the rollups always match the raw table.
+``database/backfill_rollups.py`` rebuilds them from existing data.
+"""
+METRICS = ['temperature', 'humidity', 'sound_volume']
+
+ROLLUP_TABLES = {
+    'sensor_data_rollup_minute': lambda ts: ts.replace(second=0, microsecond=0),
+    'sensor_data_rollup_hour': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+}
+
+_COLUMNS = ['bucket_start', 'reading_count', 'anomaly_count'] + [
+    f'{metric}_{agg}' for metric in METRICS for agg in ('sum', 'min', 'max')
+]
+_UPDATES = ['reading_count = reading_count + VALUES(reading_count)',
+            'anomaly_count = anomaly_count + VALUES(anomaly_count)']
+for _metric in METRICS:
+    _UPDATES += [
+        f'{_metric}_sum = {_metric}_sum + VALUES({_metric}_sum)',
+        f'{_metric}_min = LEAST({_metric}_min, VALUES({_metric}_min))',
+        f'{_metric}_max = GREATEST({_metric}_max, VALUES({_metric}_max))',
+    ]
+
+UPSERT_QUERY = """
+    INSERT INTO {table} ({columns})
+    VALUES ({placeholders})
+    ON DUPLICATE KEY UPDATE {updates}
+"""
+
+
+def aggregate(rows, bucket_of):
+    """Group writer rows ``(temperature, humidity, sound_volume, prediction, timestamp, sensor_id, model_version)`` by bucket.
+
+    Buckets are returned in time order, so concurrent writer shards upserting the same
+    buckets lock them in the same order and wait for each other instead of deadlocking.
+    """
+    buckets = {}
+    for temperature, humidity, sound_volume, prediction, timestamp, *_ in rows:
+        bucket = bucket_of(timestamp)
+        values = (temperature, humidity, sound_volume)
+        totals = buckets.get(bucket)
+        if totals is None:
+            totals = buckets[bucket] = [0, 0] + [v for value in values for v in (0.0, value, value)]
+        totals[0] += 1
+        totals[1] += prediction == 1
+        for i, value in enumerate(values):
+            base = 2 + 3 * i
+            totals[base] += value
+            totals[base + 1] = min(totals[base + 1], value)
+            totals[base + 2] = max(totals[base + 2], value)
+    return [(bucket, *totals) for bucket, totals in sorted(buckets.items())]
+
+
+def update_rollups(cursor, rows):
+    """Add a flushed batch of rows to every rollup table, inside the caller's transaction."""
+    for table, bucket_of in ROLLUP_TABLES.items():
+        query = UPSERT_QUERY.format(
+            table=table,
+            columns=', '.join(_COLUMNS),
+            placeholders=', '.join(['%s'] * len(_COLUMNS)),
+            updates=', '.join(_UPDATES),
+        )
+        cursor.executemany(query, aggregate(rows, bucket_of))
@@ -0,0 +1,70 @@
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+
+class AlertSubscriber:
+    """Background long-poll client for the Flask service's ``/alerts`` channel.
+
+    Holds the latest published prediction in memory so the alert callback never
+    touches the database while the channel is up. ``latest()`` returns None when
+    the channel is down or has not published anything since the service started;
+    callers then fall back to reading the newest row.
+    """
+
+    def __init__(self, url, wait=25.0, retry_interval=2.0):
+        self.url = url
+        self.wait = wait
+        self.retry_interval = retry_interval
+
+        self._latest = None
+        self._connected = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.events = 0
+        self.errors = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='alert-subscriber', daemon=True)
+        self._thread.start()
+
+    def latest(self):
+        with self._lock:
+            return self._latest if self._connected else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'url': self.url,
+                'connected': self._connected,
+                'seq': self._latest['seq'] if self._latest else None,
+                'events': self.events,
+                'errors': self.errors,
+            }
+
+    def _run(self):
+        while True:
+            seq = self._latest['seq'] if self._latest else 0
+            query = urllib.parse.urlencode({'after': seq, 'timeout': self.wait})
+            try:
+                with urllib.request.urlopen(f"{self.url}?{query}", timeout=self.wait + 10) as response:
+                    body = response.read()
+                    event = json.loads(body) if response.status == 200 and body else None
+            except (OSError, ValueError) as e:
+                with self._lock:
+                    if self._connected:
+                        print(f"Alert channel unavailable, falling back to the database: {e}")
+                    self._connected = False
+                    self.errors += 1
+                time.sleep(self.retry_interval)
+                continue
+
+            with self._lock:
+                self._connected = True
+                if event is not None:
+                    self._latest = event
+                    self.events += 1
@@ -1,6 +1,6 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import dash_ag_grid as dag
 import plotly.express as px
 import plotly.graph_objects as go
@@ -8,75 +8,242 @@ import pandas as pd
 from sqlalchemy import create_engine
 import re
 import datetime as dt
+import os
+import sys
+# modules shared with the Flask service; the image copies common/ to /common
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
 from db_config import engine
-from data_processing import validate_time_format, fetch_data
-from app_layout import create_layout
+from data_processing import (validate_time_format, fetch_data, fetch_stats, for_sensor, is_realtime,
+                             latest_prediction, query_cache, realtime_buffer, alert_subscriber, archive)
+from app_layout import ALERT_STREAM_URL, create_layout
+from downsampling import GRAPH_MAX_POINTS, downsample, render_mode
+from grid_model import fetch_rows_block
+from instrumentation import Metrics, RequestProfiler, install
 
 
 app  = dash.Dash(__name__)
 
 create_layout(app)
 
+# METRICS=0 leaves the callbacks unwrapped
+metrics = Metrics('sensor_dash_', enabled=os.getenv('METRICS', '1') == '1')
+metrics.describe('callback_seconds', 'Time spent in each server-side callback')
+metrics.describe('callback_errors_total', 'Exceptions raised by server-side callbacks')
+metrics.describe('update_data_stage_seconds', 'Time spent in each stage of update_data')
+timed_callback = metrics.instrument('callback_seconds', 'callback_errors_total', label='callback')
+
+
+def cache_metrics():
+    cache = query_cache.stats()
+    samples = [
+        ('query_cache_hits_total', 'counter', 'Query cache hits', cache['hits'], {}),
+        ('query_cache_misses_total', 'counter', 'Query cache misses', cache['misses'], {}),
+        ('query_cache_evictions_total', 'counter', 'Query cache evictions', cache['evictions'], {}),
+        ('query_cache_bytes', 'gauge', 'Memory held by cached query results', cache['bytes'], {}),
+    ]
+    if realtime_buffer is not None:
+        buffer = realtime_buffer.stats()
+        samples += [
+            ('realtime_buffer_rows', 'gauge', 'Rows in the real-time buffer', buffer['rows'], {}),
+            ('realtime_buffer_refreshes_total', 'counter', 'Real-time buffer refresh queries', buffer['refreshes'], {}),
+        ]
+    return samples
+
+
+metrics.add_collector(cache_metrics)
+
+# Opt-in: PROFILING=1 adds /profile to the Dash server (see app/app.py)
+profiler = None
+if os.getenv('PROFILING', '0') == '1':
+    profiler = RequestProfiler(os.getenv('PROFILE_DIR', 'profiles'),
+                               interval=float(os.getenv('PROFILE_INTERVAL_MS', 5)) / 1000)
+    if int(os.getenv('PROFILE_REQUESTS', 0)) > 0:
+        profiler.start(int(os.getenv('PROFILE_REQUESTS')), os.getenv('PROFILE_MODE', 'cprofile'))
+
+install(app.server, metrics, profiler)
+
+
+@app.server.route('/cache/stats')
+def cache_stats():
+    stats = {'query_cache': query_cache.stats()}
+    if realtime_buffer is not None:
+        stats['realtime_buffer'] = realtime_buffer.stats()
+    if alert_subscriber is not None:
+        stats['alert_subscriber'] = alert_subscriber.stats()
+    if archive is not None:
+        stats['archive'] = archive.stats()
+    return stats
+
+
+def time_series_figure(df, column, title):
+    """Line chart of ``column`` over time, downsampled for the browser; anomalies are always kept."""
+    points = downsample(df, column)
+    return px.line(points, x='timestamp', y=column, title=title, render_mode=render_mode(len(points)))
+
+
+GRAPH_COLUMNS = ['temperature', 'humidity', 'sound_volume']
+
+
+def extend_data(rows, column):
+    """``extendData`` for a figure's single trace: append ``rows`` and keep at most GRAPH_MAX_POINTS."""
+    x = rows['timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S.%f').tolist()
+    return [{'x': [x], 'y': [rows[column].tolist()]}, [0], GRAPH_MAX_POINTS]
+
+
+def average_cards(stats, df=None):
+    """The three average cards: from ``stats``, else from ``df`` when given, else "N/A"."""
+    if stats['count']:
+        avg_temp = stats['avg_temperature']
+        avg_humidity = stats['avg_humidity']
+        avg_sound = stats['avg_sound_volume']
+    elif df is not None and not df.empty:
+        # rows arrived between the two reads; the frame is already in hand
+        avg_temp = df['temperature'].mean()
+        avg_humidity = df['humidity'].mean()
+        avg_sound = df['sound_volume'].mean()
+    else:
+        return "N/A", "N/A", "N/A"
+    return f"{avg_temp:.2f} °C", f"{avg_humidity:.2f} %", f"{avg_sound:.2f} dB"
+
 
 @app.callback(
     [
-        Output('anomaly-data-grid', 'rowData'),
         Output('temperature-graph', 'figure'),
         Output('humidity-graph', 'figure'),
         Output('sound-volume-graph', 'figure'),
+        Output('temperature-graph', 'extendData'),
+        Output('humidity-graph', 'extendData'),
+        Output('sound-volume-graph', 'extendData'),
         Output('avg-temp', 'children'),
         Output('avg-humidity', 'children'),
         Output('avg-sound', 'children'),
+        Output('realtime-cursor', 'data'),
     ],
     [Input('filter-button', 'n_clicks'),
      Input('prediction-interval', 'n_intervals')],  
-    [Input('start-date', 'value'), Input('end-date', 'value'), Input('start-time', 'value'), Input('end-time', 'value')]
+    [Input('start-date', 'value'), Input('end-date', 'value'), Input('start-time', 'value'), Input('end-time', 'value'),
+     Input('sensor-id', 'value')],
+    State('realtime-cursor', 'data')
 )
-def update_data(n_clicks, n_intervals, start_date, end_date, start_time, end_time):
-    df = fetch_data(start_date, end_date, start_time, end_time)
+@timed_callback
+def update_data(n_clicks, n_intervals, start_date, end_date, start_time, end_time, sensor_id, cursor):
+    """Redraw the graphs, or in real-time mode append only the readings since the last tick.
+
+    ``realtime-cursor`` holds the id of the last reading the browser has. A tick in
+    real-time mode sends just the newer readings as ``extendData``; anything else
+    (filters changed, too many new rows, the cursor fell out of the buffer) redraws.
+    """
+    started = metrics.clock()
+    realtime = is_realtime(start_date, end_date, start_time, end_time)
+    if realtime and cursor is not None and dash.ctx.triggered_id == 'prediction-interval':
+        rows, last_id = realtime_buffer.rows_after(cursor)
+        if rows is not None and len(rows) <= GRAPH_MAX_POINTS:
+            rows = for_sensor(rows, sensor_id)
+            if rows.empty:
+                extends = [dash.no_update] * 3
+            else:
+                extends = [extend_data(rows, column) for column in GRAPH_COLUMNS]
+            cards = average_cards(fetch_stats(sensor_id=sensor_id))
+            return (dash.no_update,) * 3 + tuple(extends) + cards + (last_id,)
+
+    if realtime:
+        df, last_id = realtime_buffer.snapshot()
+        df = for_sensor(df, sensor_id)
+    else:
+        df, last_id = fetch_data(start_date, end_date, start_time, end_time, sensor_id), None
+    started = metrics.lap('update_data_stage_seconds', started, stage='fetch')
 
     if df.empty:
         empty_fig = go.Figure() 
         empty_fig.update_layout(title='No Data Available')
-        return [], empty_fig, empty_fig, empty_fig, "N/A", "N/A", "N/A"
+        return (empty_fig, empty_fig, empty_fig) + (dash.no_update,) * 3 + ("N/A", "N/A", "N/A", last_id)
 
-    avg_temp = df['temperature'].mean()
-    avg_humidity = df['humidity'].mean()
-    avg_sound = df['sound_volume'].mean()
+    stats = fetch_stats(start_date, end_date, start_time, end_time, sensor_id)
+    started = metrics.lap('update_data_stage_seconds', started, stage='stats')
 
-    temp_fig = px.line(df, x='timestamp', y='temperature', title='Temperature over time')
-    hum_fig = px.line(df, x='timestamp', y='humidity', title='Humidity over time')
-    sound_fig = px.line(df, x='timestamp', y='sound_volume', title='Sound level over time')
+    temp_fig = time_series_figure(df, 'temperature', 'Temperature over time')
+    hum_fig = time_series_figure(df, 'humidity', 'Humidity over time')
+    sound_fig = time_series_figure(df, 'sound_volume', 'Sound level over time')
+    metrics.lap('update_data_stage_seconds', started, stage='figures')
 
 
-    return df.to_dict("records"), temp_fig, hum_fig, sound_fig, f"{avg_temp:.2f} °C", f"{avg_humidity:.2f} %", f"{avg_sound:.2f} dB"
+    return (temp_fig, hum_fig, sound_fig) + (dash.no_update,) * 3 + average_cards(stats, df) + (last_id,)
 
 
 
 @app.callback(
-    Output('alert-store', 'data'),
-    [Input('alert-interval', 'n_intervals')]
+    Output('anomaly-data-grid', 'getRowsResponse'),
+    Input('anomaly-data-grid', 'getRowsRequest'),
+    [State('start-date', 'value'), State('end-date', 'value'), State('start-time', 'value'), State('end-time', 'value'),
+     State('sensor-id', 'value')]
+)
+@timed_callback
+def update_grid_rows(request, start_date, end_date, start_time, end_time, sensor_id):
+    if not request:
+        return dash.no_update
+    return fetch_rows_block(request, start_date, end_date, start_time, end_time, sensor_id)
+
+
+# The infinite row model only asks for blocks itself; reload them when the filters
+# are applied, and on every tick in real-time mode so new readings show up
+app.clientside_callback(
+    """
+    function(n_clicks, n_intervals, mode) {
+        const triggered = dash_clientside.callback_context.triggered.map(t => t.prop_id);
+        if (triggered.includes('prediction-interval.n_intervals') && mode !== 'real-time') {
+            return dash_clientside.no_update;
+        }
+        try {
+            dash_ag_grid.getApi('anomaly-data-grid').purgeInfiniteCache();
+        } catch (e) {
+            // grid not initialised yet; it loads its first block on its own
+        }
+        return n_intervals;
+    }
+    """,
+    Output('grid-refresh', 'data'),
+    [Input('filter-button', 'n_clicks'), Input('prediction-interval', 'n_intervals')],
+    State('mode-store', 'data'),
 )
-def check_alert(n_intervals):
-    df = fetch_data()
-    
-    if df.empty:
-        return {'visible': False, 'message': ''}
 
-    last_prediction = df['prediction'].iloc[-1]
+
+def check_alert(n_intervals, current):
+    event = alert_subscriber.latest() if alert_subscriber is not None else None
+    if event is not None:
+        last_prediction = event['prediction']
+    else:
+        last_prediction = latest_prediction()
+
+    if last_prediction is None:
+        alert = {'visible': False, 'message': ''}
 
 
-    if last_prediction == 1:
-        return {'visible': True, 'message': "Alert: Anomaly detected"}
+    elif last_prediction == 1:
+        alert = {'visible': True, 'message': "Alert: Anomaly detected"}
     else:
-        return {'visible': False, 'message': ''}
+        alert = {'visible': False, 'message': ''}
+
+    # only restyle the alert box when it actually changes
+    return dash.no_update if alert == current else alert
+
+
+app.callback(
+    Output('alert-store', 'data'),
+    [Input('alert-poll', 'n_intervals')],
+    State('alert-store', 'data'),
+)(timed_callback(check_alert))
+
+# With ALERT_STREAM_URL the browser keeps an EventSource on the Flask service's
+# /alerts/stream and writes each event into alert-store itself, so alerts cost no Dash
+# server round-trip. alert-poll (check_alert) only runs while the stream is not open.
+if ALERT_STREAM_URL:
+    app.clientside_callback(
+        ClientsideFunction('dashboard', 'subscribe_alerts'),
+        Output('alert-poll', 'disabled'),
+        Input('alert-stream-url', 'data'),
+    )
 
 
-@app.callback(
-    Output('alert-box', 'children'),
-    Output('alert-box', 'style'),
-    [Input('alert-store', 'data'), Input('mode-store', 'data')]  
-)
 def update_alert(alert_data, mode):
  
     if mode == 'historical':
@@ -135,20 +302,18 @@ def update_alert(alert_data, mode):
 @app.callback(
     Output('max-min-values', 'children'),
     [Input('alert-interval', 'n_intervals')],
-    [Input('start-date', 'value'), Input('end-date', 'value'), Input('start-time', 'value'), Input('end-time', 'value')]
+    [Input('start-date', 'value'), Input('end-date', 'value'), Input('start-time', 'value'), Input('end-time', 'value'),
+     Input('sensor-id', 'value')]
 )
-def update_min_max(n_intervals, start_date, end_date, start_time, end_time):
-    df = fetch_data(start_date, end_date, start_time, end_time)
-    
-    if df.empty:
+@timed_callback
+def update_min_max(n_intervals, start_date, end_date, start_time, end_time, sensor_id):
+    stats = fetch_stats(start_date, end_date, start_time, end_time, sensor_id)
+    if not stats['count']:
         return "N/A"
 
-    max_temp = df['temperature'].max()
-    min_temp = df['temperature'].min()
-    max_humidity = df['humidity'].max()
-    min_humidity = df['humidity'].min()
-    max_sound = df['sound_volume'].max()
-    min_sound = df['sound_volume'].min()
+    max_temp, min_temp = stats['max_temperature'], stats['min_temperature']
+    max_humidity, min_humidity = stats['max_humidity'], stats['min_humidity']
+    max_sound, min_sound = stats['max_sound_volume'], stats['min_sound_volume']
 
     return (
         "Temperature:          Max = {:.2f} °C      Min = {:.2f} °C\n"
@@ -160,19 +325,28 @@ def update_min_max(n_intervals, start_date, end_date, start_time, end_time):
 
 @app.callback(
     Output('prediction-distribution', 'figure'),
+    Output('distribution-drawn', 'data'),
     [Input('alert-interval', 'n_intervals'),
      Input('start-date', 'value'),  
      Input('end-date', 'value'),
      Input('start-time', 'value'),
-     Input('end-time', 'value')]
+     Input('end-time', 'value'),
+     Input('sensor-id', 'value')],
+    State('distribution-drawn', 'data')
 )
-def update_distribution_chart(n_intervals, start_date, end_date, start_time, end_time):
-    df = fetch_data(start_date, end_date, start_time, end_time)
+@timed_callback
+def update_distribution_chart(n_intervals, start_date, end_date, start_time, end_time, sensor_id, drawn):
+    stats = fetch_stats(start_date, end_date, start_time, end_time, sensor_id)
+    if not stats['count']:
+        return go.Figure(), False
 
-    if df.empty:
-        return go.Figure()  
+    counts = {0: stats['count'] - stats['anomalies'], 1: stats['anomalies']}
 
-    counts = df['prediction'].value_counts().sort_index()  
+    if drawn and dash.ctx.triggered_id == 'alert-interval' and is_realtime(start_date, end_date, start_time, end_time):
+        # the bars are already drawn; only send the two counts
+        patch = dash.Patch()
+        patch['data'][0]['y'] = [counts[0], counts[1]]
+        return patch, True
 
 
     fig = go.Figure([go.Bar(x=['Non-Anomalies (0)', 'Anomalies (1)'], y=[counts.get(0, 0), counts.get(1, 0)])])
@@ -186,17 +360,8 @@ def update_distribution_chart(n_intervals, start_date, end_date, start_time, end
         margin=dict(l=40, r=40, t=40, b=40)
     )
 
-    return fig
-
+    return fig, True
 
-@app.callback(
-    Output('error-message', 'children'),
-    [Input('filter-button', 'n_clicks')],
-    [Input('start-date', 'value'),
-     Input('start-time', 'value'),
-     Input('end-date', 'value'),
-     Input('end-time', 'value')]
-)
 
 def validate_time_format(n_clicks, start_date, start_time, end_date, end_time):
     error_message = ""
@@ -233,14 +398,6 @@ def validate_time_format(n_clicks, start_date, start_time, end_date, end_time):
     return error_message if error_message else ""
 
 
-@app.callback(
-    Output('mode-store', 'data'),
-    [Input('start-date', 'value'), Input('end-date', 'value'),
-     Input('start-time', 'value'), Input('end-time', 'value')]
-)
-
-
-
 def update_mode(start_date, end_date, start_time, end_time):
 
     current_date = dt.date.today()
@@ -263,5 +420,26 @@ def update_mode(start_date, end_date, start_time, end_time):
     return 'real-time'
 
 
+# update_alert, validate_time_format and update_mode only depend on their inputs, so by
+# default they run in the browser (assets/clientside.js); the Python versions above
+# are the reference implementation and are used with CLIENTSIDE_CALLBACKS=0
+PURE_CALLBACKS = [
+    (update_alert, [Output('alert-box', 'children'), Output('alert-box', 'style')],
+     [Input('alert-store', 'data'), Input('mode-store', 'data')]),
+    (validate_time_format, Output('error-message', 'children'),
+     [Input('filter-button', 'n_clicks'), Input('start-date', 'value'), Input('start-time', 'value'),
+      Input('end-date', 'value'), Input('end-time', 'value')]),
+    (update_mode, Output('mode-store', 'data'),
+     [Input('start-date', 'value'), Input('end-date', 'value'),
+      Input('start-time', 'value'), Input('end-time', 'value')]),
+]
+
+for function, outputs, inputs in PURE_CALLBACKS:
+    if os.getenv('CLIENTSIDE_CALLBACKS', '1') == '1':
+        app.clientside_callback(ClientsideFunction('dashboard', function.__name__), outputs, inputs)
+    else:
+        app.callback(outputs, inputs)(timed_callback(function))
+
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8050, debug=True) 
\ No newline at end of file
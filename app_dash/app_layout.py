@@ -1,29 +1,41 @@
 import dash
 from dash import dcc, html
 import dash_ag_grid as dag
-from data_processing import fetch_data  
+import os
 
-df = fetch_data()
+# Rows per block requested by the grid's infinite row model
+GRID_BLOCK_SIZE = int(os.getenv('GRID_BLOCK_SIZE', 100))
+# When set, the browser subscribes to the Flask service's SSE alert stream at this URL
+# (as seen from the viewer's machine, e.g. http://<host>:5000/alerts/stream). Without
+# it, or while the stream is unreachable, the Dash server is polled every ALERT_POLL_MS.
+ALERT_STREAM_URL = os.getenv('ALERT_STREAM_URL', '')
+ALERT_POLL_MS = int(os.getenv('ALERT_POLL_MS', 5000))
 
 
 columnDefs = [
     {
         "headerName": "Environment",
         "children": [
-            {"field": "temperature", "headerName": "Temperature (°C)"},
-            {"field": "humidity", "headerName": "Humidity (%)"},
-            {"field": "sound_volume", "headerName": "Sound Volume (dB)"}
+            {"field": "temperature", "headerName": "Temperature (°C)", "filter": "agNumberColumnFilter"},
+            {"field": "humidity", "headerName": "Humidity (%)", "filter": "agNumberColumnFilter"},
+            {"field": "sound_volume", "headerName": "Sound Volume (dB)", "filter": "agNumberColumnFilter"}
         ],
     },
     {
         "headerName": "Prediction",
         "children": [
-            {"field": "prediction", "headerName": "Anomaly Prediction"}
+            {"field": "prediction", "headerName": "Anomaly Prediction", "filter": "agNumberColumnFilter"}
         ],
     },
     {
         "headerName": "Timestamp",
         "field": "timestamp",
+        "filter": "agDateColumnFilter",
+    },
+    {
+        "headerName": "Sensor",
+        "field": "sensor_id",
+        "filter": "agNumberColumnFilter",
     }
 ]
 
@@ -64,7 +76,11 @@ def create_layout(app):
         html.H1(children='Data Analysis and Anomaly Predictions', style={'textAlign': 'center'}),
         
         dcc.Store(id='alert-store', data={'visible': False, 'message': ''}),
+        dcc.Store(id='alert-stream-url', data=ALERT_STREAM_URL),
         dcc.Store(id='mode-store', data='real-time'),
+        dcc.Store(id='grid-refresh'),
+        dcc.Store(id='realtime-cursor'),
+        dcc.Store(id='distribution-drawn', data=False),
         
 
         html.Div([
@@ -74,6 +90,7 @@ def create_layout(app):
                 dcc.Input(id='start-time', type='text', placeholder='start time (HH:MM)', style={'margin': '10px','padding': '10px','border': '1px solid #ccc', 'borderRadius': '5px', 'fontSize': '16px', 'width': '200px',}),
                 dcc.Input(id='end-date', type='text', placeholder='end date (YYYY-MM-DD)', style={'margin': '10px','padding': '10px','border': '1px solid #ccc', 'borderRadius': '5px', 'fontSize': '16px', 'width': '200px',}),
                 dcc.Input(id='end-time', type='text', placeholder='end time (HH:MM)', style={'margin': '10px','padding': '10px','border': '1px solid #ccc', 'borderRadius': '5px', 'fontSize': '16px', 'width': '200px',}),
+                dcc.Input(id='sensor-id', type='number', min=0, step=1, placeholder='sensor id (all sensors)', style={'margin': '10px','padding': '10px','border': '1px solid #ccc', 'borderRadius': '5px', 'fontSize': '16px', 'width': '200px',}),
                 html.Button('Filter', id='filter-button', n_clicks=0, style={'margin': '10px','padding': '10px','border': '1px solid #ccc', 'borderRadius': '5px', 'fontSize': '16px', 'width': '200px',}),
                 html.Div(id='error-message', style={'color': 'red', 'fontWeight': 'bold', 'marginTop': '10px'}),
             ], style={'display': 'le', 'flexDirection': 'column', 'alignItems': 'center', 'marginBottom': '20px'}),
@@ -139,8 +156,14 @@ def create_layout(app):
             dag.AgGrid(
                 id="anomaly-data-grid",
                 columnDefs=columnDefs,
-                rowData=df.to_dict("records"),
-                dashGridOptions={"rowSelection": "multiple", "animateRows": True, "sideBar": sideBar},
+                rowModelType="infinite",
+                dashGridOptions={
+                    "rowSelection": "multiple",
+                    "animateRows": True,
+                    "sideBar": sideBar,
+                    "cacheBlockSize": GRID_BLOCK_SIZE,
+                    "maxBlocksInCache": 10,
+                },
                 defaultColDef=defaultColDef,
                 enableEnterpriseModules=False, 
                 style={'height': '400px', 'width': '100%', 'overflowX': 'auto'}
@@ -153,6 +176,12 @@ def create_layout(app):
             n_intervals=0
         ),
         
+        dcc.Interval(
+            id='alert-poll',
+            interval=ALERT_POLL_MS, 
+            n_intervals=0
+        ),
+        
         dcc.Interval(
             id='alert-interval',
             interval=5 * 1000, 
@@ -0,0 +1,116 @@
+"""Read side of the Parquet archive tier (written by ``database/archive_partitions.py``).
+
+Closed days older than the hot window live in one Parquet file per day, sorted by
+timestamp and written in row groups with min/max statistics. ``manifest.json`` lists
+the files and ``archived_through``, the first timestamp that is still served by
+MySQL. Reads open only the files of the requested days, memory-mapped, load only
+the dashboard columns and skip row groups outside the timestamp range.
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MANIFEST = 'manifest.json'
+COLUMNS = ['temperature', 'humidity', 'sound_volume', 'prediction', 'timestamp', 'sensor_id']
+# files written before readings carried a sensor id lack that column; it reads as null
+SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('temperature', pa.float64()),
+    ('humidity', pa.float64()),
+    ('sound_volume', pa.float64()),
+    ('prediction', pa.int8()),
+    ('timestamp', pa.timestamp('us')),
+    ('sensor_id', pa.int64()),
+])
+DTYPES = {'id': 'int64', 'temperature': 'float64', 'humidity': 'float64', 'sound_volume': 'float64',
+          'prediction': 'int64', 'timestamp': 'datetime64[ns]', 'sensor_id': 'int64'}
+
+
+class ParquetArchive:
+    def __init__(self, path):
+        self.path = path
+        self._manifest = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        """The archive manifest, re-read whenever the archival job has replaced it."""
+        path = os.path.join(self.path, MANIFEST)
+        with self._lock:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                self._manifest, self._mtime = None, None
+                return None
+            if mtime != self._mtime:
+                with open(path) as f:
+                    self._manifest = json.load(f)
+                self._mtime = mtime
+            return self._manifest
+
+    def cutoff(self):
+        """``'YYYY-MM-DD 00:00:00'`` before which rows are read from the archive, or None."""
+        manifest = self.manifest()
+        return manifest['archived_through'] if manifest else None
+
+    def files(self, start_ts=None, end_ts=None):
+        """Paths of the day files overlapping ``[start_ts, end_ts)``."""
+        manifest = self.manifest() or {'files': {}}
+        start_day = start_ts[:10] if start_ts else None
+        paths = []
+        for day, entry in sorted(manifest['files'].items()):
+            if start_day and day < start_day:
+                continue
+            if end_ts and f"{day} 00:00:00" >= end_ts:
+                continue
+            paths.append(os.path.join(self.path, entry['file']))
+        return paths
+
+    def read(self, params, with_id=False):
+        """Archived rows matching ``build_filters`` parameters, in timestamp order."""
+        columns = ['id'] + COLUMNS if with_id else COLUMNS
+        cutoff = self.cutoff()
+        end_ts = min(filter(None, [params.get('end_ts'), cutoff]), default=None)
+        paths = self.files(params.get('start_ts'), end_ts)
+        if not paths:
+            return pd.DataFrame({name: pd.Series(dtype=DTYPES[name]) for name in columns})
+
+        filters = []
+        if params.get('start_ts'):
+            filters.append(('timestamp', '>=', pd.Timestamp(params['start_ts'])))
+        if end_ts:
+            filters.append(('timestamp', '<', pd.Timestamp(end_ts)))
+        table = pq.read_table(paths, columns=columns, filters=filters or None, schema=SCHEMA, memory_map=True)
+        df = table.to_pandas()
+        df['prediction'] = df['prediction'].astype('int64')
+        df['timestamp'] = df['timestamp'].astype('datetime64[ns]')
+        df['sensor_id'] = df['sensor_id'].fillna(0).astype('int64')
+        if 'sensor_id' in params:
+            df = df[df['sensor_id'] == params['sensor_id']]
+
+        # time-of-day filters, as TIME(timestamp) in SQL
+        if 'start_time' in params or 'end_time' in params:
+            time_of_day = df['timestamp'] - df['timestamp'].dt.normalize()
+            mask = pd.Series(True, index=df.index)
+            if 'start_time' in params:
+                mask &= time_of_day >= pd.Timedelta(params['start_time'])
+            if 'end_time' in params:
+                mask &= time_of_day <= pd.Timedelta(params['end_time'])
+            df = df[mask]
+        return df.reset_index(drop=True)
+
+    def stats(self):
+        manifest = self.manifest()
+        if manifest is None:
+            return {'archived_through': None, 'files': 0, 'rows': 0, 'bytes': 0}
+        entries = manifest['files'].values()
+        return {
+            'archived_through': manifest['archived_through'],
+            'files': len(manifest['files']),
+            'rows': sum(entry['rows'] for entry in entries),
+            'bytes': sum(entry['bytes'] for entry in entries),
+        }
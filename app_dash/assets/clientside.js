@@ -0,0 +1,160 @@
+/*
+ * Clientside versions of the dashboard's pure callbacks (update_alert,
+ * validate_time_format, update_mode). They run in the browser, so typing in the
+ * filter inputs or an alert store change no longer costs a server round-trip.
+ * subscribe_alerts feeds alert-store from the Flask service's SSE stream.
+ * The Python versions in app_dash.py are the reference; clientside_parity.py
+ * checks that both give the same results.
+ */
+
+// The patterns Python's strptime (and so pd.to_datetime) uses for %Y-%m-%d and %H:%M
+const DATE_PATTERN = /^(\d{4})-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])$/;
+const TIME_PATTERN = /^(2[0-3]|[0-1]\d|\d):([0-5]\d|\d)$/;
+// pandas also accepts ISO 8601 dates without a year ("--MM-DD") and reads them as year 0
+const NO_YEAR_PATTERN = /^--(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9])$/;
+
+function parseDate(value) {
+    let match = DATE_PATTERN.exec(value);
+    if (!match) {
+        match = NO_YEAR_PATTERN.exec(value);
+        if (!match) {
+            return null;
+        }
+        match = [value, '0000', match[1], match[2]];
+    }
+    const [year, month, day] = match.slice(1).map(Number);
+    const leap = year % 4 === 0 && (year % 100 !== 0 || year % 400 === 0);
+    const monthDays = [31, leap ? 29 : 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31];
+    if (day > monthDays[month - 1]) {
+        return null;
+    }
+    return {year, month, day};
+}
+
+function parseTime(value) {
+    const match = TIME_PATTERN.exec(value);
+    return match ? {hour: Number(match[1]), minute: Number(match[2])} : null;
+}
+
+const ALERT_BOX_STYLE = {
+    'height': '120px',
+    'width': '300px',
+    'borderRadius': '10px',
+    'padding': '10px',
+    'margin': '10px',
+    'textAlign': 'center',
+    'display': 'flex',
+    'alignItems': 'center',
+    'justifyContent': 'center',
+    'fontSize': '24px',
+    'fontWeight': 'bold',
+};
+
+function alertBox(border, backgroundColor, color) {
+    return Object.assign({}, ALERT_BOX_STYLE, {border, backgroundColor, color});
+}
+
+// Mode at a given moment; update_mode passes the browser's current local time
+function modeAt(now, start_date, end_date, start_time, end_time) {
+    const no_update = window.dash_clientside.no_update;
+
+    if (end_date) {
+        const date = parseDate(end_date);
+        if (!date || date.year < 1) {
+            // the Python callback raises here (pandas parses year 0 but cannot
+            // convert it to a date), which leaves the mode unchanged
+            return no_update;
+        }
+        const today = [now.getFullYear(), now.getMonth() + 1, now.getDate()];
+        const parsed = [date.year, date.month, date.day];
+        const before = parsed[0] !== today[0] ? parsed[0] < today[0]
+            : parsed[1] !== today[1] ? parsed[1] < today[1] : parsed[2] < today[2];
+        if (before) {
+            return 'historical';
+        }
+    }
+
+    if (end_time) {
+        const time = parseTime(end_time);
+        if (!time) {
+            return no_update;
+        }
+        const nowMs = ((now.getHours() * 60 + now.getMinutes()) * 60 + now.getSeconds()) * 1000 + now.getMilliseconds();
+        if ((time.hour * 60 + time.minute) * 60 * 1000 < nowMs) {
+            return 'historical';
+        }
+    }
+
+    if (start_date || start_time) {
+        return 'historical';
+    }
+
+    return 'real-time';
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    dashboard: {
+        update_alert: function(alert_data, mode) {
+            if (mode === 'historical') {
+                return ['Historical data: detector stopped', alertBox('1px solid gray', 'gray', 'white')];
+            }
+            if (alert_data['visible']) {
+                return [alert_data['message'], alertBox('1px solid red', 'red', 'white')];
+            }
+            return ['No anomaly detected', alertBox('1px solid green', 'white', 'green')];
+        },
+
+        validate_time_format: function(n_clicks, start_date, start_time, end_date, end_time) {
+            let error_message = '';
+            if (start_date && parseDate(start_date) === null) {
+                error_message += `Invalid start date format: ${start_date}. Expected format: YYYY-MM-DD. `;
+            }
+            if (end_date && parseDate(end_date) === null) {
+                error_message += `Invalid end date format: ${end_date}. Expected format: YYYY-MM-DD. `;
+            }
+            if (start_time && parseTime(start_time) === null) {
+                error_message += `Invalid start time format: ${start_time}. Expected format: HH:MM. `;
+            }
+            if (end_time && parseTime(end_time) === null) {
+                error_message += `Invalid end time format: ${end_time}. Expected format: HH:MM. `;
+            }
+            return error_message;
+        },
+
+        update_mode: function(start_date, end_date, start_time, end_time) {
+            return modeAt(new Date(), start_date, end_date, start_time, end_time);
+        },
+
+        mode_at: modeAt,
+
+        subscribe_alerts: function(url) {
+            // one EventSource per page; it reconnects by itself when the service restarts
+            if (!url || window.alertSource) {
+                return window.dash_clientside.no_update;
+            }
+            let current = null;
+            window.alertSource = new EventSource(url);
+            // poll the Dash server (check_alert) only while the stream is not open
+            window.alertSource.onopen = function() {
+                window.dash_clientside.set_props('alert-poll', {disabled: true});
+            };
+            window.alertSource.onerror = function() {
+                // the poll may change alert-store meanwhile; restyle on the next event
+                current = null;
+                window.dash_clientside.set_props('alert-poll', {disabled: false});
+            };
+            window.alertSource.onmessage = function(message) {
+                const event = JSON.parse(message.data);
+                const alert = event.prediction === 1
+                    ? {visible: true, message: 'Alert: Anomaly detected'}
+                    : {visible: false, message: ''};
+                // only restyle the alert box when it actually changes
+                if (!current || current.visible !== alert.visible) {
+                    current = alert;
+                    window.dash_clientside.set_props('alert-store', {data: alert});
+                }
+            };
+            return window.dash_clientside.no_update;
+        },
+    },
+});
@@ -0,0 +1,140 @@
+"""Check that assets/clientside.js matches the Python callbacks it replaces.
+
+Runs update_alert, validate_time_format and update_mode (at fixed clock times) over
+hand-picked and random inputs in both Python and Node, and reports any difference.
+A Python callback that raises leaves its output unchanged, which the JavaScript
+expresses as ``no_update``. Needs ``node`` on the PATH::
+
+    python clientside_parity.py --fuzz 5000
+"""
+import argparse
+import datetime as dt
+import itertools
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import types
+
+os.environ.setdefault('ALERT_URL', '')
+
+import app_dash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'assets', 'clientside.js')
+NO_UPDATE = '__no_update__'
+
+NODE_HARNESS = """
+global.window = {dash_clientside: {no_update: {}}};
+require(process.argv[1]);
+const ns = window.dash_clientside.dashboard;
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const results = cases.map(([name, args, now]) => {
+    // JavaScript months are 0-based
+    const clock = now && new Date(now[0], now[1] - 1, ...now.slice(2));
+    const result = now ? ns.mode_at(clock, ...args) : ns[name](...args);
+    return result === window.dash_clientside.no_update ? '__no_update__' : result;
+});
+process.stdout.write(JSON.stringify(results));
+"""
+
+DATES = [None, '', '2024-10-01', '2024-1-5', '2024-01- 5', '2024-02-29', '2023-02-29', '2024-02-30',
+         '2024-04-31', '2024-13-01', '2024-00-10', '0000-02-29', '1900-02-29', '2000-02-29', '9999-12-31',
+         '--7-15', '--02-29', '--1- 5', '24-10-01', '2024/10/01', ' 2024-10-01', '2024-10-01 ', '20241001', '2024-10-01T00:00', 'abc']
+TIMES = [None, '', '00:00', '0:0', '9:5', '09:05', '12:30', '12:31', '12:29', '23:59', '24:00', '7:60',
+         '12:345', '1230', '12:30:00', ' 7:05', '07:5 ', 'ab:cd']
+# clock times update_mode is evaluated at (year, month, day, hour, minute, second, millisecond)
+NOWS = [(2024, 10, 1, 12, 30, 0, 0), (2024, 10, 1, 12, 30, 15, 250), (2024, 12, 31, 23, 59, 59, 999),
+        (2024, 1, 1, 0, 0, 0, 0)]
+
+
+def random_inputs(count, rng):
+    alphabet = '0123456789-: '
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 11))) for _ in range(count)]
+
+
+def python_result(function, *args, now=None):
+    if now is not None:
+        clock = dt.datetime(*now[:6], now[6] * 1000)
+        app_dash.dt = types.SimpleNamespace(
+            date=types.SimpleNamespace(today=clock.date),
+            datetime=types.SimpleNamespace(now=lambda: clock),
+        )
+    try:
+        result = function(*args)
+    except Exception:
+        # a failing Dash callback leaves its output as it was
+        return NO_UPDATE
+    finally:
+        app_dash.dt = dt
+    return list(result) if isinstance(result, tuple) else result
+
+
+def input_pairs(fuzz, rng):
+    """Every hand-picked date with every hand-picked time, plus random strings paired with both."""
+    pairs = list(itertools.product(DATES, TIMES))
+    random_dates, random_times = random_inputs(fuzz, rng), random_inputs(fuzz, rng)
+    pairs += zip(random_dates, random_times)
+    pairs += zip(random_dates, itertools.cycle(TIMES))
+    pairs += zip(itertools.cycle(DATES), random_times)
+    return pairs
+
+
+def build_cases(fuzz, seed):
+    rng = random.Random(seed)
+    pairs = input_pairs(fuzz, rng)
+    cases = []
+
+    for alert, mode in itertools.product(
+            [{'visible': True, 'message': 'Alert: Anomaly detected'}, {'visible': False, 'message': ''}],
+            ['historical', 'real-time', None]):
+        cases.append(('update_alert', [alert, mode], None))
+
+    for date, time in pairs:
+        cases.append(('validate_time_format', [1, date, time, date, time], None))
+        cases.append(('validate_time_format', [1, None, time, date, None], None))
+
+    for now in NOWS:
+        for date, time in pairs:
+            cases.append(('update_mode', [None, date, None, time], now))
+            cases.append(('update_mode', [date, None, time, None], now))
+    return cases
+
+
+def node_results(cases):
+    output = subprocess.run(
+        ['node', '-e', NODE_HARNESS, SCRIPT],
+        input=json.dumps(cases), capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the clientside callbacks with the Python ones.')
+    parser.add_argument('--fuzz', type=int, default=500, help='random date and time strings to add')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if shutil.which('node') is None:
+        print("node is not installed; cannot run assets/clientside.js")
+        return 2
+
+    cases = build_cases(args.fuzz, args.seed)
+    functions = {'update_alert': app_dash.update_alert,
+                 'validate_time_format': app_dash.validate_time_format,
+                 'update_mode': app_dash.update_mode}
+    mismatches = 0
+    for (name, case_args, now), js in zip(cases, node_results(cases)):
+        expected = python_result(functions[name], *case_args, now=now)
+        if expected != js:
+            mismatches += 1
+            if mismatches <= 20:
+                print(f"{name}{tuple(case_args)} at {now}: python={expected!r} js={js!r}")
+    print(f"{len(cases)} cases, {mismatches} mismatches")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,33 @@
+import datetime as dt
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
 import re
-from db_config import engine  
+from sqlalchemy import text
+from db_config import engine
+from query_cache import QueryCache
+from alert_subscriber import AlertSubscriber
+
+METRICS = ['temperature', 'humidity', 'sound_volume']
+ROLLUP_MIN_DAYS = float(os.getenv('ROLLUP_MIN_DAYS', 1))
+HOURLY_ROLLUP_MIN_DAYS = float(os.getenv('HOURLY_ROLLUP_MIN_DAYS', 7))
+
+# One cache for every callback and browser tab; see query_cache.py
+query_cache = QueryCache(
+    engine,
+    ttl=float(os.getenv('QUERY_CACHE_TTL', 60)),
+    max_entries=int(os.getenv('QUERY_CACHE_ENTRIES', 64)),
+    max_bytes=int(os.getenv('QUERY_CACHE_MB', 256)) * 1024 * 1024,
+    marker_interval=float(os.getenv('QUERY_CACHE_MARKER_INTERVAL', 1)),
+)
+
+# Days archived to Parquet by database/archive_partitions.py; see archive.py
+archive = None
+if os.getenv('ARCHIVE_DIR'):
+    from archive import ParquetArchive
+    archive = ParquetArchive(os.getenv('ARCHIVE_DIR'))
 
 def validate_time_format(time_str):
     """Validate the time format as HH:MM."""
@@ -8,35 +35,409 @@ def validate_time_format(time_str):
     time_pattern = re.compile(r'^\d{2}:\d{2}$')
     return time_pattern.match(time_str) is not None
 
-def fetch_data(start_date=None, end_date=None, start_time=None, end_time=None):
-    query = "SELECT temperature, humidity, sound_volume, prediction, timestamp FROM sensor_data"
-    df = pd.read_sql(query, engine)
-    df['timestamp'] = pd.to_datetime(df['timestamp'])  
-    
-   
+def build_filters(start_date=None, end_date=None, start_time=None, end_time=None, sensor_id=None):
+    """Translate the dashboard filters into SQL conditions and bind parameters.
+
+    Dates become a half-open range on ``timestamp`` so the index can be used and
+    MySQL only opens the daily partitions inside the range:
+    ``date >= start_date`` is ``timestamp >= start_date 00:00:00`` and
+    ``date <= end_date`` is ``timestamp < end_date + 1 day``. Times of day are
+    compared on ``TIME(timestamp)``. A sensor id selects one device, served together
+    with a date range by the ``(sensor_id, timestamp)`` index. Values that do not
+    parse are ignored, as before.
+    """
+    conditions = []
+    params = {}
+
     if start_date:
         start_date_dt = pd.to_datetime(start_date, format='%Y-%m-%d', errors='coerce')
         if pd.notna(start_date_dt):
-            df = df[df['timestamp'].dt.date >= start_date_dt.date()]
-    
+            conditions.append("timestamp >= :start_ts")
+            params['start_ts'] = start_date_dt.strftime('%Y-%m-%d 00:00:00')
+
     if end_date:
         end_date_dt = pd.to_datetime(end_date, format='%Y-%m-%d', errors='coerce')
         if pd.notna(end_date_dt):
-            df = df[df['timestamp'].dt.date <= end_date_dt.date()]
-    
+            conditions.append("timestamp < :end_ts")
+            params['end_ts'] = (end_date_dt + pd.Timedelta(days=1)).strftime('%Y-%m-%d 00:00:00')
 
     if start_time:
         try:
             start_time_dt = pd.to_datetime(start_time, format='%H:%M').time()
-            df = df[df['timestamp'].dt.time >= start_time_dt]
+            conditions.append("TIME(timestamp) >= :start_time")
+            params['start_time'] = start_time_dt.strftime('%H:%M:%S')
         except ValueError:
-            pass  
+            pass
 
     if end_time:
         try:
             end_time_dt = pd.to_datetime(end_time, format='%H:%M').time()
-            df = df[df['timestamp'].dt.time <= end_time_dt]
+            conditions.append("TIME(timestamp) <= :end_time")
+            params['end_time'] = end_time_dt.strftime('%H:%M:%S')
         except ValueError:
-            pass 
+            pass
+
+    if sensor_id is not None and sensor_id != '':
+        try:
+            params['sensor_id'] = int(sensor_id)
+            conditions.append("sensor_id = :sensor_id")
+        except (TypeError, ValueError):
+            pass
+
+    return conditions, params
+
+def where_clause(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+def cache_key(kind, params):
+    return (kind, tuple(sorted(params.items())))
+
+def realtime_params(params):
+    """True when no date or time filter is set; a sensor filter alone stays in real-time mode."""
+    return not set(params) - {'sensor_id'} and realtime_buffer is not None
+
+def for_sensor(df, sensor_id):
+    """Rows of ``df`` from one sensor, or all of them when no valid sensor id is given."""
+    _, params = build_filters(sensor_id=sensor_id)
+    if 'sensor_id' not in params:
+        return df
+    return df[df['sensor_id'] == params['sensor_id']].reset_index(drop=True)
+
+def fetch_data(start_date=None, end_date=None, start_time=None, end_time=None, sensor_id=None):
+    """Rows matching the filters, shared through the query cache. Treat the result as read-only.
+
+    Without date or time filters (real-time mode) the rows come from the in-memory
+    rolling buffer, which holds only the newest window of the table.
+    """
+    conditions, params = build_filters(start_date, end_date, start_time, end_time, sensor_id)
+    if realtime_params(params):
+        return for_sensor(realtime_buffer.frame(), sensor_id)
+    return query_cache.get(cache_key('data', params), lambda: query_data(conditions, params))
+
+def latest_prediction():
+    """Prediction of the newest reading, or None for an empty table (one primary-key lookup)."""
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT prediction FROM sensor_data ORDER BY id DESC LIMIT 1")).scalar()
+
+def is_realtime(start_date=None, end_date=None, start_time=None, end_time=None):
+    """True when the filters select real-time mode and the rolling buffer serves it."""
+    _, params = build_filters(start_date, end_date, start_time, end_time)
+    return realtime_params(params)
+
+def rollup_table(params):
+    """Rollup table that answers the bound filters exactly, or None when raw rows are needed.
+
+    Rollups only apply to date filters: day boundaries line up with both minute and
+    hour buckets, while a time-of-day filter does not, and the rollups add up all
+    sensors, so a sensor filter needs raw rows too. Real-time mode (no filters) is
+    served from the rolling buffer instead. Ranges shorter than ROLLUP_MIN_DAYS stay
+    on raw rows; ranges of HOURLY_ROLLUP_MIN_DAYS or more (or open-ended) use hours.
+    """
+    if 'start_time' in params or 'end_time' in params or 'sensor_id' in params:
+        return None
+    if 'start_ts' not in params and 'end_ts' not in params:
+        return None
+    if 'start_ts' in params and 'end_ts' in params:
+        days = (pd.Timestamp(params['end_ts']) - pd.Timestamp(params['start_ts'])).days
+        if days < ROLLUP_MIN_DAYS:
+            return None
+        if days < HOURLY_ROLLUP_MIN_DAYS:
+            return 'sensor_data_rollup_minute'
+    return 'sensor_data_rollup_hour'
+
+def fetch_rollup_stats(start_date=None, end_date=None, start_time=None, end_time=None, sensor_id=None):
+    """Count, anomaly count and avg/min/max per metric from the rollup tables, or None if they do not apply."""
+    _, params = build_filters(start_date, end_date, start_time, end_time, sensor_id)
+    table = rollup_table(params)
+    if table is None:
+        return None
+    return query_cache.get(cache_key(table, params), lambda: query_rollup_stats(table, params))
+
+def query_rollup_stats(table, params):
+    conditions = []
+    if 'start_ts' in params:
+        conditions.append("bucket_start >= :start_ts")
+    if 'end_ts' in params:
+        conditions.append("bucket_start < :end_ts")
+    aggregates = ", ".join(
+        f"SUM({m}_sum) / SUM(reading_count) AS avg_{m}, MIN({m}_min) AS min_{m}, MAX({m}_max) AS max_{m}"
+        for m in METRICS
+    )
+    query = (
+        f"SELECT SUM(reading_count) AS count, SUM(anomaly_count) AS anomalies, {aggregates} FROM {table}"
+        + where_clause(conditions)
+    )
+    with engine.connect() as conn:
+        row = conn.execute(text(query), params).mappings().one()
+    return stats_from_row(row)
+
+def fetch_stats(start_date=None, end_date=None, start_time=None, end_time=None, sensor_id=None):
+    """Count, anomaly count and avg/min/max per metric for the filters, without fetching rows.
+
+    Date ranges covered by the rollup tables are answered from them; any other filter
+    runs one aggregate query over ``sensor_data``. Real-time mode summarises the
+    rolling buffer so the numbers match the graphs. Returns the same keys as
+    ``fetch_rollup_stats``; averages, minima and maxima are None when ``count`` is 0.
+    """
+    conditions, params = build_filters(start_date, end_date, start_time, end_time, sensor_id)
+    if realtime_params(params):
+        return stats_from_frame(for_sensor(realtime_buffer.frame(), sensor_id))
+    stats = fetch_rollup_stats(start_date, end_date, start_time, end_time, sensor_id)
+    if stats is not None:
+        return stats
+    return query_cache.get(cache_key('stats', params), lambda: query_stats(conditions, params))
+
+def query_stats(conditions, params):
+    read_archive, read_hot, cutoff = split_at_archive(params)
+    parts = []
+    if read_archive:
+        parts.append(stats_from_frame(archive.read(params)))
+    if read_hot:
+        parts.append(query_hot_stats(conditions, params, cutoff))
+    return parts[0] if len(parts) == 1 else combine_stats(parts)
+
+def query_hot_stats(conditions, params, cutoff=None):
+    conditions, params = hot_filters(conditions, params, cutoff)
+    aggregates = ", ".join(
+        f"AVG({m}) AS avg_{m}, MIN({m}) AS min_{m}, MAX({m}) AS max_{m}"
+        for m in METRICS
+    )
+    query = (
+        "SELECT COUNT(*) AS count, SUM(CASE WHEN prediction = 1 THEN 1 ELSE 0 END) AS anomalies, "
+        + aggregates + " FROM sensor_data"
+        + where_clause(conditions)
+    )
+    with engine.connect() as conn:
+        row = conn.execute(text(query), params).mappings().one()
+    return stats_from_row(row)
+
+def stats_from_frame(df):
+    row = {'count': len(df), 'anomalies': int((df['prediction'] == 1).sum())}
+    for m in METRICS:
+        column = df[m]
+        row[f'avg_{m}'], row[f'min_{m}'], row[f'max_{m}'] = (
+            (column.mean(), column.min(), column.max()) if len(df) else (None, None, None)
+        )
+    return stats_from_row(row)
+
+def combine_stats(parts):
+    """Stats of the union of disjoint row sets, from the stats of each."""
+    parts = [part for part in parts if part['count']] or parts[:1]
+    count = sum(part['count'] for part in parts)
+    combined = {'count': count, 'anomalies': sum(part['anomalies'] for part in parts)}
+    for m in METRICS:
+        combined[f'avg_{m}'] = sum(part[f'avg_{m}'] * part['count'] for part in parts) / count if count else None
+        combined[f'min_{m}'] = min(part[f'min_{m}'] for part in parts) if count else None
+        combined[f'max_{m}'] = max(part[f'max_{m}'] for part in parts) if count else None
+    return combined
+
+def stats_from_row(row):
+    stats = {key: (float(value) if value is not None else None) for key, value in row.items()}
+    stats['count'] = int(stats['count'] or 0)
+    stats['anomalies'] = int(stats['anomalies'] or 0)
+    return stats
+
+def split_at_archive(params):
+    """Whether the archive and the database are needed for the filters, and the cutoff between them."""
+    cutoff = archive.cutoff() if archive is not None else None
+    if cutoff is None:
+        return False, True, None
+    read_archive = params.get('start_ts', '') < cutoff
+    read_hot = params.get('end_ts') is None or params['end_ts'] > cutoff
+    return read_archive, read_hot, cutoff
+
+def hot_filters(conditions, params, cutoff):
+    """Restrict a database query to rows the archive does not serve."""
+    if cutoff is None:
+        return conditions, params
+    return conditions + ["timestamp >= :archive_cutoff"], dict(params, archive_cutoff=cutoff)
+
+def query_data(conditions, params):
+    """Rows from the Parquet archive before its cutoff and from MySQL after it, in timestamp order."""
+    read_archive, read_hot, cutoff = split_at_archive(params)
+    frames = []
+    if read_archive:
+        frames.append(archive.read(params))
+    if read_hot:
+        frames.append(query_hot_data(conditions, params, cutoff))
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+def query_hot_data(conditions, params, cutoff=None):
+    conditions, params = hot_filters(conditions, params, cutoff)
+    query = (
+        "SELECT temperature, humidity, sound_volume, prediction, timestamp, sensor_id FROM sensor_data"
+        + where_clause(conditions)
+        + " ORDER BY timestamp, id"
+    )
+    df = pd.read_sql(text(query), engine, params=params)
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
 
     return df
+
+class RollingBuffer:
+    """In-memory columnar tail of ``sensor_data`` for real-time mode.
+
+    Each refresh fetches only rows with ``id`` above the last id seen (re-reading a
+    small overlap so rows committed slightly out of id order are not missed) and
+    appends them to preallocated column arrays. Rows beyond the newest ``max_rows``
+    or older than ``max_age`` seconds are evicted. Transfer and refresh cost follow
+    the number of new rows, not the size of the table.
+    """
+
+    COLUMNS = ['temperature', 'humidity', 'sound_volume', 'prediction', 'timestamp', 'sensor_id']
+    DTYPES = {
+        'id': 'int64',
+        'temperature': 'float64',
+        'humidity': 'float64',
+        'sound_volume': 'float64',
+        'prediction': 'int64',
+        'timestamp': 'datetime64[ns]',
+        'sensor_id': 'int64',
+    }
+    OVERLAP = 256
+
+    def __init__(self, engine, max_rows=10000, max_age=None, refresh_interval=0.5):
+        self.engine = engine
+        self.max_rows = max_rows
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+
+        self._capacity = 2 * max_rows
+        self._arrays = {name: np.empty(self._capacity, dtype=dtype) for name, dtype in self.DTYPES.items()}
+        self._start = 0
+        self._end = 0
+        self._last_id = None
+        self._last_refresh = 0.0
+        self._frame = None
+        self._lock = threading.Lock()
+
+        self.refreshes = 0
+        self.rows_fetched = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def frame(self):
+        """DataFrame of the buffered rows in id order, rebuilt only after the buffer changed."""
+        return self.snapshot()[0]
+
+    def snapshot(self):
+        """The buffered rows and the id of the last one, read together.
+
+        ``rows_after`` with that id continues exactly where the frame ends.
+        """
+        with self._lock:
+            self._maybe_refresh()
+            if self._frame is None:
+                live = slice(self._start, self._end)
+                self._frame = pd.DataFrame({name: self._arrays[name][live].copy() for name in self.COLUMNS})
+            return self._frame, self._last_id
+
+    def rows_after(self, after_id):
+        """Rows appended after id ``after_id`` and the new last id.
+
+        Returns ``(None, last_id)`` when rows after ``after_id`` may have been evicted
+        (the caller fell too far behind) and has to reload the whole frame.
+        """
+        with self._lock:
+            self._maybe_refresh()
+            ids = self._arrays['id'][self._start:self._end]
+            if after_id is None or not len(ids) or after_id < ids[0]:
+                return None, self._last_id
+            first = self._start + int(np.searchsorted(ids, after_id, side='right'))
+            live = slice(first, self._end)
+            rows = pd.DataFrame({name: self._arrays[name][live].copy() for name in self.COLUMNS})
+            return rows, self._last_id
+
+    def _maybe_refresh(self):
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self._refresh()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rows': len(self),
+                'last_id': self._last_id,
+                'refreshes': self.refreshes,
+                'rows_fetched': self.rows_fetched,
+            }
+
+    def _refresh(self):
+        columns = "id, " + ", ".join(self.COLUMNS)
+        if self._last_id is None:
+            # first load: only the newest window, never the whole table
+            query = f"SELECT {columns} FROM sensor_data ORDER BY id DESC LIMIT :limit"
+            params = {'limit': self.max_rows}
+        else:
+            query = f"SELECT {columns} FROM sensor_data WHERE id > :last_id ORDER BY id DESC LIMIT :limit"
+            params = {'last_id': self._last_id - self.OVERLAP, 'limit': self.max_rows + self.OVERLAP}
+        new = pd.read_sql(text(query), self.engine, params=params).iloc[::-1]
+
+        self._last_refresh = time.monotonic()
+        self.refreshes += 1
+        self.rows_fetched += len(new)
+
+        if len(self):
+            # overlap rows are new only if they fall inside the buffered id span and are missing
+            ids = new['id'].to_numpy()
+            buffered = self._arrays['id'][self._start:self._end]
+            late = (ids > buffered[0]) & (ids <= self._last_id) & ~np.isin(ids, buffered)
+            new = new[(ids > self._last_id) | late]
+        if len(new):
+            self._append(new)
+            self._frame = None
+        if self._evict():
+            self._frame = None
+
+    def _append(self, new):
+        n = len(new)
+        if self._end + n > self._capacity:
+            # compact the live rows to the front; keep at most max_rows of the old ones
+            keep = max(0, min(len(self), self.max_rows - n))
+            for array in self._arrays.values():
+                array[:keep] = array[self._end - keep:self._end]
+            self._start, self._end = 0, keep
+            new = new.iloc[-self._capacity:]
+            n = len(new)
+
+        stop = self._end + n
+        for name, array in self._arrays.items():
+            values = new[name]
+            if name == 'timestamp':
+                values = pd.to_datetime(values)
+            array[self._end:stop] = values.to_numpy(dtype=self.DTYPES[name])
+        ids = self._arrays['id']
+        if self._end > self._start and ids[self._end] < ids[self._end - 1]:
+            order = np.argsort(ids[self._start:stop], kind='stable') + self._start
+            for array in self._arrays.values():
+                array[self._start:stop] = array[order]
+        self._end = stop
+        self._last_id = int(ids[self._end - 1])
+
+    def _evict(self):
+        start = max(self._start, self._end - self.max_rows)
+        if self.max_age:
+            cutoff = np.datetime64(dt.datetime.now() - dt.timedelta(seconds=self.max_age))
+            # evict from the front while rows are older than the window
+            recent = self._arrays['timestamp'][start:self._end] >= cutoff
+            start = start + int(np.argmax(recent)) if recent.any() else self._end
+        evicted = start != self._start
+        self._start = start
+        return evicted
+
+
+realtime_buffer = None
+if int(os.getenv('REALTIME_BUFFER_ROWS', 10000)) > 0:
+    realtime_buffer = RollingBuffer(
+        engine,
+        max_rows=int(os.getenv('REALTIME_BUFFER_ROWS', 10000)),
+        max_age=float(os.getenv('REALTIME_BUFFER_SECONDS', 0)) or None,
+    )
+
+# Latest prediction pushed by the Flask service; ALERT_URL='' reads the newest row instead.
+# With ALERT_STREAM_URL the browsers subscribe themselves and the Dash server only polls
+# while a stream is down, so the newest row is read then and no subscriber is started.
+alert_subscriber = None
+if os.getenv('ALERT_URL', 'http://flask_app:5000/alerts') and not os.getenv('ALERT_STREAM_URL'):
+    alert_subscriber = AlertSubscriber(os.getenv('ALERT_URL', 'http://flask_app:5000/alerts'))
+    alert_subscriber.start()
@@ -10,7 +10,8 @@ def get_db_config():
     }
 
 db_config = get_db_config()
-db_url = f"mysql+mysqlconnector://{db_config['user']}:{db_config['password']}@{db_config['host']}/{db_config['database']}"
+# DATABASE_URL points the dashboard at another database, e.g. a SQLite file for benchmarks
+db_url = os.getenv('DATABASE_URL') or f"mysql+mysqlconnector://{db_config['user']}:{db_config['password']}@{db_config['host']}/{db_config['database']}"
 engine = create_engine(db_url)
 
 
@@ -0,0 +1,49 @@
+import math
+import os
+
+import numpy as np
+
+# Points per series sent to the browser, and the size from which traces use WebGL
+GRAPH_MAX_POINTS = int(os.getenv('GRAPH_MAX_POINTS', 2000))
+WEBGL_MIN_POINTS = int(os.getenv('WEBGL_MIN_POINTS', 1000))
+
+
+def minmax_indices(values, max_points):
+    """Positions of the minimum and maximum of ``values`` in ``max_points // 2`` equal buckets.
+
+    Keeping both extremes of every bucket preserves spikes and the envelope of the
+    series, which is what a line chart at screen resolution shows anyway. The first
+    and last points are always kept so the x range does not shrink.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    size = math.ceil(n / max(1, max_points // 2))
+    buckets = math.ceil(n / size)
+    grid = np.full(buckets * size, np.nan)
+    grid[:n] = values
+    grid = grid.reshape(buckets, size)
+    missing = np.isnan(grid)
+    offsets = np.arange(buckets) * size
+    lows = np.where(missing, np.inf, grid).argmin(axis=1) + offsets
+    highs = np.where(missing, -np.inf, grid).argmax(axis=1) + offsets
+    return np.unique(np.concatenate([lows, highs, [0, n - 1]]))
+
+
+def downsample(df, column, max_points=GRAPH_MAX_POINTS):
+    """Rows of ``df`` needed to draw ``column``: per-bucket extremes plus every anomaly.
+
+    Rows with ``prediction == 1`` are always kept, so the result can exceed
+    ``max_points`` when anomalies are frequent. Row order is preserved.
+    """
+    if len(df) <= max_points:
+        return df
+    keep = minmax_indices(df[column].to_numpy(dtype=float), max_points)
+    anomalies = np.flatnonzero(df['prediction'].to_numpy() == 1)
+    return df.iloc[np.union1d(keep, anomalies)]
+
+
+def render_mode(points):
+    """Plotly Express render mode for a series of ``points`` points."""
+    return 'webgl' if points >= WEBGL_MIN_POINTS else 'svg'
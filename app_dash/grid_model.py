@@ -0,0 +1,251 @@
+"""Infinite row model for the anomaly data grid.
+
+The grid asks for one block of rows at a time (``getRowsRequest``); each block is
+one ``LIMIT``/``OFFSET`` query with the grid's sort and column filters and the
+dashboard's date/time and sensor filters in SQL, so only the visible block is serialized.
+Ranges that reach before the archive's cutoff also page over the archived rows, with
+the same filters applied to them in pandas.
+"""
+import functools
+import operator
+
+import pandas as pd
+from sqlalchemy import text
+
+from data_processing import archive, build_filters, engine, hot_filters, split_at_archive, where_clause
+
+GRID_COLUMNS = ['temperature', 'humidity', 'sound_volume', 'prediction', 'timestamp', 'sensor_id']
+
+NUMBER_OPERATORS = {
+    'equals': '=',
+    'notEqual': '<>',
+    'lessThan': '<',
+    'lessThanOrEqual': '<=',
+    'greaterThan': '>',
+    'greaterThanOrEqual': '>=',
+}
+COMPARISONS = {
+    '=': operator.eq,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def sort_terms(sort_model):
+    """``(column, ascending)`` pairs of the grid's sort model, with ``id`` as tie-breaker for stable pages."""
+    terms = [(sort['colId'], sort.get('sort') != 'desc') for sort in sort_model or []
+             if sort.get('colId') in GRID_COLUMNS]
+    if not terms:
+        terms = [('timestamp', True)]
+    return terms + [('id', terms[0][1])]
+
+
+def order_by(terms):
+    return " ORDER BY " + ", ".join(f"{column} {'ASC' if ascending else 'DESC'}" for column, ascending in terms)
+
+
+def day_bounds(kind, model):
+    """``[start, end)`` of the whole days a date filter compares with, or None if they do not parse."""
+    day = pd.to_datetime(model.get('dateFrom'), errors='coerce')
+    if pd.isna(day):
+        return None
+    start = day.normalize()
+    end = start + pd.Timedelta(days=1)
+    if kind == 'inRange':
+        last = pd.to_datetime(model.get('dateTo'), errors='coerce')
+        if pd.isna(last):
+            return None
+        end = last.normalize() + pd.Timedelta(days=1)
+    return start, end
+
+
+def filter_condition(column, model, params):
+    """SQL condition for one column filter of the grid's filter model, or None if unsupported.
+
+    Number filters compare values; date filters compare whole days, with
+    ``inRange`` including both ends. Combined filters (two conditions joined by
+    AND/OR) are translated recursively.
+    """
+    parts = model.get('conditions') or [model[key] for key in ('condition1', 'condition2') if key in model]
+    if parts:
+        conditions = [filter_condition(column, part, params) for part in parts]
+        if None in conditions:
+            return None
+        joiner = ' OR ' if model.get('operator') == 'OR' else ' AND '
+        return "(" + joiner.join(conditions) + ")"
+
+    kind = model.get('type')
+    if kind == 'blank':
+        return f"{column} IS NULL"
+    if kind == 'notBlank':
+        return f"{column} IS NOT NULL"
+
+    def bind(value):
+        name = f"grid_{len(params)}"
+        params[name] = value
+        return f":{name}"
+
+    if model.get('filterType') == 'date':
+        bounds = day_bounds(kind, model)
+        if bounds is None:
+            return None
+        fmt = '%Y-%m-%d %H:%M:%S'
+        start, end = (bound.strftime(fmt) for bound in bounds)
+        return {
+            'equals': lambda: f"({column} >= {bind(start)} AND {column} < {bind(end)})",
+            'notEqual': lambda: f"({column} < {bind(start)} OR {column} >= {bind(end)})",
+            'lessThan': lambda: f"{column} < {bind(start)}",
+            'greaterThan': lambda: f"{column} >= {bind(end)}",
+            'inRange': lambda: f"({column} >= {bind(start)} AND {column} < {bind(end)})",
+        }.get(kind, lambda: None)()
+
+    value = model.get('filter')
+    if value is None:
+        return None
+    if kind == 'inRange' and model.get('filterTo') is not None:
+        return f"{column} BETWEEN {bind(value)} AND {bind(model['filterTo'])}"
+    if kind in NUMBER_OPERATORS:
+        return f"{column} {NUMBER_OPERATORS[kind]} {bind(value)}"
+    return None
+
+
+def filter_mask(series, model):
+    """``filter_condition`` evaluated on a column of archived rows, or None if unsupported."""
+    parts = model.get('conditions') or [model[key] for key in ('condition1', 'condition2') if key in model]
+    if parts:
+        masks = [filter_mask(series, part) for part in parts]
+        if any(mask is None for mask in masks):
+            return None
+        return functools.reduce(operator.or_ if model.get('operator') == 'OR' else operator.and_, masks)
+
+    kind = model.get('type')
+    if kind == 'blank':
+        return series.isna()
+    if kind == 'notBlank':
+        return series.notna()
+
+    if model.get('filterType') == 'date':
+        bounds = day_bounds(kind, model)
+        if bounds is None:
+            return None
+        start, end = bounds
+        return {
+            'equals': lambda: (series >= start) & (series < end),
+            'notEqual': lambda: (series < start) | (series >= end),
+            'lessThan': lambda: series < start,
+            'greaterThan': lambda: series >= end,
+            'inRange': lambda: (series >= start) & (series < end),
+        }.get(kind, lambda: None)()
+
+    value = model.get('filter')
+    if value is None:
+        return None
+    if kind == 'inRange' and model.get('filterTo') is not None:
+        return series.between(value, model['filterTo'])
+    if kind in NUMBER_OPERATORS:
+        # NULL never matches a comparison in SQL
+        return COMPARISONS[NUMBER_OPERATORS[kind]](series, value) & series.notna()
+    return None
+
+
+def grid_conditions(filter_model, params):
+    conditions = []
+    for column, model in (filter_model or {}).items():
+        if column not in GRID_COLUMNS:
+            continue
+        condition = filter_condition(column, model, params)
+        if condition is None:
+            print(f"Ignoring unsupported grid filter on {column}: {model}")
+            continue
+        conditions.append(condition)
+    return conditions
+
+
+def fetch_rows_block(request, start_date=None, end_date=None, start_time=None, end_time=None, sensor_id=None):
+    """``getRowsResponse`` for a grid ``getRowsRequest``, filtered by the dashboard inputs too.
+
+    ``rowCount`` is only sent once the last block has been read, so the grid keeps
+    asking for more rows as the user scrolls and no ``COUNT(*)`` is needed. Blocks
+    bypass the query cache: the grid caches its own blocks, and each one is read once.
+    """
+    conditions, params = build_filters(start_date, end_date, start_time, end_time, sensor_id)
+    conditions += grid_conditions(request.get('filterModel'), params)
+    terms = sort_terms(request.get('sortModel'))
+    start = int(request.get('startRow') or 0)
+    limit = max(0, int(request.get('endRow') or start) - start)
+
+    read_archive, read_hot, cutoff = split_at_archive(params)
+    conditions, params = hot_filters(conditions, params, cutoff)
+    if read_archive:
+        block = archive_block(request.get('filterModel'), conditions, params, terms, start, limit, read_hot)
+    else:
+        block = hot_block(conditions, params, terms, start, limit)
+    rows = block_records(block)
+
+    response = {'rowData': rows}
+    if len(rows) < limit:
+        response['rowCount'] = start + len(rows)
+    return response
+
+
+def archive_block(filter_model, conditions, params, terms, start, limit, read_hot):
+    """One block of the archived rows followed (or preceded) by the rows still in MySQL.
+
+    Every archived row is older than every row in MySQL, so a timestamp sort pages over
+    one tier and then the other. Any other sort interleaves them: the first
+    ``start + limit`` rows of each tier are merged and the block is cut from those.
+    """
+    archived = archive.read(params, with_id=True)
+    for column, model in (filter_model or {}).items():
+        mask = filter_mask(archived[column], model) if column in GRID_COLUMNS else None
+        if mask is not None:
+            archived = archived[mask]
+    archived = sort_frame(archived, terms)
+
+    def hot(offset, count):
+        return hot_block(conditions, params, terms, offset, count) if read_hot else archived.iloc[:0]
+
+    column, ascending = terms[0]
+    if column != 'timestamp':
+        merged = sort_frame(pd.concat([archived, hot(0, start + limit)], ignore_index=True), terms)
+        return merged.iloc[start:start + limit]
+    if ascending:
+        head = archived.iloc[start:start + limit]
+        return pd.concat([head, hot(max(0, start - len(archived)), limit - len(head))], ignore_index=True)
+    hot_rows = count_hot(conditions, params) if read_hot else 0
+    head = hot(start, limit) if start < hot_rows else archived.iloc[:0]
+    tail = archived.iloc[max(0, start - hot_rows):][:limit - len(head)]
+    return pd.concat([head, tail], ignore_index=True)
+
+
+def sort_frame(df, terms):
+    return df.sort_values([column for column, _ in terms], ascending=[ascending for _, ascending in terms],
+                          kind='stable')
+
+
+def hot_block(conditions, params, terms, offset, limit):
+    if limit <= 0:
+        return pd.DataFrame(columns=['id'] + GRID_COLUMNS)
+    query = (
+        "SELECT id, " + ", ".join(GRID_COLUMNS) + " FROM sensor_data"
+        + where_clause(conditions)
+        + order_by(terms)
+        + " LIMIT :limit OFFSET :offset"
+    )
+    df = pd.read_sql(text(query), engine, params=dict(params, limit=limit, offset=offset))
+    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+
+def count_hot(conditions, params):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM sensor_data" + where_clause(conditions)), params).scalar()
+
+
+def block_records(df):
+    df = df.copy()
+    df['timestamp'] = pd.to_datetime(df['timestamp']).dt.strftime('%Y-%m-%d %H:%M:%S')
+    return df.to_dict('records')
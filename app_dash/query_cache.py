@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+
+class QueryCache:
+    """Process-wide cache of query results shared by all callbacks and browser tabs.
+
+    Entries are keyed by the query's filter parameters and are valid while the
+    table's change marker (``MAX(id)`` of ``sensor_data``) is unchanged and the entry
+    is younger than ``ttl`` seconds; the TTL also covers changes that do not move the
+    marker, such as deletes. The marker is read at most once per ``marker_interval``.
+    Least recently used entries are evicted beyond ``max_entries`` or ``max_bytes``.
+    Concurrent misses on the same key wait for a single query.
+
+    Cached DataFrames are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, engine, ttl=60.0, max_entries=64, max_bytes=256 * 1024 * 1024,
+                 marker_interval=1.0, marker_query="SELECT MAX(id) FROM sensor_data"):
+        self.engine = engine
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.marker_interval = marker_interval
+        self.marker_query = text(marker_query)
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # key -> [lock, callers holding or waiting for it]; dropped when the last one leaves
+        self._key_locks = {}
+        self._marker = None
+        self._marker_checked = 0.0
+        self._marker_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.marker_queries = 0
+
+    def marker(self):
+        """Current change marker, re-read from the database at most once per interval."""
+        with self._marker_lock:
+            now = time.monotonic()
+            if now - self._marker_checked >= self.marker_interval:
+                with self.engine.connect() as conn:
+                    self._marker = conn.execute(self.marker_query).scalar()
+                self._marker_checked = now
+                self.marker_queries += 1
+            return self._marker
+
+    def get(self, key, loader):
+        """Return the cached value for ``key`` or call ``loader()`` once to fill it."""
+        marker = self.marker()
+        value = self._lookup(key, marker)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            key_lock[1] += 1
+        try:
+            with key_lock[0]:
+                # another caller may have filled the entry while we waited
+                value = self._lookup(key, marker)
+                if value is not None:
+                    return value
+                with self._lock:
+                    self.misses += 1
+                value = loader()
+                self._store(key, marker, value)
+                return value
+        finally:
+            with self._lock:
+                key_lock[1] -= 1
+                if not key_lock[1]:
+                    del self._key_locks[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 3) if total else 0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'evictions': self.evictions,
+                'marker': self._marker,
+                'marker_queries': self.marker_queries,
+            }
+
+    def _lookup(self, key, marker):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, entry_marker, created, _ = entry
+            if entry_marker != marker or time.monotonic() - created > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def _store(self, key, marker, value):
+        size = _size_of(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, marker, time.monotonic(), size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+
+def _size_of(value):
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return 0
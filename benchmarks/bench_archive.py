@@ -0,0 +1,135 @@
+"""Parquet archive tier vs the row store: storage size and scan latency.
+
+Exports every day of ``sensor_data`` with ``database/archive_partitions.write_partition``
+into a temporary archive, then times the same filtered reads against the database
+(``query_hot_data``) and the archive (``ParquetArchive.read``) and checks that they
+return the same rows. Prints JSON.
+
+Runs against ``--url`` / ``DATABASE_URL`` (read-only; nothing is deleted) or a
+synthetic SQLite database::
+
+    python benchmarks/bench_archive.py --rows 500000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..', 'app_dash'))
+sys.path.insert(0, os.path.join(HERE, '..', 'database'))
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from synthetic import create_database
+
+
+def table_bytes(engine):
+    """Bytes used by sensor_data and its indexes in the database."""
+    with engine.connect() as conn:
+        if engine.dialect.name == 'sqlite':
+            return conn.execute(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name IN ('sensor_data', 'idx_sensor_data_timestamp')"
+            )).scalar()
+        return conn.execute(text(
+            "SELECT data_length + index_length FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = 'sensor_data'"
+        )).scalar()
+
+
+def build_archive(engine, archive_dir):
+    from archive_partitions import save_manifest, write_partition
+
+    frame = pd.read_sql(text(
+        "SELECT id, temperature, humidity, sound_volume, prediction, timestamp, sensor_id FROM sensor_data "
+        "ORDER BY timestamp, id"
+    ), engine)
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    manifest = {'archived_through': None, 'files': {}}
+    started = time.perf_counter()
+    for day, rows in frame.groupby(frame['timestamp'].dt.date):
+        name = f"sensor_data_{day.isoformat()}.parquet"
+        total, size = write_partition(rows, os.path.join(archive_dir, name))
+        manifest['files'][day.isoformat()] = {'file': name, 'rows': total, 'bytes': size}
+    last_day = max(manifest['files'])
+    manifest['archived_through'] = f"{pd.Timestamp(last_day) + pd.Timedelta(days=1):%Y-%m-%d %H:%M:%S}"
+    save_manifest(archive_dir, manifest)
+    return manifest, time.perf_counter() - started, frame['timestamp'].min()
+
+
+def timed(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, {'median_ms': round(statistics.median(timings), 2), 'min_ms': round(min(timings), 2)}
+
+
+def same_rows(a, b):
+    columns = ['temperature', 'humidity', 'sound_volume', 'prediction', 'timestamp']
+    a, b = a[columns].reset_index(drop=True), b[columns].reset_index(drop=True)
+    return len(a) == len(b) and bool((a == b).all().all())
+
+
+def run(repeats, first):
+    import data_processing as dp
+
+    day = f"{first:%Y-%m-%d}"
+    scenarios = {
+        'all rows': {},
+        'one day': {'start_date': day, 'end_date': day},
+        'one hour of one day': {'start_date': day, 'end_date': day, 'start_time': '12:00', 'end_time': '12:59'},
+        'time of day, all days': {'start_time': '08:00', 'end_time': '09:00'},
+    }
+    results = {}
+    for name, filters in scenarios.items():
+        conditions, params = dp.build_filters(**filters)
+        db_rows, db_timing = timed(lambda: dp.query_hot_data(conditions, params), repeats)
+        archive_rows, archive_timing = timed(lambda: dp.archive.read(params), repeats)
+        results[name] = {
+            'filters': filters,
+            'rows': len(db_rows),
+            'matches': same_rows(db_rows, archive_rows),
+            'database': db_timing,
+            'archive': archive_timing,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Parquet archive against the database.')
+    parser.add_argument('--url', default=os.getenv('DATABASE_URL'), help='SQLAlchemy URL of a populated database')
+    parser.add_argument('--rows', type=int, default=500000, help='synthetic rows when no --url is given')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or create_database(os.path.join(tmp, 'sensor_data.db'), args.rows)
+        archive_dir = os.path.join(tmp, 'archive')
+        os.makedirs(archive_dir)
+        engine = create_engine(url)
+        manifest, export_seconds, first = build_archive(engine, archive_dir)
+
+        os.environ.update({'DATABASE_URL': url, 'ARCHIVE_DIR': archive_dir, 'REALTIME_BUFFER_ROWS': '0', 'ALERT_URL': ''})
+        archive_bytes = sum(entry['bytes'] for entry in manifest['files'].values())
+        database_bytes = table_bytes(engine)
+        report = {
+            'database': engine.dialect.name,
+            'rows': sum(entry['rows'] for entry in manifest['files'].values()),
+            'days': len(manifest['files']),
+            'storage': {
+                'database_bytes': database_bytes,
+                'archive_bytes': archive_bytes,
+                'ratio': round(database_bytes / archive_bytes, 1) if database_bytes else None,
+            },
+            'export_seconds': round(export_seconds, 2),
+            'repeats': args.repeats,
+            'scenarios': run(args.repeats, first),
+        }
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,98 @@
+"""Dashboard KPIs from fetched rows vs one aggregate query.
+
+Compares the old path (fetch every matching row, then pandas ``mean``/``min``/``max``/
+``value_counts``) with ``query_stats`` in ``app_dash/data_processing.py`` for a few
+filter combinations, and prints rows fetched, result size and latency as JSON.
+Both paths bypass the query cache and the rollup tables.
+
+Runs against ``--url`` / ``DATABASE_URL`` when given, otherwise against a synthetic
+SQLite database (see ``synthetic.py``)::
+
+    python benchmarks/bench_dashboard_stats.py --rows 500000
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+sys.path.insert(0, os.path.join(HERE, '..', 'app_dash'))
+
+from synthetic import create_database
+
+SCENARIOS = {
+    'all rows': {},
+    'one day': {'start_date': '2024-10-01', 'end_date': '2024-10-01'},
+    'time of day': {'start_time': '08:00', 'end_time': '12:00'},
+}
+
+
+def stats_from_rows(df, metrics):
+    """The numbers the callbacks used to compute from the fetched frame."""
+    counts = df['prediction'].value_counts()
+    stats = {'count': len(df), 'anomalies': int(counts.get(1, 0))}
+    for m in metrics:
+        stats[f'avg_{m}'] = df[m].mean()
+        stats[f'min_{m}'] = df[m].min()
+        stats[f'max_{m}'] = df[m].max()
+    return stats
+
+
+def timed(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, {'median_ms': round(statistics.median(timings), 2), 'min_ms': round(min(timings), 2)}
+
+
+def same_stats(a, b):
+    return all(
+        a[key] == b[key] if a[key] is None or b[key] is None else math.isclose(a[key], b[key], rel_tol=1e-9, abs_tol=1e-6)
+        for key in a
+    )
+
+
+def run(repeats):
+    dp = __import__('data_processing')
+    results = {}
+    for name, filters in SCENARIOS.items():
+        conditions, params = dp.build_filters(**filters)
+
+        def from_rows():
+            df = dp.query_data(conditions, params)
+            return df, stats_from_rows(df, dp.METRICS)
+
+        (df, expected), rows_timing = timed(from_rows, repeats)
+        stats, sql_timing = timed(lambda: dp.query_stats(conditions, params), repeats)
+
+        results[name] = {
+            'filters': filters,
+            'matches': same_stats(stats, expected) if stats['count'] else expected['count'] == 0,
+            'rows': {'rows_fetched': len(df), 'result_json_bytes': len(df.to_json(orient='records', date_format='iso')), **rows_timing},
+            'aggregate': {'rows_fetched': 1, 'result_json_bytes': len(json.dumps(stats)), **sql_timing},
+        }
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark dashboard KPIs: fetched rows vs SQL aggregation.')
+    parser.add_argument('--url', default=os.getenv('DATABASE_URL'), help='SQLAlchemy URL of a populated database')
+    parser.add_argument('--rows', type=int, default=200000, help='synthetic rows when no --url is given')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or create_database(os.path.join(tmp, 'sensor_data.db'), args.rows)
+        os.environ['DATABASE_URL'] = url
+        # the buffer would answer the unfiltered case from memory; measure the queries
+        os.environ['REALTIME_BUFFER_ROWS'] = '0'
+        report = {'database': url.split(':', 1)[0], 'rows': args.rows if not args.url else None,
+                  'repeats': args.repeats, 'scenarios': run(args.repeats)}
+        print(json.dumps(report, indent=2))
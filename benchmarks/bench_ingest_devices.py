@@ -0,0 +1,141 @@
+"""Write throughput of the Flask service's database writer as the number of devices grows.
+
+For every combination of ``--shards`` and ``--devices`` the script starts a
+``ShardedDBWriter`` (``app/db_writer.py``) against a scratch table, lets each device
+submit ``--rows`` readings from its own thread in batches of ``--batch`` (device 0
+sends ``--noisy`` times as many) and waits until everything is committed. It reports
+rows per second and the submit-to-insert latency of the noisy device and of the
+others, so the effect of sharding on quiet devices is visible. Results are printed
+as JSON.
+
+It needs a MySQL server (the rollup and partitioning features are not involved):
+
+    MYSQL_DB_USER=root MYSQL_ROOT_PASSWORD=... python benchmarks/bench_ingest_devices.py --host 127.0.0.1 --port 3307
+
+The scratch database ``--database`` is created and dropped by the script.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import sys
+import threading
+import time
+
+import mysql.connector
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db_writer import ShardedDBWriter  # noqa: E402
+
+TABLE = """
+    CREATE TABLE sensor_data (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        temperature FLOAT,
+        humidity FLOAT,
+        sound_volume FLOAT,
+        prediction INT,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sensor_id INT UNSIGNED NOT NULL DEFAULT 0,
+        model_version VARCHAR(64) NOT NULL DEFAULT '',
+        INDEX idx_sensor_data_timestamp (timestamp),
+        INDEX idx_sensor_data_sensor_timestamp (sensor_id, timestamp)
+    )
+"""
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+
+def reset_table(server_config, database):
+    conn = mysql.connector.connect(**server_config)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    cursor.execute(f"DROP TABLE IF EXISTS {database}.sensor_data")
+    cursor.execute(f"USE {database}")
+    cursor.execute(TABLE)
+    cursor.close()
+    conn.close()
+
+
+def run(server_config, database, shards, devices, rows, batch, noisy):
+    reset_table(server_config, database)
+    latencies = {'noisy': [], 'quiet': []}
+    lock = threading.Lock()
+
+    def record(cursor, flushed):
+        now = dt.datetime.now()
+        with lock:
+            for row in flushed:
+                kind = 'noisy' if row[5] == 0 else 'quiet'
+                latencies[kind].append((now - row[4]).total_seconds() * 1000)
+
+    writer = ShardedDBWriter(dict(server_config, database=database), shards=shards, pool_size=2,
+                             batch_size=500, flush_interval=0.05, on_flush=record)
+    writer.start()
+
+    def device(sensor_id):
+        total = rows * (noisy if sensor_id == 0 else 1)
+        for start in range(0, total, batch):
+            n = min(batch, total - start)
+            now = dt.datetime.now()
+            writer.submit_many([(24.0, 50.0, 60.0)] * n, [0] * n, [now] * n, [sensor_id] * n)
+
+    expected = rows * (devices - 1 + noisy)
+    started = time.perf_counter()
+    threads = [threading.Thread(target=device, args=(i,)) for i in range(devices)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    while writer.stats()['rows_written'] + writer.stats()['rows_dropped'] < expected:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    stats = writer.stats()
+    writer.stop()
+
+    return {
+        'shards': shards,
+        'devices': devices,
+        'rows': expected,
+        'rows_dropped': stats['rows_dropped'],
+        'sync_writes': stats['sync_writes'],
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(stats['rows_written'] / elapsed),
+        'noisy_latency_ms': {'p50': percentile(latencies['noisy'], 0.5), 'p95': percentile(latencies['noisy'], 0.95)},
+        'quiet_latency_ms': {'p50': percentile(latencies['quiet'], 0.5), 'p95': percentile(latencies['quiet'], 0.95)},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure writer throughput for a growing number of devices.')
+    parser.add_argument('--host', default=os.getenv('MYSQL_DB_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('MYSQL_DB_PORT', 3307)))
+    parser.add_argument('--database', default='sensor_ingest_bench', help='scratch database, dropped afterwards')
+    parser.add_argument('--shards', default='1,4', help='comma-separated shard counts')
+    parser.add_argument('--devices', default='1,4,16,64', help='comma-separated device counts')
+    parser.add_argument('--rows', type=int, default=2000, help='readings per device')
+    parser.add_argument('--batch', type=int, default=50, help='readings per submit')
+    parser.add_argument('--noisy', type=int, default=10, help='device 0 sends this many times more readings')
+    args = parser.parse_args()
+
+    server_config = {
+        'host': args.host,
+        'port': args.port,
+        'user': os.getenv('MYSQL_DB_USER'),
+        'password': os.getenv('MYSQL_ROOT_PASSWORD'),
+    }
+    results = []
+    try:
+        for shards in [int(s) for s in args.shards.split(',')]:
+            for devices in [int(d) for d in args.devices.split(',')]:
+                results.append(run(server_config, args.database, shards, devices, args.rows, args.batch, args.noisy))
+    finally:
+        conn = mysql.connector.connect(**server_config)
+        conn.cursor().execute(f"DROP DATABASE IF EXISTS {args.database}")
+        conn.close()
+    print(json.dumps({'rows_per_device': args.rows, 'noisy_factor': args.noisy, 'results': results}, indent=2))
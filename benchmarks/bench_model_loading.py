@@ -0,0 +1,159 @@
+"""Model loading time and per-worker memory, with and without memory mapping.
+
+``--workers`` processes are forked from a parent that has already imported NumPy,
+scikit-learn and the app's scorers, as the workers of a pre-fork server are. Each
+one loads a pipeline the way the service does and compiles its scorer:
+
+* ``copy``: ``joblib.load`` into private memory (how ``app.py`` loaded the model before
+  the model registry);
+* ``mmap``: ``joblib.load(mmap_mode='r')`` of an uncompressed pipeline, as
+  ``model_registry.load_pipeline`` does.
+
+All workers stay alive until each has reported, so ``Pss`` (resident memory with
+shared pages divided among the processes sharing them) adds up to what the workers
+really use. Memory comes from ``/proc/self/smaps_rollup`` (Linux).
+
+``--app-dir`` also times ``import app`` (service startup up to serving) in each given
+directory with the artifact as ``MODEL_PIPELINE`` and as the only version in
+``MODEL_DIR``, for example in a checkout of an older commit:
+
+    git worktree add /tmp/app-before HEAD~1
+    python bench_model_loading.py --artifact ../app/model_pipeline.joblib --app-dir /tmp/app-before/app --app-dir ../app
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..', 'app'))
+
+from fast_model import compile_scorer  # noqa: E402
+from model_registry import load_pipeline, publish  # noqa: E402
+
+MODES = ['copy', 'mmap']
+FIELDS = ['Rss', 'Pss', 'Shared_Clean', 'Private_Clean', 'Private_Dirty']
+STARTUP = """
+import json, os, time
+started = time.perf_counter()
+import app
+seconds = time.perf_counter() - started
+with open('/proc/self/smaps_rollup') as f:
+    rss = [int(line.split()[1]) for line in f if line.startswith('Rss:')][0]
+print(json.dumps({'import_seconds': seconds, 'rss_kb': rss}))
+os._exit(0)
+"""
+
+
+def memory():
+    """Fields of ``/proc/self/smaps_rollup`` in KiB."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in FIELDS:
+                values[name] = int(rest.split()[0])
+    return values
+
+
+def worker(mode, path, results, ready):
+    before = memory()
+    started = time.perf_counter()
+    model, scaler = load_pipeline(path, mmap=mode == 'mmap')
+    scorer = compile_scorer(model, scaler)
+    scorer.predict(np.asarray([scaler.mean_], dtype=float))
+    seconds = time.perf_counter() - started
+    after = memory()
+    results.put({'seconds': seconds, 'before': before, 'after': after})
+    # stay alive until every worker has measured, so shared pages are divided among all of them
+    ready.wait()
+    os._exit(0)
+
+
+def run_workers(mode, path, count):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    ready = context.Event()
+    processes = [context.Process(target=worker, args=(mode, path, results, ready)) for _ in range(count)]
+    for process in processes:
+        process.start()
+    measured = [results.get(timeout=300) for _ in processes]
+    ready.set()
+    for process in processes:
+        process.join()
+
+    def total(field):
+        return sum(m['after'][field] for m in measured)
+
+    return {
+        'load_seconds_median': round(statistics.median(m['seconds'] for m in measured), 4),
+        'load_seconds_max': round(max(m['seconds'] for m in measured), 4),
+        'rss_kb_per_worker': round(total('Rss') / count),
+        'pss_kb_per_worker': round(total('Pss') / count),
+        'pss_kb_total': total('Pss'),
+        'model_rss_kb_per_worker': round(sum(m['after']['Rss'] - m['before']['Rss'] for m in measured) / count),
+        'model_private_kb_per_worker': round(sum(
+            (m['after']['Private_Clean'] + m['after']['Private_Dirty'])
+            - (m['before']['Private_Clean'] + m['before']['Private_Dirty']) for m in measured) / count),
+    }
+
+
+def startup(app_dir, env, repeats):
+    """Median ``import app`` time and the resulting RSS of a fresh interpreter in ``app_dir``."""
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', STARTUP], cwd=app_dir, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'import_seconds_median': round(statistics.median(r['import_seconds'] for r in runs), 3),
+        'rss_kb_median': round(statistics.median(r['rss_kb'] for r in runs)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Time model loading and measure worker memory.')
+    parser.add_argument('--artifact', default=os.path.join(HERE, '..', 'app', 'model_pipeline.joblib'),
+                        help='scaler + model pipeline written by model_not_need/model.py')
+    parser.add_argument('--workers', type=int, default=4, help='forked worker processes per mode')
+    parser.add_argument('--modes', default=','.join(MODES), help=f"comma-separated, of {', '.join(MODES)}")
+    parser.add_argument('--app-dir', action='append', default=[], help='time the service startup in this directory')
+    parser.add_argument('--repeats', type=int, default=5, help='startup runs per --app-dir')
+    parser.add_argument('--output', help='also write the JSON results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # the registry's copy of the artifact: uncompressed, so it can be memory-mapped
+        version = publish(args.artifact, directory, 'bench')
+        path = os.path.join(directory, version, 'pipeline.joblib')
+        model, _ = load_pipeline(path, mmap=False)
+        results = {
+            'artifact': os.path.abspath(args.artifact),
+            'model': model.__class__.__name__,
+            'artifact_kb': round(os.path.getsize(path) / 1024),
+            'workers': args.workers,
+            'loading': {},
+            'startup': {},
+        }
+        del model
+        for mode in args.modes.split(','):
+            results['loading'][mode] = run_workers(mode, path, args.workers)
+
+        # a service without the registry loads the same artifact from MODEL_PIPELINE
+        env = dict(os.environ, MODEL_DIR=directory, MODEL_PIPELINE=os.path.abspath(args.artifact),
+                   MODEL_POLL_INTERVAL='0', WRITE_SHARDS='1')
+        for app_dir in args.app_dir:
+            results['startup'][os.path.abspath(app_dir)] = startup(app_dir, env, args.repeats)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
@@ -0,0 +1,355 @@
+"""Reproducible benchmark suite for the prediction service and the dashboard.
+
+Groups (``--groups``, all by default):
+
+* ``predict``: ``/predict`` with one reading, ``/predict/batch`` with JSON batches of
+  1, 100 and 1000 readings and a binary batch of 1000, and the request-path cost of
+  ``save_to_db`` (queueing for the background writer), through Flask's test client.
+* ``db_write``: the database insert itself on SQLite, one connection and commit per
+  row (the original ``save_to_db``) against the writer's 500-row transactions.
+* ``fetch_data``: for each ``--sizes`` database, the real-time buffer (first load and
+  refresh tick), the whole table, one day, one hour, one hour of every day, and a
+  query-cache hit.
+* ``callbacks``: for each size, the ``app_dash.py`` callbacks on one day of data,
+  building the three time-series figures, ``to_dict("records")`` of the day's rows,
+  and one grid block.
+
+The data is synthetic ``sensor_data`` resampled from ``model_not_need/dataset.csv``
+(``synthetic.py``), one reading per second from 2024-10-01, in SQLite databases that
+are kept in ``--data-dir`` and reused by later runs with the same size and seed.
+Each group runs in its own process, so imports and caches do not leak between them.
+MySQL is not needed. The service's writer cannot reach a database here, so its
+queue is made large enough that no request writes synchronously.
+
+Results are written as JSON (``--output``); ``--compare`` flags every median that got
+slower than ``--threshold`` times the one in an earlier result file::
+
+    python benchmarks/bench_suite.py --output baseline.json
+    python benchmarks/bench_suite.py --sizes 10k,1m,10m --compare baseline.json --output new.json
+
+SQLite and the Flask test client stand in for MySQL and a real server: compare runs
+with each other on the same machine, not with production latency.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from importlib import metadata
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_DIR = os.path.join(ROOT, 'app')
+DASH_DIR = os.path.join(ROOT, 'app_dash')
+sys.path.insert(0, HERE)
+
+from synthetic import create_database, synthetic_rows  # noqa: E402
+
+GROUPS = ['predict', 'db_write', 'fetch_data', 'callbacks']
+DAY = '2024-10-01'
+HOUR = ('01:00', '01:59')
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    factor = {'k': 10 ** 3, 'm': 10 ** 6}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * factor)
+
+
+def timed(fn, repeats, warmup=1):
+    """Result of the last call and median/p95/min milliseconds over ``repeats`` calls."""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(float(np.percentile(timings, 95)), 3),
+        'min_ms': round(min(timings), 3),
+        'runs': repeats,
+    }
+
+
+def readings(n, seed=0):
+    rows = synthetic_rows(n, seed=seed, distribution='dataset')
+    return [{'temperature': t, 'humidity': h, 'sound_volume': s} for t, h, s, *_ in rows]
+
+
+# --- groups run in a worker process -------------------------------------------------
+
+def bench_predict(repeats):
+    os.chdir(APP_DIR)
+    sys.path.insert(0, APP_DIR)
+    import app as service
+    import binary_format
+
+    client = service.app.test_client()
+    results = {}
+
+    single = readings(1)[0]
+    _, results['predict_single'] = timed(lambda: client.post('/predict', json=single), repeats * 20)
+
+    for size in (1, 100, 1000):
+        batch = readings(size, seed=size)
+        _, timing = timed(lambda: client.post('/predict/batch', json=batch), repeats * 4)
+        timing['per_reading_us'] = round(timing['median_ms'] * 1000 / size, 2)
+        results[f'predict_batch_json_{size}'] = timing
+
+    batch = readings(1000, seed=1000)
+    records = np.zeros(len(batch), dtype=binary_format.RECORD_DTYPE)
+    for name in binary_format.FEATURES:
+        records[name] = [reading[name] for reading in batch]
+    body = records.tobytes()
+    _, timing = timed(lambda: client.post('/predict/batch', data=body,
+                                          headers={'Content-Type': binary_format.RECORD_CONTENT_TYPE}),
+                      repeats * 4)
+    timing['per_reading_us'] = round(timing['median_ms'] * 1000 / len(batch), 2)
+    results['predict_batch_binary_1000'] = timing
+
+    calls = 1000
+    _, timing = timed(lambda: [service.save_to_db(single, 0) for _ in range(calls)], repeats)
+    results['save_to_db_enqueue'] = {'calls': calls, 'per_call_us': round(timing['median_ms'] * 1000 / calls, 2),
+                                     **timing}
+    return results
+
+
+def bench_dashboard(repeats, size, full_scan_max, groups):
+    os.chdir(DASH_DIR)
+    sys.path.insert(0, DASH_DIR)
+    import data_processing as dp
+
+    results = {}
+    day_conditions, day_params = dp.build_filters(DAY, DAY)
+
+    if 'fetch_data' in groups:
+        def query(*filters):
+            conditions, params = dp.build_filters(*filters)
+            df, timing = timed(lambda: dp.query_data(conditions, params), repeats)
+            return {'rows': len(df), **timing}
+
+        fetch = {}
+        df, timing = timed(lambda: dp.RollingBuffer(dp.engine).frame(), repeats)
+        fetch['realtime_first_load'] = {'rows': len(df), **timing}
+        buffer = dp.RollingBuffer(dp.engine, refresh_interval=0)
+        buffer.frame()
+        df, timing = timed(buffer.frame, repeats)
+        fetch['realtime_tick'] = {'rows': len(df), **timing}
+        if size <= full_scan_max:
+            fetch['all_rows'] = query()
+        else:
+            fetch['all_rows'] = {'skipped': f'more than --full-scan-max {full_scan_max} rows'}
+        fetch['one_day'] = query(DAY, DAY)
+        fetch['one_hour'] = query(DAY, DAY, *HOUR)
+        fetch['hour_of_every_day'] = query(None, None, *HOUR)
+        dp.fetch_data(DAY, DAY)
+        df, timing = timed(lambda: dp.fetch_data(DAY, DAY), repeats * 20)
+        fetch['one_day_cached'] = {'rows': len(df), **timing}
+        results['fetch_data'] = fetch
+
+    if 'callbacks' in groups:
+        import app_dash as ad
+
+        callbacks = {}
+        df = dp.query_data(day_conditions, day_params)
+        figures, timing = timed(lambda: [ad.time_series_figure(df, column, column) for column in ad.GRAPH_COLUMNS],
+                                repeats)
+        callbacks['time_series_figures'] = {
+            'rows': len(df), 'figure_json_bytes': sum(len(figure.to_json()) for figure in figures), **timing,
+        }
+        records, timing = timed(lambda: df.to_dict('records'), repeats)
+        callbacks['to_dict_records'] = {'rows': len(records), **timing}
+        request = {'startRow': 0, 'endRow': 100, 'sortModel': [], 'filterModel': {}}
+        block, timing = timed(lambda: ad.update_grid_rows(request, DAY, DAY, None, None, None), repeats)
+        callbacks['grid_block'] = {'rows': len(block['rowData']), **timing}
+        _, callbacks['update_data_one_day'] = timed(
+            lambda: ad.update_data(1, 0, DAY, DAY, None, None, None, None), repeats)
+        _, callbacks['update_data_realtime'] = timed(
+            lambda: ad.update_data(0, 0, None, None, None, None, None, None), repeats)
+        _, callbacks['update_min_max_one_day'] = timed(
+            lambda: ad.update_min_max(0, DAY, DAY, None, None, None), repeats)
+        _, callbacks['update_distribution_one_day'] = timed(
+            lambda: ad.update_distribution_chart(0, DAY, DAY, None, None, None, False), repeats)
+        results['callbacks'] = callbacks
+    return results
+
+
+# --- driver -------------------------------------------------------------------------
+
+def bench_db_write(repeats, path):
+    """Rows per second for per-row commits and for the writer's batched transactions."""
+    rows = synthetic_rows(20000, distribution='dataset')
+    insert = ("INSERT INTO sensor_data (temperature, humidity, sound_volume, prediction, timestamp, sensor_id) "
+              "VALUES (?, ?, ?, ?, ?, ?)")
+    create_database(path, 0)
+
+    def per_row(n=500):
+        for row in rows[:n]:
+            conn = sqlite3.connect(path)
+            conn.execute(insert, row)
+            conn.commit()
+            conn.close()
+        return n
+
+    def batched(batch_size=500):
+        conn = sqlite3.connect(path)
+        for start in range(0, len(rows), batch_size):
+            conn.executemany(insert, rows[start:start + batch_size])
+            conn.commit()
+        conn.close()
+        return len(rows)
+
+    results = {}
+    for name, fn in (('per_row_commit', per_row), ('batched_500', batched)):
+        n, timing = timed(fn, repeats)
+        results[name] = {'rows': n, 'rows_per_s': round(n / timing['median_ms'] * 1000), **timing}
+    return results
+
+
+def run_worker(worker_args, repeats, result_path, env):
+    command = [sys.executable, os.path.abspath(__file__), '--repeats', str(repeats), '--result', result_path] + worker_args
+    completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if completed.returncode:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def database_for(size, seed, data_dir):
+    path = os.path.join(data_dir, f'sensor_data_{size}_seed{seed}.db')
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        create_database(path + '.tmp', size, seed=seed, distribution='dataset')
+        os.replace(path + '.tmp', path)
+        print(f"Built {path} in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return f"sqlite:///{path}"
+
+
+def environment():
+    versions = {}
+    for name in ('numpy', 'pandas', 'scikit-learn', 'flask', 'dash', 'plotly', 'sqlalchemy'):
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = None
+    versions['sqlite'] = sqlite3.sqlite_version
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'date': dt.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'versions': versions,
+    }
+
+
+def medians(results, prefix=''):
+    """``{dotted.path: median_ms}`` of every timing in a result tree."""
+    found = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if 'median_ms' in value:
+                found[prefix + key] = value['median_ms']
+            else:
+                found.update(medians(value, f"{prefix}{key}."))
+    return found
+
+
+def compare(current, previous, threshold):
+    old, new = medians(previous['results']), medians(current['results'])
+    changes = {}
+    for key in sorted(old.keys() & new.keys()):
+        if old[key] > 0:
+            changes[key] = {'before_ms': old[key], 'after_ms': new[key], 'ratio': round(new[key] / old[key], 3)}
+    regressions = [key for key, change in changes.items() if change['ratio'] > threshold]
+    return {'against': previous['environment'], 'threshold': threshold, 'changes': changes,
+            'regressions': regressions}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prediction service and the dashboard.')
+    parser.add_argument('--groups', default=','.join(GROUPS), help=f"comma-separated subset of {', '.join(GROUPS)}")
+    parser.add_argument('--sizes', default='10k,1m', help='sensor_data sizes for fetch_data/callbacks (e.g. 10k,1m,10m)')
+    parser.add_argument('--repeats', type=int, default=5, help='timed runs per measurement')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'sensor_bench'),
+                        help='where the synthetic databases are kept between runs')
+    parser.add_argument('--full-scan-max', default='1m', help='largest size at which the whole table is fetched')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='earlier result file to compare medians against')
+    parser.add_argument('--threshold', type=float, default=1.25, help='slowdown ratio reported as a regression')
+    parser.add_argument('--worker', choices=['predict', 'dashboard'], help=argparse.SUPPRESS)
+    parser.add_argument('--url', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    groups = [group.strip() for group in args.groups.split(',') if group.strip()]
+
+    if args.worker:
+        if args.worker == 'predict':
+            results = bench_predict(args.repeats)
+        else:
+            results = bench_dashboard(args.repeats, args.size, parse_size(args.full_scan_max), groups)
+        with open(args.result, 'w') as f:
+            json.dump(results, f)
+        # the service's writer and subscriber threads are daemons; do not wait for them
+        os._exit(0)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        result_path = os.path.join(scratch, 'result.json')
+        if 'predict' in groups:
+            env = dict(os.environ, WRITE_SHARDS='1', WRITE_QUEUE_SIZE='10000000')
+            results['predict'] = run_worker(['--worker', 'predict'], args.repeats, result_path, env)
+        if 'db_write' in groups:
+            results['db_write'] = bench_db_write(args.repeats, os.path.join(scratch, 'writes.db'))
+
+        dashboard_groups = [group for group in groups if group in ('fetch_data', 'callbacks')]
+        if dashboard_groups:
+            for size_text in args.sizes.split(','):
+                size = parse_size(size_text)
+                url = database_for(size, args.seed, args.data_dir)
+                env = dict(os.environ, DATABASE_URL=url, ALERT_URL='')
+                env.pop('ARCHIVE_DIR', None)
+                worker = ['--worker', 'dashboard', '--size', str(size), '--groups', ','.join(dashboard_groups),
+                          '--full-scan-max', args.full_scan_max]
+                for group, values in run_worker(worker, args.repeats, result_path, env).items():
+                    results.setdefault(group, {})[size_text.strip()] = values
+
+    report = {
+        'environment': environment(),
+        'config': {key: getattr(args, key) for key in ('groups', 'sizes', 'repeats', 'seed', 'full_scan_max')},
+        'results': results,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f), args.threshold)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+    if report.get('comparison', {}).get('regressions'):
+        print(f"Regressions: {', '.join(report['comparison']['regressions'])}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
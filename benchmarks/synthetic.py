@@ -0,0 +1,116 @@
+"""Synthetic ``sensor_data`` in SQLite, as a stand-in for MySQL in the benchmarks.
+
+The schema mirrors ``init/init_db.sql``; SQLite understands the dashboard's SQL
+(parameter binding, ``TIME()``, ``CASE``, ``AVG/MIN/MAX``), so the same queries run
+unchanged. Absolute timings are not MySQL timings; compare the paths against each other.
+"""
+import datetime as dt
+import os
+import sqlite3
+
+import numpy as np
+
+DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model_not_need', 'dataset.csv')
+CHUNK_ROWS = 1000000
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sensor_data (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        temperature REAL,
+        humidity REAL,
+        sound_volume REAL,
+        prediction INTEGER,
+        timestamp DATETIME,
+        sensor_id INTEGER NOT NULL DEFAULT 0,
+        model_version TEXT NOT NULL DEFAULT ''
+    );
+    CREATE INDEX IF NOT EXISTS idx_sensor_data_timestamp ON sensor_data (timestamp);
+    CREATE INDEX IF NOT EXISTS idx_sensor_data_sensor_timestamp ON sensor_data (sensor_id, timestamp);
+"""
+
+METRICS = ['temperature', 'humidity', 'sound_volume']
+
+# rollup table -> SQLite expression that truncates a timestamp to its bucket
+ROLLUP_BUCKETS = {
+    'sensor_data_rollup_minute': "strftime('%Y-%m-%d %H:%M:00', timestamp)",
+    'sensor_data_rollup_hour': "strftime('%Y-%m-%d %H:00:00', timestamp)",
+}
+
+
+def dataset_values(n, rng, path=DATASET):
+    """``n`` readings drawn from ``model_not_need/dataset.csv``, with its labels as predictions.
+
+    Rows are resampled with replacement and jittered by up to one unit in the last
+    decimal, so the marginals, the correlations and the 40 % anomaly share of the
+    training data carry over without repeating its 3,800 rows verbatim.
+    """
+    data = np.genfromtxt(path, delimiter=',', names=True)
+    picked = data[rng.integers(0, len(data), n)]
+    values = [(picked[m] + rng.integers(-1, 2, n) / 10).round(1) for m in METRICS]
+    return values + [picked['target'].astype(int)]
+
+
+def synthetic_rows(n, start=dt.datetime(2024, 10, 1), step_seconds=1.0, anomaly_rate=0.05, seed=0, sensors=1,
+                   distribution='normal', offset=0):
+    """``n`` readings one ``step_seconds`` apart, in the value ranges of the training data.
+
+    ``distribution='dataset'`` resamples the training data instead (see ``dataset_values``;
+    ``anomaly_rate`` is then the dataset's). Consecutive readings come from sensors
+    ``0 .. sensors - 1`` in turn. ``offset`` continues the series after that many rows.
+    """
+    rng = np.random.default_rng(seed)
+    if distribution == 'dataset':
+        temperature, humidity, sound_volume, prediction = dataset_values(n, rng)
+    else:
+        temperature = rng.normal(24, 2, n).round(1)
+        humidity = rng.normal(50, 4, n).round(1)
+        sound_volume = rng.normal(60, 10, n).round(1)
+        prediction = (rng.random(n) < anomaly_rate).astype(int)
+        # anomalies sit outside the normal band, like the ones the model flags
+        temperature[prediction == 1] += rng.choice([-8, 8], int(prediction.sum()))
+    seconds = (np.arange(n) + offset) * step_seconds
+    timestamps = np.datetime64(start, 'us') + (seconds * 1e6).astype('timedelta64[us]')
+    timestamps = np.char.replace(np.datetime_as_string(timestamps, unit='s'), 'T', ' ')
+    return [
+        (float(t), float(h), float(s), int(p), str(ts), (offset + i) % sensors)
+        for i, (t, h, s, p, ts) in enumerate(zip(temperature, humidity, sound_volume, prediction, timestamps))
+    ]
+
+
+def build_rollups(conn):
+    """Fill the rollup tables from ``sensor_data``, like ``database/backfill_rollups.py``."""
+    metric_columns = ", ".join(f"{m}_sum, {m}_min, {m}_max" for m in METRICS)
+    aggregates = ", ".join(f"SUM({m}), MIN({m}), MAX({m})" for m in METRICS)
+    for table, bucket in ROLLUP_BUCKETS.items():
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(
+            f"CREATE TABLE {table} (bucket_start DATETIME PRIMARY KEY, reading_count INTEGER, "
+            f"anomaly_count INTEGER, {', '.join(f'{m}_sum REAL, {m}_min REAL, {m}_max REAL' for m in METRICS)})"
+        )
+        conn.execute(
+            f"INSERT INTO {table} (bucket_start, reading_count, anomaly_count, {metric_columns}) "
+            f"SELECT {bucket} AS bucket, COUNT(*), SUM(prediction = 1), {aggregates} "
+            f"FROM sensor_data GROUP BY bucket"
+        )
+
+
+def create_database(path, rows, chunk_rows=CHUNK_ROWS, seed=0, **kwargs):
+    """Create (or replace) a SQLite database at ``path`` holding ``rows`` synthetic readings and their rollups.
+
+    Rows are generated and inserted ``chunk_rows`` at a time (chunk ``k`` uses seed
+    ``seed + k``), so memory use does not grow with ``rows``.
+    """
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript("DROP TABLE IF EXISTS sensor_data;" + SCHEMA)
+        for k, offset in enumerate(range(0, rows, chunk_rows)):
+            conn.executemany(
+                "INSERT INTO sensor_data (temperature, humidity, sound_volume, prediction, timestamp, sensor_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                synthetic_rows(min(chunk_rows, rows - offset), seed=seed + k, offset=offset, **kwargs),
+            )
+        build_rollups(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return f"sqlite:///{path}"
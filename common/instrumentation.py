@@ -0,0 +1,338 @@
+"""Request metrics in the Prometheus text format and an opt-in request profiler.
+
+``Metrics`` keeps counters and latency histograms in memory and renders them, with
+any registered collectors, in the Prometheus text exposition format. When it is
+disabled every method returns at once and ``instrument`` hands functions back
+unwrapped. ``RequestProfiler`` profiles the next N requests with cProfile or by
+sampling their stacks, then writes the result to a file. ``install`` adds both to a
+Flask app (the Dash server is one too).
+
+The Flask service and the dashboard both import this module. It lives in ``common/``,
+which the images copy to ``/common`` and both apps add to ``sys.path``.
+"""
+import bisect
+import collections
+import cProfile
+import functools
+import os
+import pstats
+import sys
+import threading
+import time
+
+from flask import Response, g, jsonify, request
+
+# seconds; stages range from a few microseconds (scoring one reading) to slow queries
+BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    """Thread-safe counters and histograms with optional labels.
+
+    Names are given without ``prefix``; counters should end in ``_total`` and
+    histograms in ``_seconds``. Collectors are functions returning
+    ``(name, type, help, value, labels)`` samples, read on every ``render``.
+    """
+
+    def __init__(self, prefix, enabled=True, buckets=BUCKETS):
+        self.prefix = prefix
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            counts = series.get(key)
+            if counts is None:
+                # one count per bucket plus +Inf, then the sum
+                counts = series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += seconds
+
+    def clock(self):
+        """Start time for ``lap``; 0 when disabled, so nothing is timed."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def lap(self, name, started, **labels):
+        """Observe the time since ``started`` and return the start of the next stage."""
+        if not self.enabled:
+            return 0.0
+        now = time.perf_counter()
+        self.observe(name, now - started, **labels)
+        return now
+
+    def instrument(self, histogram, errors, label):
+        """Decorator timing each call in ``histogram`` and counting exceptions in ``errors``.
+
+        The function's name is the value of ``label``.
+        """
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            labels = {label: fn.__name__}
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                except Exception as e:
+                    self.inc(errors, error=type(e).__name__, **labels)
+                    raise
+                finally:
+                    self.observe(histogram, time.perf_counter() - started, **labels)
+            return wrapper
+        return decorate
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(counts) for key, counts in series.items()}
+                          for name, series in self._histograms.items()}
+        lines = []
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, 'counter')
+            for key, value in sorted(series.items()):
+                lines.append(f"{self.prefix}{name}{_format_labels(key)} {value}")
+        bounds = [repr(bound) for bound in self.buckets] + ['+Inf']
+        for name, series in sorted(histograms.items()):
+            self._header(lines, name, 'histogram')
+            for key, counts in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(bounds, counts[:-1]):
+                    cumulative += count
+                    lines.append(f"{self.prefix}{name}_bucket{_format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{self.prefix}{name}_sum{_format_labels(key)} {counts[-1]!r}")
+                lines.append(f"{self.prefix}{name}_count{_format_labels(key)} {cumulative}")
+
+        samples = collections.OrderedDict()
+        for collector in self._collectors:
+            for name, kind, text, value, labels in collector():
+                samples.setdefault((name, kind, text), []).append((labels, value))
+        for (name, kind, text), values in samples.items():
+            self._help.setdefault(name, text)
+            self._header(lines, name, kind)
+            for labels, value in values:
+                lines.append(f"{self.prefix}{name}{_format_labels(sorted(labels.items()))} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, kind):
+        if name in self._help:
+            lines.append(f"# HELP {self.prefix}{name} {self._help[name]}")
+        lines.append(f"# TYPE {self.prefix}{name} {kind}")
+
+
+def _collapse(frame):
+    """``file:function;...`` of a stack, outermost first, as flame graph tools expect."""
+    names = []
+    while frame is not None:
+        names.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class RequestProfiler:
+    """Profile the next ``requests`` requests, then write the result to ``directory``.
+
+    ``cprofile`` runs one request at a time under cProfile (requests arriving
+    meanwhile are not profiled) and writes a ``.prof`` file for ``pstats`` or
+    snakeviz, plus a text summary. ``stack`` samples the threads serving profiled
+    requests every ``interval`` seconds and writes collapsed stacks
+    (``frame;frame count`` lines) for flame graph tools. While no profile is
+    running, ``begin`` costs one attribute check.
+    """
+
+    MODES = ('cprofile', 'stack')
+
+    def __init__(self, directory, interval=0.005):
+        self.directory = directory
+        self.interval = interval
+        self.remaining = 0
+        self.mode = None
+        self.last_dump = None
+        self._lock = threading.Lock()
+        self._profiling = threading.Lock()
+        self._profile = None
+        self._requests = 0
+        self._active = set()
+        self._stacks = collections.Counter()
+        self._samples = 0
+
+    def start(self, requests, mode='cprofile'):
+        """Profile the next ``requests`` requests; False if a profile is already running."""
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
+        if requests < 1:
+            raise ValueError('requests must be at least 1')
+        with self._lock:
+            if self.remaining or self._active:
+                return False
+            self.mode = mode
+            self._profile = cProfile.Profile() if mode == 'cprofile' else None
+            self._requests = requests
+            self._stacks = collections.Counter()
+            self._samples = 0
+            self.remaining = requests
+        if mode == 'stack':
+            threading.Thread(target=self._sample, name='stack-sampler', daemon=True).start()
+        return True
+
+    def status(self):
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'remaining': self.remaining,
+                'active': len(self._active),
+                'samples': self._samples,
+                'last_dump': self.last_dump,
+            }
+
+    def begin(self):
+        """Start profiling the current request; returns a token for ``end``, or None."""
+        if not self.remaining:
+            return None
+        if self.mode == 'cprofile' and not self._profiling.acquire(blocking=False):
+            return None
+        ident = threading.get_ident()
+        with self._lock:
+            if not self.remaining:
+                if self.mode == 'cprofile':
+                    self._profiling.release()
+                return None
+            self.remaining -= 1
+            self._active.add(ident)
+        if self.mode == 'cprofile':
+            self._profile.enable()
+        return ident
+
+    def end(self, token):
+        if token is None:
+            return
+        if self.mode == 'cprofile':
+            self._profile.disable()
+            self._profiling.release()
+        with self._lock:
+            self._active.discard(token)
+            done = not self.remaining and not self._active
+        if done:
+            self._dump()
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                if not self.remaining and not self._active:
+                    return
+                threads = list(self._active)
+            if threads:
+                frames = sys._current_frames()
+                for ident in threads:
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        self._stacks[_collapse(frame)] += 1
+                self._samples += 1
+            time.sleep(self.interval)
+
+    def _dump(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d-%H%M%S')
+        if self.mode == 'cprofile':
+            path = os.path.join(self.directory, f'profile-{stamp}.prof')
+            self._profile.dump_stats(path)
+            with open(path[:-len('.prof')] + '.txt', 'w') as f:
+                pstats.Stats(self._profile, stream=f).sort_stats('cumulative').print_stats(40)
+        else:
+            path = os.path.join(self.directory, f'stacks-{stamp}.txt')
+            with open(path, 'w') as f:
+                for stack, count in self._stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+        with self._lock:
+            self.last_dump = path
+        print(f"Profile of {self._requests} requests written to {path}")
+
+
+def install(app, metrics, profiler=None):
+    """Add ``GET /metrics`` and per-request timing to a Flask app, and ``/profile`` with a profiler.
+
+    ``POST /profile?requests=N&mode=cprofile|stack`` starts a profile and
+    ``GET /profile`` reports its progress and the last file written.
+    """
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    if metrics.enabled:
+        metrics.describe('request_seconds', 'Time to produce a response, by route')
+        metrics.describe('requests_total', 'Responses by route and status code')
+
+        @app.before_request
+        def start_timer():
+            g.metrics_started = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            started = g.pop('metrics_started', None)
+            if started is not None:
+                metrics.observe('request_seconds', time.perf_counter() - started, route=rule)
+            metrics.inc('requests_total', route=rule, status=response.status_code)
+            return response
+
+    if profiler is None:
+        return
+
+    @app.before_request
+    def begin_profile():
+        if request.path not in ('/metrics', '/profile'):
+            g.profile_token = profiler.begin()
+
+    @app.teardown_request
+    def end_profile(exc):
+        profiler.end(g.pop('profile_token', None))
+
+    @app.route('/profile', methods=['GET', 'POST'])
+    def profile():
+        if request.method == 'GET':
+            return jsonify(profiler.status()), 200
+        try:
+            started = profiler.start(request.args.get('requests', default=100, type=int),
+                                     request.args.get('mode', default='cprofile'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if not started:
+            return jsonify({'error': 'A profile is already running', **profiler.status()}), 409
+        return jsonify(profiler.status()), 202
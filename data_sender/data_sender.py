@@ -1,17 +1,34 @@
+import argparse
+import os
 import time
 import requests
+import numpy as np
 import pandas as pd
 
-FLASK_APP_URL = "http://flask_app:5000/predict" 
+FLASK_APP_URL = os.getenv('FLASK_APP_URL', "http://flask_app:5000/predict")
+BATCH_URL = FLASK_APP_URL + "/batch"
 
-data_frame = pd.read_csv('df_testing_without_target.csv')
+# Must match app/binary_format.py: float32 triplets, or timestamped records with a sensor id
+F32_CONTENT_TYPE = 'application/x-sensor-f32'
+RECORD_CONTENT_TYPE = 'application/x-sensor-record'
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('sensor_id', '<u4'),
+    ('temperature', '<f4'),
+    ('humidity', '<f4'),
+    ('sound_volume', '<f4'),
+])
+FEATURES = ['temperature', 'humidity', 'sound_volume']
 
-def send_data(row):
+data_frame = pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'df_testing_without_target.csv'))
+
+def send_data(row, sensor_id=0):
     """Send a single row of data to the Flask app and print the response."""
     data = {
         'temperature': row['temperature'],
         'humidity': row['humidity'],
-        'sound_volume': row['sound_volume']
+        'sound_volume': row['sound_volume'],
+        'sensor_id': sensor_id,
     }
     
     try:
@@ -20,7 +37,74 @@ def send_data(row):
     except requests.exceptions.RequestException as e:
         print(f"Error sending data: {e}")
 
+def encode_readings(frame, sensor_id=None, timestamps=None):
+    """Pack readings as float32 triplets, or as records when a sensor id or timestamps are given."""
+    if sensor_id is None and timestamps is None:
+        return F32_CONTENT_TYPE, frame[FEATURES].to_numpy(dtype='<f4').tobytes()
+
+    records = np.zeros(len(frame), dtype=RECORD_DTYPE)
+    records['timestamp'] = 0 if timestamps is None else timestamps
+    records['sensor_id'] = sensor_id or 0
+    for name in FEATURES:
+        records[name] = frame[name].to_numpy()
+    return RECORD_CONTENT_TYPE, records.tobytes()
+
+def send_binary(frame, session=requests, sensor_id=None):
+    """Send a batch of rows in the packed binary format and return the predictions."""
+    content_type, body = encode_readings(frame, sensor_id=sensor_id)
+    try:
+        response = session.post(BATCH_URL, data=body, headers={'Content-Type': content_type})
+        predictions = response.json()['predictions']
+        print(f"Sent {len(frame)} readings ({len(body)} bytes), predictions: {predictions}")
+        return predictions
+    except requests.exceptions.RequestException as e:
+        print(f"Error sending data: {e}")
+    except (ValueError, KeyError, TypeError) as e:
+        # an error page or a body without predictions: skip this batch, keep sending
+        print(f"Unexpected response ({response.status_code}): {e!r}")
+
+def compare_throughput(batch_size, repeats):
+    """Post the test CSV in batches as JSON and as binary and print readings per second for each."""
+    batches = [data_frame.iloc[i:i + batch_size] for i in range(0, len(data_frame), batch_size)]
+    session = requests.Session()
+
+    payloads = {
+        'json': [(None, b.to_dict('records')) for b in batches],
+        'binary': [encode_readings(b) for b in batches],
+    }
+    for name, items in payloads.items():
+        started = time.perf_counter()
+        sent = 0
+        for _ in range(repeats):
+            for content_type, payload in items:
+                if content_type is None:
+                    response = session.post(BATCH_URL, json=payload)
+                else:
+                    response = session.post(BATCH_URL, data=payload, headers={'Content-Type': content_type})
+                response.raise_for_status()
+                sent += len(response.json()['predictions'])
+        elapsed = time.perf_counter() - started
+        print(f"{name:>6}: {sent} readings in {elapsed:.2f} s, {sent / elapsed:.0f} readings/s")
+
 if __name__ == "__main__":
-    for index, row in data_frame.iterrows():
-        send_data(row)
-        time.sleep(10) 
+    parser = argparse.ArgumentParser(description='Send the test readings to the Flask app.')
+    parser.add_argument('--format', choices=['json', 'binary'], default='json',
+                        help='json posts one reading per request, binary posts packed batches')
+    parser.add_argument('--batch-size', type=int, default=50, help='readings per binary request')
+    parser.add_argument('--interval', type=float, default=10, help='seconds between requests')
+    parser.add_argument('--compare', action='store_true', help='compare JSON and binary batch throughput')
+    parser.add_argument('--repeats', type=int, default=20, help='passes over the CSV in --compare')
+    parser.add_argument('--sensor-id', type=int, default=int(os.getenv('SENSOR_ID', 0)),
+                        help='device id sent with every reading (default 0, or SENSOR_ID)')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_throughput(args.batch_size, args.repeats)
+    elif args.format == 'binary':
+        for start in range(0, len(data_frame), args.batch_size):
+            send_binary(data_frame.iloc[start:start + args.batch_size], sensor_id=args.sensor_id)
+            time.sleep(args.interval)
+    else:
+        for index, row in data_frame.iterrows():
+            send_data(row, args.sensor_id)
+            time.sleep(args.interval)
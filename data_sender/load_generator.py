@@ -0,0 +1,229 @@
+"""Load generator and replay harness for the Flask prediction service.
+
+Requests are scheduled open-loop: each one has a fixed send time, either from a
+target rate (``--rps``) or from the source's own timing compressed by ``--speedup``,
+and is handed to a pool of ``--concurrency`` worker threads with one keep-alive
+session each. Latency is measured from the scheduled send time, so a service (or a
+client) that falls behind shows up as latency instead of silently lowering the rate;
+``service_ms`` is the time of the HTTP exchange alone.
+
+Sources are the test CSV (rows ``--interval`` seconds apart, like the normal sender)
+or a JSONL file with one reading object per line, as posted to ``/predict``; an
+optional ``timestamp`` field (Unix seconds or ISO 8601) sets its replay time.
+
+The report is printed (or written with ``--output``) as JSON:
+
+    python load_generator.py --url http://localhost:5000 --rps 200 --concurrency 16 --duration 30
+    python load_generator.py --source readings.jsonl --speedup 60 --endpoint batch --batch-size 100
+"""
+import argparse
+import datetime as dt
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_sender import FEATURES, encode_readings
+
+ENDPOINTS = {
+    'predict': '/predict',
+    'batch': '/predict/batch',
+    'binary': '/predict/batch',
+}
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'df_testing_without_target.csv')
+
+
+def parse_timestamp(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return pd.Timestamp(value).timestamp()
+
+
+def load_csv(path, interval):
+    """Readings of a CSV with ``(offset seconds, reading)``, one every ``interval`` seconds."""
+    frame = pd.read_csv(path)
+    return [(i * interval, row) for i, row in enumerate(frame[FEATURES].to_dict('records'))]
+
+
+def load_jsonl(path, interval):
+    """Readings of a JSONL file; lines without a timestamp follow the previous one after ``interval``."""
+    readings = []
+    first = None
+    offset = -interval
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if 'timestamp' in item:
+                at = parse_timestamp(item.pop('timestamp'))
+                first = at if first is None else first
+                offset = at - first
+            else:
+                offset += interval
+            readings.append((offset, item))
+    return readings
+
+
+def encode_request(endpoint, readings, sensor_id):
+    """``(content type, body)`` of one request carrying ``readings``."""
+    if endpoint == 'binary':
+        frame = pd.DataFrame(readings)
+        return encode_readings(frame, sensor_id=sensor_id)
+    readings = [dict(reading, sensor_id=reading.get('sensor_id', sensor_id)) for reading in readings]
+    body = readings[0] if endpoint == 'predict' else readings
+    return 'application/json', json.dumps(body).encode()
+
+
+def build_schedule(readings, endpoint, batch_size, sensors, rps=None, duration=None, speedup=1.0):
+    """``(send offset, readings in request, content type, body)`` for every request to send.
+
+    With ``rps`` the requests are evenly spaced and the source repeats until
+    ``duration``; otherwise the source is replayed once at its own pace / ``speedup``.
+    """
+    size = 1 if endpoint == 'predict' else batch_size
+    groups = [readings[i:i + size] for i in range(0, len(readings), size)]
+    if rps:
+        count = int(rps * (duration or 10))
+        offsets = [k / rps for k in range(count)]
+        groups = [groups[k % len(groups)] for k in range(count)]
+    else:
+        offsets = [group[0][0] / speedup for group in groups]
+        if duration:
+            groups = [g for g, at in zip(groups, offsets) if at < duration]
+            offsets = offsets[:len(groups)]
+    schedule = []
+    for k, (at, group) in enumerate(zip(offsets, groups)):
+        content_type, body = encode_request(endpoint, [reading for _, reading in group], k % sensors)
+        schedule.append((at, len(group), content_type, body))
+    return schedule
+
+
+class LoadGenerator:
+    def __init__(self, url, concurrency=8, timeout=10.0):
+        self.url = url
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # one keep-alive connection per worker thread
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        return session
+
+    def _send(self, scheduled, readings, content_type, body):
+        started = time.perf_counter()
+        error = None
+        try:
+            response = self._session().post(self.url, data=body, headers={'Content-Type': content_type},
+                                            timeout=self.timeout)
+            if response.status_code >= 400:
+                error = f"HTTP {response.status_code}"
+        except requests.exceptions.RequestException as e:
+            error = type(e).__name__
+        finished = time.perf_counter()
+        return scheduled, started, finished, readings, error
+
+    def run(self, schedule):
+        """Send every request at its offset from now and return one result per request."""
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            start = time.perf_counter() + 0.05
+            for at, readings, content_type, body in schedule:
+                scheduled = start + at
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(self._send, scheduled, readings, content_type, body))
+        results = [future.result() for future in futures]
+        return start, results
+
+
+def percentiles(values):
+    if not len(values):
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None, 'mean': None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'max': round(float(np.max(values)), 3),
+        'mean': round(float(np.mean(values)), 3),
+    }
+
+
+def summarize(start, results):
+    """Latency percentiles, throughput and error counts of a run."""
+    scheduled, started, finished, readings, errors = zip(*results) if results else ((),) * 5
+    finished = np.asarray(finished)
+    ok = np.asarray([error is None for error in errors], dtype=bool)
+    elapsed = float(finished.max() - start) if len(finished) else 0.0
+    by_kind = {}
+    for error in errors:
+        if error is not None:
+            by_kind[error] = by_kind.get(error, 0) + 1
+    return {
+        'requests': len(results),
+        'readings': int(sum(readings)),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(int(ok.sum()) / elapsed, 1) if elapsed else 0,
+        'readings_per_s': round(int(np.asarray(readings)[ok].sum()) / elapsed, 1) if elapsed else 0,
+        'latency_ms': percentiles((finished - np.asarray(scheduled))[ok] * 1000),
+        'service_ms': percentiles((finished - np.asarray(started))[ok] * 1000),
+        'client_lag_ms': percentiles((np.asarray(started) - np.asarray(scheduled)) * 1000),
+        'errors': {
+            'count': int((~ok).sum()),
+            'rate': round(float((~ok).mean()), 4) if len(ok) else 0,
+            'by_kind': by_kind,
+        },
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate load against the Flask prediction service.')
+    parser.add_argument('--url', default=os.getenv('FLASK_BASE_URL', 'http://flask_app:5000'),
+                        help='base URL of the Flask service')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='predict',
+                        help='predict: one JSON reading per request; batch/binary: --batch-size readings')
+    parser.add_argument('--source', default=DEFAULT_CSV, help='CSV of readings or JSONL of reading objects')
+    parser.add_argument('--rps', type=float, help='target requests per second (default: replay the source timing)')
+    parser.add_argument('--duration', type=float, help='seconds to run (default 10 with --rps, else the whole source)')
+    parser.add_argument('--concurrency', type=int, default=8, help='worker threads, each with a keep-alive session')
+    parser.add_argument('--speedup', type=float, default=1.0, help='time compression of the replayed source')
+    parser.add_argument('--interval', type=float, default=10.0,
+                        help='seconds between source readings without a timestamp (default 10, as data_sender.py)')
+    parser.add_argument('--batch-size', type=int, default=50, help='readings per batch/binary request')
+    parser.add_argument('--sensors', type=int, default=1, help='spread requests over sensor ids 0..N-1')
+    parser.add_argument('--timeout', type=float, default=10.0, help='per-request timeout in seconds')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    load = load_jsonl if args.source.endswith(('.jsonl', '.ndjson')) else load_csv
+    readings = load(args.source, args.interval)
+    schedule = build_schedule(readings, args.endpoint, args.batch_size, max(1, args.sensors),
+                              args.rps, args.duration, args.speedup)
+
+    generator = LoadGenerator(args.url.rstrip('/') + ENDPOINTS[args.endpoint], args.concurrency, args.timeout)
+    started_at = dt.datetime.now().isoformat(timespec='seconds')
+    start, results = generator.run(schedule)
+    report = {
+        'started_at': started_at,
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'scheduled_rps': round((len(schedule) - 1) / schedule[-1][0], 1) if len(schedule) > 1 and schedule[-1][0] else None,
+        **summarize(start, results),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    print(text)
@@ -0,0 +1,43 @@
+"""Add the ``model_version`` column to an existing ``sensor_data``.
+
+The Flask service stores the version of the model that made each prediction there
+(see app/model_registry.py). Existing rows get an empty version, which stands for
+"unknown". The change runs in place without locking the table, so the writer keeps
+inserting; deploy it before a service that writes the column.
+"""
+from mysql.connector import Error
+
+from create_db import connect_to_database, close_connection
+
+
+def add_model_version(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data' AND COLUMN_NAME = 'model_version'
+        """)
+        if cursor.fetchone()[0]:
+            print("sensor_data already has model_version")
+            return
+        cursor.execute("""
+            ALTER TABLE sensor_data
+                ADD COLUMN model_version VARCHAR(64) NOT NULL DEFAULT '',
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+        print("Added model_version to sensor_data")
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    conn = connect_to_database()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        add_model_version(conn)
+    except Error as e:
+        print(f"Error adding model_version: {e}")
+        raise SystemExit(1)
+    finally:
+        close_connection(conn)
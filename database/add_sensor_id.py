@@ -0,0 +1,42 @@
+"""Add the ``sensor_id`` column and its ``(sensor_id, timestamp)`` index to an existing ``sensor_data``.
+
+Existing rows get sensor 0, the id the Flask service uses for readings without one.
+The change runs in place without locking the table, so the writer keeps inserting.
+"""
+from mysql.connector import Error
+
+from create_db import connect_to_database, close_connection
+
+
+def add_sensor_id(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data' AND COLUMN_NAME = 'sensor_id'
+        """)
+        if cursor.fetchone()[0]:
+            print("sensor_data already has sensor_id")
+            return
+        cursor.execute("""
+            ALTER TABLE sensor_data
+                ADD COLUMN sensor_id INT UNSIGNED NOT NULL DEFAULT 0,
+                ADD INDEX idx_sensor_data_sensor_timestamp (sensor_id, timestamp),
+                ALGORITHM=INPLACE, LOCK=NONE
+        """)
+        print("Added sensor_id to sensor_data")
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    conn = connect_to_database()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        add_sensor_id(conn)
+    except Error as e:
+        print(f"Error adding sensor_id: {e}")
+        raise SystemExit(1)
+    finally:
+        close_connection(conn)
@@ -0,0 +1,159 @@
+"""Move closed days of ``sensor_data`` from MySQL into Parquet files.
+
+Every day that ended more than ``--hot-days`` days ago is written to
+``<archive>/sensor_data_YYYY-MM-DD.parquet`` (sorted by timestamp, zstd-compressed,
+row groups with min/max statistics), recorded in ``manifest.json`` and then deleted
+from MySQL in small batches. The dashboard reads rows before the manifest's
+``archived_through`` from the files (``app_dash/archive.py``), so rows that are
+still in MySQL after a crash between the two steps are never counted twice.
+Rows that arrive late for an archived day are merged into its file on the next run.
+The rollup tables are left alone and keep covering archived days.
+"""
+import argparse
+import datetime as dt
+import json
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from mysql.connector import Error
+
+from create_db import connect_to_database, close_connection
+
+MANIFEST = 'manifest.json'
+ROW_GROUP_ROWS = 65536
+DELETE_BATCH_ROWS = 10000
+
+SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('temperature', pa.float64()),
+    ('humidity', pa.float64()),
+    ('sound_volume', pa.float64()),
+    ('prediction', pa.int8()),
+    ('timestamp', pa.timestamp('us')),
+    ('sensor_id', pa.int64()),
+    ('model_version', pa.string()),
+])
+SELECT_DAY = """
+    SELECT id, temperature, humidity, sound_volume, prediction, timestamp, sensor_id, model_version
+    FROM sensor_data
+    WHERE timestamp >= %s AND timestamp < %s
+    ORDER BY timestamp, id
+"""
+
+
+def load_manifest(archive_dir):
+    path = os.path.join(archive_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {'archived_through': None, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(archive_dir, manifest):
+    path = os.path.join(archive_dir, MANIFEST)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_partition(frame, path, row_group_rows=ROW_GROUP_ROWS):
+    """Write one day of rows as Parquet, merged with the rows already in ``path``."""
+    if os.path.exists(path):
+        existing = pq.read_table(path).to_pandas()
+        if 'sensor_id' not in existing:
+            # written before readings carried a sensor id
+            existing['sensor_id'] = 0
+        if 'model_version' not in existing:
+            # written before predictions recorded their model version
+            existing['model_version'] = ''
+        frame = pd.concat([existing, frame], ignore_index=True).drop_duplicates('id')
+    frame = frame.sort_values(['timestamp', 'id'], kind='stable')
+    table = pa.Table.from_pandas(frame, schema=SCHEMA, preserve_index=False)
+    tmp = path + '.tmp'
+    pq.write_table(table, tmp, compression='zstd', row_group_size=row_group_rows, write_statistics=True)
+    os.replace(tmp, path)
+    return len(frame), os.path.getsize(path)
+
+
+def archive_day(connection, archive_dir, manifest, day):
+    """Export one day to its file and drop it from MySQL. Returns the number of rows moved."""
+    start, end = dt.datetime.combine(day, dt.time()), dt.datetime.combine(day + dt.timedelta(days=1), dt.time())
+    cursor = connection.cursor()
+    try:
+        cursor.execute(SELECT_DAY, (start, end))
+        rows = cursor.fetchall()
+        if not rows:
+            return 0
+        frame = pd.DataFrame(rows, columns=SCHEMA.names)
+        name = f"sensor_data_{day.isoformat()}.parquet"
+        total, size = write_partition(frame, os.path.join(archive_dir, name))
+        manifest['files'][day.isoformat()] = {'file': name, 'rows': total, 'bytes': size}
+        # readers switch to the file before its rows leave MySQL
+        through = f"{end:%Y-%m-%d %H:%M:%S}"
+        if manifest['archived_through'] is None or through > manifest['archived_through']:
+            manifest['archived_through'] = through
+        save_manifest(archive_dir, manifest)
+
+        # only the exported ids, so rows inserted meanwhile stay until the next run
+        max_id = int(frame['id'].max())
+        while True:
+            cursor.execute(
+                "DELETE FROM sensor_data WHERE timestamp >= %s AND timestamp < %s AND id <= %s LIMIT %s",
+                (start, end, max_id, DELETE_BATCH_ROWS),
+            )
+            connection.commit()
+            if cursor.rowcount < DELETE_BATCH_ROWS:
+                break
+        return len(frame)
+    finally:
+        cursor.close()
+
+
+def archive_closed_days(connection, archive_dir, hot_days):
+    """Archive every day before ``today - hot_days``, oldest first."""
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    hot_start = dt.date.today() - dt.timedelta(days=hot_days)
+
+    cursor = connection.cursor()
+    cursor.execute("SELECT MIN(timestamp) FROM sensor_data WHERE timestamp < %s",
+                   (dt.datetime.combine(hot_start, dt.time()),))
+    oldest = cursor.fetchone()[0]
+    cursor.close()
+
+    day = oldest.date() if oldest else hot_start
+    while day < hot_start:
+        moved = archive_day(connection, archive_dir, manifest, day)
+        if moved:
+            print(f"Archived {moved} rows of {day}")
+        day += dt.timedelta(days=1)
+
+    through = f"{hot_start.isoformat()} 00:00:00"
+    if manifest['archived_through'] is None or through > manifest['archived_through']:
+        manifest['archived_through'] = through
+        save_manifest(archive_dir, manifest)
+    print(f"Archive holds {len(manifest['files'])} days; MySQL serves rows from {manifest['archived_through']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Move closed days of sensor_data into Parquet files.')
+    parser.add_argument('--archive-dir', default=os.getenv('ARCHIVE_DIR', '/archive'))
+    parser.add_argument('--hot-days', type=int, default=int(os.getenv('ARCHIVE_HOT_DAYS', 7)),
+                        help='whole days kept in MySQL before today (default 7)')
+    args = parser.parse_args()
+
+    conn = connect_to_database()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        archive_closed_days(conn, args.archive_dir, args.hot_days)
+    except Error as e:
+        print(f"Error archiving sensor_data: {e}")
+        raise SystemExit(1)
+    finally:
+        close_connection(conn)
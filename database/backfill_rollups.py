@@ -0,0 +1,81 @@
+import argparse
+import datetime as dt
+
+from mysql.connector import Error
+
+from create_db import connect_to_database, close_connection
+
+METRICS = ['temperature', 'humidity', 'sound_volume']
+
+# rollup table -> MySQL expression that truncates a timestamp to its bucket
+ROLLUP_BUCKETS = {
+    'sensor_data_rollup_minute': "DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00')",
+    'sensor_data_rollup_hour': "DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00')",
+}
+
+
+def backfill_query(table, bucket, condition="timestamp < %s", insert="INSERT"):
+    aggregates = ", ".join(
+        f"SUM({m}), MIN({m}), MAX({m})" for m in METRICS
+    )
+    columns = ", ".join(f"{m}_sum, {m}_min, {m}_max" for m in METRICS)
+    return f"""
+        {insert} INTO {table} (bucket_start, reading_count, anomaly_count, {columns})
+        SELECT {bucket} AS bucket, COUNT(*), SUM(prediction = 1), {aggregates}
+        FROM sensor_data
+        WHERE {condition}
+        GROUP BY bucket
+    """
+
+
+def raw_start(cursor):
+    """Start of the hour of the oldest raw reading, or None when ``sensor_data`` is empty."""
+    cursor.execute("SELECT MIN(timestamp) FROM sensor_data")
+    oldest = cursor.fetchone()[0]
+    return oldest.replace(minute=0, second=0, microsecond=0) if oldest else None
+
+
+def backfill_rollups(connection, before):
+    """Rebuild the rollup buckets from the oldest raw reading up to ``before``.
+
+    Buckets are deleted and recomputed in one transaction per table, so readers see
+    either the old or the new totals. Buckets before the oldest raw reading belong to
+    days whose partitions were dropped or archived and are kept as they are. Buckets
+    from ``before`` onwards are left to the Flask writer, which keeps updating them
+    while this runs.
+    """
+    cursor = connection.cursor()
+    try:
+        start = raw_start(cursor)
+        if start is None or start >= before:
+            print(f"No raw rows before {before}, rollups left as they are")
+            return
+        for table, bucket in ROLLUP_BUCKETS.items():
+            cursor.execute(f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s", (start, before))
+            cursor.execute(backfill_query(table, bucket, "timestamp >= %s AND timestamp < %s"), (start, before))
+            connection.commit()
+            print(f"Rebuilt {table}: {cursor.rowcount} buckets from {start} to {before}")
+    except Error as e:
+        connection.rollback()
+        print(f"Error rebuilding rollups: {e}")
+        raise
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rebuild the sensor_data rollup tables from raw rows.')
+    parser.add_argument('--before', type=lambda s: dt.datetime.strptime(s, '%Y-%m-%d %H:%M'),
+                        help="rebuild buckets before 'YYYY-MM-DD HH:MM' (default: start of the current hour)")
+    args = parser.parse_args()
+
+    # hour buckets must be rebuilt whole, so the cut-off is rounded down to the hour
+    before = (args.before or dt.datetime.now()).replace(minute=0, second=0, microsecond=0)
+
+    conn = connect_to_database()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        backfill_rollups(conn, before)
+    finally:
+        close_connection(conn)
@@ -0,0 +1,116 @@
+"""Convert an existing, unpartitioned ``sensor_data`` table to daily partitions.
+
+The rows are copied by id range into ``sensor_data_partitioned``, which has one
+partition per day from the oldest reading to ``--ahead-days`` days from today. The
+tables are then swapped with one atomic ``RENAME TABLE``, and the rows written
+during the copy are carried over. Writers keep running throughout; the new table's
+``AUTO_INCREMENT`` starts above the old one so the carried-over ids stay free.
+The old table is kept as ``sensor_data_unpartitioned`` until it is dropped by hand.
+"""
+import argparse
+import datetime as dt
+import os
+
+from mysql.connector import Error
+
+from create_db import connect_to_database, close_connection
+from partition_maintenance import day_range, partition_definitions
+
+COPY_BATCH_ROWS = 50000
+# ids reserved for rows written between the last catch-up and the rename
+AUTO_INCREMENT_GAP = 100000
+
+COLUMNS = "id, temperature, humidity, sound_volume, prediction, timestamp"
+CREATE_PARTITIONED = """
+    CREATE TABLE sensor_data_partitioned (
+        id INT AUTO_INCREMENT,
+        temperature FLOAT,
+        humidity FLOAT,
+        sound_volume FLOAT,
+        prediction INT,
+        timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        sensor_id INT UNSIGNED NOT NULL DEFAULT 0,
+        model_version VARCHAR(64) NOT NULL DEFAULT '',
+        PRIMARY KEY (id, timestamp),
+        INDEX idx_sensor_data_timestamp (timestamp),
+        INDEX idx_sensor_data_sensor_timestamp (sensor_id, timestamp)
+    )
+    PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    {partitions}
+    )
+"""
+
+
+def copy_rows(cursor, connection, source, target, after_id, columns=COLUMNS):
+    """Copy rows with ``id > after_id`` in batches. Returns the highest id copied."""
+    while True:
+        cursor.execute(f"SELECT MAX(id) FROM (SELECT id FROM {source} WHERE id > %s ORDER BY id LIMIT %s) AS batch",
+                       (after_id, COPY_BATCH_ROWS))
+        last_id = cursor.fetchone()[0]
+        if last_id is None:
+            return after_id
+        cursor.execute(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {source} WHERE id > %s AND id <= %s",
+                       (after_id, last_id))
+        connection.commit()
+        after_id = last_id
+
+
+def migrate(connection, ahead_days):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data' AND PARTITION_NAME IS NOT NULL
+        """)
+        if cursor.fetchone()[0]:
+            print("sensor_data is already partitioned")
+            return
+
+        # tables created before sensor_id or model_version existed get the column defaults
+        columns = COLUMNS
+        for optional in ('sensor_id', 'model_version'):
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data' AND COLUMN_NAME = %s
+            """, (optional,))
+            if cursor.fetchone()[0]:
+                columns += f", {optional}"
+
+        cursor.execute("SELECT MIN(timestamp) FROM sensor_data")
+        oldest = cursor.fetchone()[0]
+        today = dt.date.today()
+        days = day_range(oldest.date() if oldest else today, today + dt.timedelta(days=ahead_days))
+        cursor.execute(CREATE_PARTITIONED.format(partitions=partition_definitions(days)))
+        print(f"Created sensor_data_partitioned with {len(days)} daily partitions")
+
+        copied = copy_rows(cursor, connection, 'sensor_data', 'sensor_data_partitioned', 0, columns)
+        copied = copy_rows(cursor, connection, 'sensor_data', 'sensor_data_partitioned', copied, columns)
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sensor_data")
+        next_id = cursor.fetchone()[0] + AUTO_INCREMENT_GAP
+        cursor.execute(f"ALTER TABLE sensor_data_partitioned AUTO_INCREMENT = {int(next_id)}")
+
+        cursor.execute("RENAME TABLE sensor_data TO sensor_data_unpartitioned, "
+                       "sensor_data_partitioned TO sensor_data")
+        copied = copy_rows(cursor, connection, 'sensor_data_unpartitioned', 'sensor_data', copied, columns)
+        print(f"sensor_data is partitioned; rows up to id {copied} copied, new ids start at {next_id}")
+        print("Check the data, then run: DROP TABLE sensor_data_unpartitioned")
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert sensor_data to daily range partitions.')
+    parser.add_argument('--ahead-days', type=int, default=int(os.getenv('PARTITION_AHEAD_DAYS', 7)),
+                        help='days of empty partitions to create after today (default 7)')
+    args = parser.parse_args()
+
+    conn = connect_to_database()
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        migrate(conn, args.ahead_days)
+    except Error as e:
+        print(f"Error migrating sensor_data: {e}")
+        raise SystemExit(1)
+    finally:
+        close_connection(conn)
@@ -0,0 +1,242 @@
+"""Daily partitions of ``sensor_data``: create them ahead of time, retire old ones.
+
+``init/init_db.sql`` partitions ``sensor_data`` by ``RANGE (UNIX_TIMESTAMP(timestamp))``
+with a single catch-all partition ``pmax``; ``migrate_partitioned.py`` converts an
+existing table. Each run of this job
+
+* splits ``pmax`` so that a partition ``pYYYYMMDD`` (rows before the end of that day)
+  exists up to ``--ahead-days`` days from today, while ``pmax`` is still empty;
+* drops the partitions of days older than ``--retention-days``, after making sure the
+  rollup tables hold their buckets (missing buckets are added, existing ones are
+  never changed), so the dashboard's date-range cards keep covering them;
+* drops the empty partitions of days already moved to the Parquet archive
+  (``--archive-dir``), which ``archive_partitions.py`` has emptied row by row.
+
+Dropping a partition removes a day in constant time instead of a long ``DELETE``.
+``--sqlite`` runs the same routine against a SQLite stand-in (see
+``benchmarks/synthetic.py``), where each calendar day plays the role of a partition.
+"""
+import argparse
+import datetime as dt
+import os
+import sqlite3
+
+from mysql.connector import Error
+
+from archive_partitions import load_manifest
+from backfill_rollups import ROLLUP_BUCKETS, backfill_query
+from create_db import connect_to_database, close_connection
+
+CATCH_ALL = 'pmax'
+
+# rollup table -> SQLite expression that truncates a timestamp to its bucket
+SQLITE_ROLLUP_BUCKETS = {
+    'sensor_data_rollup_minute': "strftime('%Y-%m-%d %H:%M:00', timestamp)",
+    'sensor_data_rollup_hour': "strftime('%Y-%m-%d %H:00:00', timestamp)",
+}
+
+
+def partition_name(day):
+    return f"p{day:%Y%m%d}"
+
+
+def partition_definitions(days):
+    """``PARTITION ... VALUES LESS THAN`` clauses for ``days``, followed by ``pmax``."""
+    clauses = [
+        f"PARTITION {partition_name(day)} VALUES LESS THAN "
+        f"(UNIX_TIMESTAMP('{day + dt.timedelta(days=1):%Y-%m-%d} 00:00:00'))"
+        for day in days
+    ]
+    clauses.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN MAXVALUE")
+    return ",\n    ".join(clauses)
+
+
+def day_range(first, last):
+    return [first + dt.timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+class MySQLPartitions:
+    """Partitions of the MySQL ``sensor_data`` table."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def partitions(self):
+        """``(name, upper bound)`` of every partition in order; ``pmax`` has no bound."""
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute("""
+                SELECT PARTITION_NAME,
+                       IF(PARTITION_DESCRIPTION = 'MAXVALUE', NULL, FROM_UNIXTIME(PARTITION_DESCRIPTION))
+                FROM information_schema.PARTITIONS
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'sensor_data'
+                ORDER BY PARTITION_ORDINAL_POSITION
+            """)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        if not rows or rows[0][0] is None:
+            raise RuntimeError("sensor_data is not partitioned; run migrate_partitioned.py first")
+        return rows
+
+    def add_until(self, first, last):
+        """Split ``pmax`` into daily partitions through ``last`` (starting at ``first`` if none exist)."""
+        bounds = [upper for _, upper in self.partitions() if upper is not None]
+        if bounds:
+            first = max(bounds).date()
+        days = day_range(first, last)
+        if not days:
+            return []
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(
+                f"ALTER TABLE sensor_data REORGANIZE PARTITION {CATCH_ALL} INTO (\n    "
+                f"{partition_definitions(days)}\n)"
+            )
+        finally:
+            cursor.close()
+        return [partition_name(day) for day in days]
+
+    def row_count(self, name):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"SELECT COUNT(*) FROM sensor_data PARTITION ({name})")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def ensure_rollups(self, start, end):
+        """Add the rollup buckets of ``[start, end)`` that are missing; existing buckets are kept."""
+        condition = "timestamp < %s" if start is None else "timestamp >= %s AND timestamp < %s"
+        params = (end,) if start is None else (start, end)
+        cursor = self.connection.cursor()
+        try:
+            for table, bucket in ROLLUP_BUCKETS.items():
+                cursor.execute(backfill_query(table, bucket, condition, insert="INSERT IGNORE"), params)
+            self.connection.commit()
+        finally:
+            cursor.close()
+
+    def drop(self, names):
+        cursor = self.connection.cursor()
+        try:
+            cursor.execute(f"ALTER TABLE sensor_data DROP PARTITION {', '.join(names)}")
+        finally:
+            cursor.close()
+
+
+class SQLitePartitions:
+    """Stand-in for :class:`MySQLPartitions` on SQLite, which has no partitioning.
+
+    Every calendar day with rows is a partition; dropping one deletes the day's rows.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def partitions(self):
+        days = [row[0] for row in self.connection.execute(
+            "SELECT DISTINCT date(timestamp) FROM sensor_data ORDER BY 1"
+        )]
+        rows = []
+        for day in days:
+            day = dt.date.fromisoformat(day)
+            rows.append((partition_name(day), dt.datetime.combine(day + dt.timedelta(days=1), dt.time())))
+        return rows + [(CATCH_ALL, None)]
+
+    def add_until(self, first, last):
+        return []
+
+    def _day(self, name):
+        return dt.datetime.strptime(name[1:], '%Y%m%d')
+
+    def row_count(self, name):
+        start = self._day(name)
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM sensor_data WHERE timestamp >= ? AND timestamp < ?",
+            (f"{start:%Y-%m-%d %H:%M:%S}", f"{start + dt.timedelta(days=1):%Y-%m-%d %H:%M:%S}"),
+        ).fetchone()[0]
+
+    def ensure_rollups(self, start, end):
+        condition = "timestamp < ?" if start is None else "timestamp >= ? AND timestamp < ?"
+        params = [f"{end:%Y-%m-%d %H:%M:%S}"]
+        if start is not None:
+            params.insert(0, f"{start:%Y-%m-%d %H:%M:%S}")
+        for table, bucket in SQLITE_ROLLUP_BUCKETS.items():
+            self.connection.execute(backfill_query(table, bucket, condition, insert="INSERT OR IGNORE")
+                                    .replace("%s", "?"), params)
+        self.connection.commit()
+
+    def drop(self, names):
+        for name in names:
+            start = self._day(name)
+            self.connection.execute(
+                "DELETE FROM sensor_data WHERE timestamp >= ? AND timestamp < ?",
+                (f"{start:%Y-%m-%d %H:%M:%S}", f"{start + dt.timedelta(days=1):%Y-%m-%d %H:%M:%S}"),
+            )
+        self.connection.commit()
+
+
+def maintain(backend, today, ahead_days=7, retention_days=None, archived_through=None):
+    """Create future partitions and drop retired ones. Returns ``(added, dropped)`` partition names."""
+    added = backend.add_until(today, today + dt.timedelta(days=ahead_days))
+
+    retain_from = None
+    if retention_days is not None:
+        retain_from = dt.datetime.combine(today - dt.timedelta(days=retention_days), dt.time())
+
+    dropped = []
+    lower = None
+    for name, upper in backend.partitions():
+        if upper is None:
+            break
+        if retain_from is not None and upper <= retain_from:
+            # the partition's buckets outlive it in the rollup tables
+            backend.ensure_rollups(lower, upper)
+            dropped.append(name)
+        elif archived_through is not None and upper <= archived_through and backend.row_count(name) == 0:
+            dropped.append(name)
+        lower = upper
+    if dropped:
+        backend.drop(dropped)
+    return added, dropped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Create upcoming sensor_data partitions and drop old ones.')
+    parser.add_argument('--ahead-days', type=int, default=int(os.getenv('PARTITION_AHEAD_DAYS', 7)),
+                        help='days of empty partitions to keep ready after today (default 7)')
+    parser.add_argument('--retention-days', type=int,
+                        default=int(os.getenv('RETENTION_DAYS')) if os.getenv('RETENTION_DAYS') else None,
+                        help='drop raw rows of days older than this (default: keep every day)')
+    parser.add_argument('--archive-dir', default=os.getenv('ARCHIVE_DIR'),
+                        help='also drop the emptied partitions of days in this Parquet archive')
+    parser.add_argument('--sqlite', metavar='PATH', help='run against a SQLite stand-in database instead of MySQL')
+    args = parser.parse_args()
+
+    archived_through = None
+    if args.archive_dir:
+        through = load_manifest(args.archive_dir)['archived_through']
+        if through:
+            archived_through = dt.datetime.strptime(through, '%Y-%m-%d %H:%M:%S')
+
+    if args.sqlite:
+        conn = sqlite3.connect(args.sqlite)
+        backend = SQLitePartitions(conn)
+    else:
+        conn = connect_to_database()
+        if conn is None:
+            raise SystemExit(1)
+        backend = MySQLPartitions(conn)
+    try:
+        added, dropped = maintain(backend, dt.date.today(), args.ahead_days, args.retention_days, archived_through)
+        print(f"Added partitions: {', '.join(added) or 'none'}")
+        print(f"Dropped partitions: {', '.join(dropped) or 'none'}")
+    except (Error, RuntimeError) as e:
+        print(f"Error maintaining sensor_data partitions: {e}")
+        raise SystemExit(1)
+    finally:
+        if args.sqlite:
+            conn.close()
+        else:
+            close_connection(conn)
@@ -2,11 +2,39 @@ CREATE DATABASE IF NOT EXISTS anomaly_detection;
 
 USE anomaly_detection;
 
+-- Partitioned by day on timestamp; database/partition_maintenance.py splits pmax into
+-- daily partitions ahead of time and drops retired ones. MySQL requires the
+-- partitioning column in every unique key, hence the (id, timestamp) primary key.
 CREATE TABLE IF NOT EXISTS sensor_data (
-    id INT AUTO_INCREMENT PRIMARY KEY,
+    id INT AUTO_INCREMENT,
     temperature FLOAT,
     humidity FLOAT,
     sound_volume FLOAT,
     prediction INT,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    timestamp TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sensor_id INT UNSIGNED NOT NULL DEFAULT 0,
+    model_version VARCHAR(64) NOT NULL DEFAULT '',
+    PRIMARY KEY (id, timestamp),
+    INDEX idx_sensor_data_timestamp (timestamp),
+    INDEX idx_sensor_data_sensor_timestamp (sensor_id, timestamp)
+)
+PARTITION BY RANGE (UNIX_TIMESTAMP(timestamp)) (
+    PARTITION pmax VALUES LESS THAN MAXVALUE
 );
+
+CREATE TABLE IF NOT EXISTS sensor_data_rollup_minute (
+    bucket_start DATETIME NOT NULL PRIMARY KEY,
+    reading_count INT NOT NULL,
+    anomaly_count INT NOT NULL,
+    temperature_sum DOUBLE,
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    humidity_sum DOUBLE,
+    humidity_min FLOAT,
+    humidity_max FLOAT,
+    sound_volume_sum DOUBLE,
+    sound_volume_min FLOAT,
+    sound_volume_max FLOAT
+);
+
+CREATE TABLE IF NOT EXISTS sensor_data_rollup_hour LIKE sensor_data_rollup_minute;
@@ -1,72 +1,286 @@
+"""Model selection for the anomaly detector.
+
+Every estimator and hyperparameter combination in ``SEARCH_SPACE`` is
+cross-validated on the scaled training split, with the (model, parameters, fold)
+fits spread over a process pool (``--jobs``). The split, the fitted scaler and the
+fold indices are cached in ``--cache-dir`` under a hash of the dataset, as are the
+score and fit time of every fold and the refit models, so a rerun on unchanged data
+only fits what is new.
+
+The best parameters of each estimator are refit on the whole training split. Their
+single-reading latency is timed through the scorer the Flask service would use
+(``app/fast_model.py``). Selection weighs that latency: among the estimators whose
+mean CV accuracy is within ``--tolerance`` of the best one, the fastest wins. The
+held-out test accuracy is reported but not used for the choice.
+
+The scaler and the chosen model are saved together as one sklearn ``Pipeline``
+(``--output``, by default ``app/model_pipeline.joblib``), which ``app/app.py``
+loads. A JSON report with every candidate's scores, fit times and latencies is
+written to ``--report``. ``--registry DIR`` also publishes the pipeline as a new
+version of a model directory, which a running service swaps in (``app/model_registry.py``).
+
+    python model.py --jobs 4
+    python model.py --jobs 4 --registry ../models
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
 import numpy as np
 import pandas as pd
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.svm import SVC
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold, train_test_split
 from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import pickle
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
 
-try:
-    df = pd.read_csv('dataset.csv')
-except Exception as e:
-    print(f"Error reading the file: {e}")
-    raise
+from fast_model import SklearnScorer, compile_scorer  # noqa: E402
+from model_registry import publish  # noqa: E402
 
+FEATURES = ['temperature', 'humidity', 'sound_volume']
+TARGET = 'target'
 
-df.drop_duplicates(inplace=True)
+SEARCH_SPACE = {
+    'Logistic Regression': (LogisticRegression, {'C': [0.1, 1.0, 10.0], 'max_iter': [1000]}),
+    'Random Forest': (RandomForestClassifier, {
+        'n_estimators': [50, 100, 200], 'max_depth': [None, 8, 16], 'random_state': [0],
+    }),
+    'Support Vector Machine': (SVC, {'C': [0.1, 1.0, 10.0], 'gamma': ['scale', 0.1, 1.0]}),
+    'K-Nearest Neighbors': (KNeighborsClassifier, {'n_neighbors': [3, 5, 11, 21], 'weights': ['uniform', 'distance']}),
+    'Gradient Boosting': (GradientBoostingClassifier, {
+        'n_estimators': [50, 100, 200], 'max_depth': [2, 3], 'learning_rate': [0.05, 0.1], 'random_state': [0],
+    }),
+}
 
 
-if not all(col in df.columns for col in ['temperature', 'humidity', 'sound_volume', 'target']):
-    raise ValueError("Some required columns are missing in the dataset.")
+def load_dataset(path):
+    try:
+        df = pd.read_csv(path)
+    except Exception as e:
+        print(f"Error reading the file: {e}")
+        raise
 
-X = df[['temperature', 'humidity', 'sound_volume']]
-y = df['target']
+    df.drop_duplicates(inplace=True)
 
+    if not all(col in df.columns for col in FEATURES + [TARGET]):
+        raise ValueError("Some required columns are missing in the dataset.")
+    return df[FEATURES], df[TARGET]
 
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=50)
 
+def dataset_hash(X, y, test_size, folds, seed):
+    """Key of the cache: the rows themselves and the split settings."""
+    digest = hashlib.sha256()
+    digest.update(pd.util.hash_pandas_object(pd.concat([X, y], axis=1), index=False).to_numpy().tobytes())
+    digest.update(json.dumps([test_size, folds, seed]).encode())
+    return digest.hexdigest()[:16]
 
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
 
+def candidate_key(name, params):
+    return hashlib.sha256(json.dumps([name, params], sort_keys=True).encode()).hexdigest()[:16]
 
-models = {
-    'Logistic Regression': LogisticRegression(),
-    'Random Forest': RandomForestClassifier(),
-    'Support Vector Machine': SVC(),
-    'K-Nearest Neighbors': KNeighborsClassifier(),
-    'Gradient Boosting': GradientBoostingClassifier()
-}
 
-best_model = None
-best_accuracy = 0
+def prepare(X, y, cache_dir, test_size, folds, seed):
+    """Split, scale and fold the dataset, or load what was cached for the same data."""
+    key = dataset_hash(X, y, test_size, folds, seed)
+    path = os.path.join(cache_dir, key, 'prepared.joblib')
+    if os.path.exists(path):
+        return key, joblib.load(path)
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=seed)
+    # fitted on plain arrays, as the service passes them
+    scaler = StandardScaler().fit(X_train.to_numpy(dtype=float))
+    X_train_scaled = scaler.transform(X_train.to_numpy(dtype=float))
+    y_train = y_train.to_numpy()
+    prepared = {
+        'scaler': scaler,
+        'X_train': X_train_scaled,
+        'y_train': y_train,
+        'X_test': X_test.to_numpy(dtype=float),
+        'y_test': y_test.to_numpy(),
+        # as cross_val_score(cv=folds) does for a classifier
+        'folds': list(StratifiedKFold(n_splits=folds).split(X_train_scaled, y_train)),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(prepared, path)
+    return key, prepared
+
+
+_worker_data = {}
+
+
+def _init_worker(X_train, y_train, folds):
+    _worker_data.update(X_train=X_train, y_train=y_train, folds=folds)
+
+
+def fit_fold(name, params, fold):
+    """Fit one candidate on one fold in a pool worker; returns its validation accuracy and fit time."""
+    X, y = _worker_data['X_train'], _worker_data['y_train']
+    train_index, val_index = _worker_data['folds'][fold]
+    estimator = SEARCH_SPACE[name][0](**params)
+    started = time.perf_counter()
+    estimator.fit(X[train_index], y[train_index])
+    fit_seconds = time.perf_counter() - started
+    return {'accuracy': float(accuracy_score(y[val_index], estimator.predict(X[val_index]))),
+            'fit_seconds': fit_seconds}
+
+
+def search(prepared, key, cache_dir, jobs):
+    """Cross-validate every candidate; returns one summary per (model, parameters)."""
+    fold_dir = os.path.join(cache_dir, key, 'folds')
+    os.makedirs(fold_dir, exist_ok=True)
+    candidates = [(name, params) for name, (_, grid) in SEARCH_SPACE.items() for params in ParameterGrid(grid)]
+    scores = {}
+    pending = []
+    for name, params in candidates:
+        for fold in range(len(prepared['folds'])):
+            path = os.path.join(fold_dir, f"{candidate_key(name, params)}-{fold}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    scores[(candidate_key(name, params), fold)] = json.load(f)
+            else:
+                pending.append((name, params, fold, path))
+
+    print(f"{len(candidates)} candidates, {len(pending)} of {len(candidates) * len(prepared['folds'])} "
+          f"fold fits to run on {jobs} processes")
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(prepared['X_train'], prepared['y_train'], prepared['folds'])) as pool:
+            futures = {pool.submit(fit_fold, name, params, fold): (name, params, fold, path)
+                       for name, params, fold, path in pending}
+            for future in as_completed(futures):
+                name, params, fold, path = futures[future]
+                result = future.result()
+                with open(path, 'w') as f:
+                    json.dump(result, f)
+                scores[(candidate_key(name, params), fold)] = result
+
+    summaries = []
+    for name, params in candidates:
+        folds = [scores[(candidate_key(name, params), fold)] for fold in range(len(prepared['folds']))]
+        accuracies = [fold['accuracy'] for fold in folds]
+        summaries.append({
+            'model': name,
+            'params': params,
+            'cv_accuracy': round(float(np.mean(accuracies)), 4),
+            'cv_std': round(float(np.std(accuracies)), 4),
+            'fold_fit_seconds': round(float(np.mean([fold['fit_seconds'] for fold in folds])), 4),
+        })
+    return summaries
+
+
+def refit(prepared, key, cache_dir, name, params):
+    """Fit a candidate on the whole training split, or load the cached fit."""
+    path = os.path.join(cache_dir, key, 'models', f"{candidate_key(name, params)}.joblib")
+    if os.path.exists(path):
+        return joblib.load(path)
+    estimator = SEARCH_SPACE[name][0](**params)
+    started = time.perf_counter()
+    estimator.fit(prepared['X_train'], prepared['y_train'])
+    fit_seconds = time.perf_counter() - started
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump((estimator, fit_seconds), path)
+    return estimator, fit_seconds
+
 
+def latency_us(predict_one, rows, repeats):
+    """Median microseconds per single-reading call over ``repeats`` rounds of ``rows``."""
+    rounds = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for row in rows:
+            predict_one(*row)
+        rounds.append((time.perf_counter() - started) / len(rows) * 1e6)
+    return float(np.median(rounds))
 
-for name, model in models.items():
- 
-    cv_scores = cross_val_score(model, X_train_scaled, y_train, cv=5)
 
-    model.fit(X_train_scaled, y_train)
+def evaluate(prepared, model, fit_seconds, summary, latency_rows, repeats):
+    scaler = prepared['scaler']
+    scorer = compile_scorer(model, scaler)
+    reference = SklearnScorer(model, scaler)
+    rows = prepared['X_test'][:latency_rows]
+    started = time.perf_counter()
+    predictions = scorer.predict(prepared['X_test'])
+    batch_us = (time.perf_counter() - started) / len(prepared['X_test']) * 1e6
+    return dict(
+        summary,
+        test_accuracy=round(float(accuracy_score(prepared['y_test'], predictions)), 4),
+        fit_seconds=round(fit_seconds, 4),
+        scorer=scorer.name,
+        latency_us=round(latency_us(scorer.predict_one, rows, repeats), 2),
+        sklearn_latency_us=round(latency_us(reference.predict_one, rows, repeats), 2),
+        batch_us_per_reading=round(batch_us, 3),
+    )
 
-    y_pred = model.predict(X_test_scaled)
 
-    accuracy = accuracy_score(y_test, y_pred)
+def select(finalists, tolerance):
+    """The fastest estimator whose CV accuracy is within ``tolerance`` of the best."""
+    best_accuracy = max(f['cv_accuracy'] for f in finalists)
+    eligible = [f for f in finalists if f['cv_accuracy'] >= best_accuracy - tolerance]
+    return min(eligible, key=lambda f: f['latency_us'])
 
 
-    print(f'Model: {name}, Accuracy: {accuracy:.2f}, CV Average: {cv_scores.mean():.2f}')
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Select, tune and save the anomaly detection model.')
+    parser.add_argument('--dataset', default=os.path.join(here, 'dataset.csv'))
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='processes for the cross-validation fits')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=50, help='random_state of the train/test split')
+    parser.add_argument('--tolerance', type=float, default=0.005,
+                        help='CV accuracy an estimator may give up against the best one for lower latency')
+    parser.add_argument('--latency-rows', type=int, default=200, help='test readings scored one by one per round')
+    parser.add_argument('--latency-repeats', type=int, default=5, help='timed rounds per estimator')
+    parser.add_argument('--cache-dir', default=os.path.join(here, '.model_cache'))
+    parser.add_argument('--output', default=os.path.join(here, '..', 'app', 'model_pipeline.joblib'),
+                        help='scaler + model pipeline loaded by the Flask service')
+    parser.add_argument('--report', default=os.path.join(here, 'training_report.json'))
+    parser.add_argument('--registry', help='also publish the pipeline as a new version of this model directory')
+    args = parser.parse_args()
 
-    if accuracy > best_accuracy:
-        best_accuracy = accuracy
-        best_model = model
+    started = time.perf_counter()
+    X, y = load_dataset(args.dataset)
+    key, prepared = prepare(X, y, args.cache_dir, args.test_size, args.folds, args.seed)
+    candidates = search(prepared, key, args.cache_dir, max(1, args.jobs))
 
-with open('best_model.pkl', 'wb') as f:
-    pickle.dump(best_model, f)
+    finalists = []
+    for name in SEARCH_SPACE:
+        best = max((c for c in candidates if c['model'] == name), key=lambda c: c['cv_accuracy'])
+        model, fit_seconds = refit(prepared, key, args.cache_dir, name, best['params'])
+        result = evaluate(prepared, model, fit_seconds, best, args.latency_rows, args.latency_repeats)
+        finalists.append(result)
+        print(f"Model: {name}, CV Average: {result['cv_accuracy']:.4f}, Test Accuracy: {result['test_accuracy']:.4f}, "
+              f"Latency: {result['latency_us']:.1f} us ({result['scorer']}), Fit: {result['fit_seconds']:.3f} s, "
+              f"Params: {result['params']}")
 
-with open('scaler.pkl', 'wb') as f:
-    pickle.dump(scaler, f)
+    chosen = select(finalists, args.tolerance)
+    model, _ = refit(prepared, key, args.cache_dir, chosen['model'], chosen['params'])
+    joblib.dump(Pipeline([('scaler', prepared['scaler']), ('model', model)]), args.output)
 
-print(f'Best model: {best_model.__class__.__name__}, Accuracy: {best_accuracy:.2f}')
+    report = {
+        # relative to the report, so a committed report names no build machine's paths
+        'dataset': os.path.relpath(args.dataset, os.path.dirname(os.path.abspath(args.report))),
+        'dataset_hash': key,
+        'rows': len(X),
+        'selection': {'tolerance': args.tolerance, 'chosen': chosen['model'], 'params': chosen['params']},
+        'finalists': finalists,
+        'candidates': candidates,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Best model: {chosen['model']} {chosen['params']}, CV Average: {chosen['cv_accuracy']:.4f}, "
+          f"Latency: {chosen['latency_us']:.1f} us; saved to {args.output}")
+    if args.registry:
+        os.makedirs(args.registry, exist_ok=True)
+        print(f"Published version {publish(args.output, args.registry)} to {args.registry}")